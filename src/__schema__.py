@@ -200,10 +200,16 @@ _S_CONFIG = """
           "type": "integer",
           "minimum": 1
         },
-    "maxfps": {
+        "maxfps": {
           "type": "integer",
           "minimum": 0
-    }
+        },
+        "headless": {
+          "type": "boolean"
+        },
+        "checksum": {
+          "type": "boolean"
+        }
       },
       "required": [
         "title",
@@ -211,7 +217,7 @@ _S_CONFIG = """
         "height",
         "fullscreen",
         "zoom",
-    "maxfps"
+        "maxfps"
       ]
     }
   },
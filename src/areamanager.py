@@ -25,11 +25,21 @@
 # IN THE SOFTWARE.
 # **********
 
+import collections
+from ctypes import byref, c_int
 import math
 from sdl2 import *
+from typing import List, Optional, Tuple
 
+import spatialhash
+import tile
 import tilemap
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Optional. Tiles are looked up and drawn one by one without it.
+
 
 def int_greater_than_or_equal_to(x: float) -> int:
     return int(math.ceil(x))
@@ -48,11 +58,27 @@ class AreaManager:
         driftwood: Base class instance.
         filename: Filename of the current area.
         tilemap: Tilemap instance for the area's tilemap.
-        changed: Whether the area should be rebuilt. This is true if the area changed since last checked.
+        changed: Whether the whole area should be rebuilt. This is true if the area changed since last checked. For
+            smaller changes, use invalidate().
         offset: Offset at which to draw the area inside the viewport.
         refocused: Whether we have gone to a new area since last checked.
+        culled: Number of lights and entities skipped because they were out of view, while drawing the last frame.
+            For debugging.
     """
 
+    # Width and height of a chunk in tiles.
+    CHUNK_SIZE = 16
+
+    # Memory available to chunk bakes in bytes. The least recently drawn are destroyed to stay under it.
+    BAKE_BUDGET = 32 * 1024 * 1024
+
+    # Most regions redrawn in one frame. With more dirty regions than this, the whole frame is redrawn instead.
+    MAX_REGIONS = 64
+
+    # With NumPy, tiles are drawn with whole-array operations when there are at least this many of them. For fewer, the
+    # overhead of setting up the arrays outweighs looking them up one by one.
+    VECTOR_THRESHOLD = 64
+
     def __init__(self, driftwood):
         """AreaManager class initializer.
 
@@ -66,8 +92,33 @@ class AreaManager:
         self.changed = False
         self.offset = [0, 0]
         self.refocused = False
+        self.culled = 0
         self._autospawns = []
 
+        # What the last frame drew, and what it skipped because it was out of view or hidden, for statistics.
+        # Tiles drawn from an existing bake are not counted, only those drawn into the frame or into a new bake.
+        self._counts = dict.fromkeys(["tiles_drawn", "tiles_culled", "entities_drawn", "entities_culled",
+                                      "lights_drawn", "lights_culled"], 0)
+
+        self.__quads = {}  # {tileset name: _QuadBatch} for batching tile draws per tileset.
+
+        # Regions of the area to redraw on the next frame, when not redrawing everything.
+        self.__dirty = []  # [[x, y, w, h], ...]
+        self.__drawn_at = None  # Offset of the last frame drawn.
+
+        # Retained draw records for the lights and entities of each layer: [texture, srcrect, dstrect, alpha,
+        # blendmode, colormod]. Records are patched in place when their entity or light changes.
+        self.__commands = {}  # {layer: [record, ...]}
+        self.__owners = {}  # {entity or light: [layer, [record, ...], [index of record in layer, ...]]}
+        self.__spatial = {}  # {layer: SpatialHash of the entities and lights by what they cover}
+
+        # Runs of consecutive static layers are baked into textures, one per chunk of the map.
+        self.__bakes = collections.OrderedDict()  # {(first layer, last layer, cx, cy): texture}, least recent first.
+        self.__bakebytes = 0  # Memory used by the bakes.
+        self.__unbaked = {}  # {(first layer, last layer, cx, cy): [tile seqs of each layer]} for runs drawn directly.
+        self.__chunks = {}  # {(layer, cx, cy): [static tile seqs, animated tile seqs]}
+        self.__covers = {}  # {(cx, cy): [{seq: top layer with an opaque tile}, lowest such layer if all are covered]}
+
         self.driftwood.tick.register(self._tick)
 
     def register(self) -> None:
@@ -104,18 +155,19 @@ class AreaManager:
 
             # We have moved areas.
             self.refocused = True
+            self.driftwood.entity._rehash()
 
             # Call world's global on_focus handlers.
             self.driftwood.script._call_global_triggers("on_focus")
 
             # If there is an on_focus function defined for this map, call it.
             if "on_focus" in self.tilemap.properties:
-                args = self.tilemap.properties["on_focus"].split(',')
-                if len(args) < 2:
+                trigger = self.driftwood.script._trigger(self.tilemap.properties["on_focus"])
+                if not trigger:
                     self.driftwood.log.msg("ERROR", "Area", "Focus", "invalid on_focus event",
                                            self.tilemap.properties["on_focus"])
                     return True
-                self.driftwood.script.call(*args)
+                trigger()
 
             # Are we autospawning any entities?
             for ent in self._autospawns:
@@ -137,170 +189,654 @@ class AreaManager:
         self.driftwood.script._call_global_triggers("on_blur")
 
         if "on_blur" in self.tilemap.properties:
-            args = self.tilemap.properties["on_blur"].split(',')
-            if len(args) < 2:
+            trigger = self.driftwood.script._trigger(self.tilemap.properties["on_blur"])
+            if not trigger:
                 self.driftwood.log.msg("ERROR", "Area", "blur", "invalid on_blur event",
                                        self.tilemap.properties["on_blur"])
                 return
-            self.driftwood.script.call(*args)
+            trigger()
         self.tilemap = None
 
+    def invalidate(self, rect: List[int], tiles: bool = False) -> bool:
+        """Mark a rectangle of the area to be redrawn on the next frame.
+
+        Rectangles outside the view and its margin are ignored.
+
+        Args:
+            rect: Rectangle [x, y, w, h] in pixels.
+            tiles: (optional) Whether the rectangle is measured in tiles instead.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        # Input Check
+        try:
+            CHECK(rect, list, _equals=4)
+            CHECK(tiles, bool)
+        except CheckFailure as e:
+            self.driftwood.log.msg("ERROR", "Area", "invalidate", "bad argument", e)
+            return False
+
+        valid = self.driftwood.frame._valid
+        if self.changed or not self.tilemap or not valid:
+            return True  # Everything is being redrawn anyway.
+
+        x, y, w, h = rect
+        if tiles:
+            x, w = x * self.tilemap.tilewidth, w * self.tilemap.tilewidth
+            y, h = y * self.tilemap.tileheight, h * self.tilemap.tileheight
+
+        # Cut off what falls outside the part of the area held in the back buffer.
+        region = self.__clip([x + self.offset[0], y + self.offset[1], w, h], valid)
+        if region and len(self.__dirty) <= self.MAX_REGIONS:
+            self.__dirty.append(region)
+
+        return True
+
     def _tick(self, seconds_past: float) -> None:
         """Tick callback.
         """
-        if self.changed:  # TODO: Only redraw portions that have changed.
-            if self.refocused:
-                self.driftwood.frame.prepare(self.tilemap.width * self.tilemap.tilewidth,
-                                             self.tilemap.height * self.tilemap.tileheight)
-                self.refocused = False
+        if self.tilemap and self.tilemap.infinite:
+            self.__stream()
+
+        if not self.changed and not self.__dirty:
+            return
+
+        frame = self.driftwood.frame
+        if self.refocused:
+            frame.prepare(self.tilemap.width * self.tilemap.tilewidth,
+                          self.tilemap.height * self.tilemap.tileheight,
+                          2 * max(self.tilemap.tilewidth, self.tilemap.tileheight))
+            self.__quads = {}
+            self._invalidate_bakes()
+            self.refocused = False
+        frame.calc_rects()
+
+        # A full redraw may follow changes we were not told about.
+        if self.changed:
+            self._forget_commands()
+
+        # If the area offset has moved, everything in the back buffer has moved too.
+        if self.offset != self.__drawn_at:
+            self.changed = True
+            self.__drawn_at = list(self.offset)
+
+        if self.changed or frame._exposed is None or len(self.__dirty) > self.MAX_REGIONS:
+            dirty = [frame._valid]
+        else:
+            # Draw what scrolled into the back buffer, and what changed in the part we already had.
+            dirty = frame._exposed + [region for region in [self.__clip(r, frame._valid) for r in self.__dirty]
+                                      if region]
+
+        # Draw the dirty regions with the back buffer bound once, leaving the rest of it as it was.
+        self.culled = 0
+        counts = self._counts
+        for key in counts:
+            counts[key] = 0
+        frame.begin_batch()
+        for region in self.__merge_regions(dirty):
+            for bufrect, x, y in frame._wrap(region):
+                frame._begin_region(bufrect)
+                self.__build_frame([x, y, bufrect[2], bufrect[3]], [bufrect[0] - x, bufrect[1] - y])
+                frame._end_region()
+        frame.finish_frame()
+        frame.end_batch()
+
+        self.changed = False
+        self.__dirty = []
+
+    @staticmethod
+    def __clip(rect: List[int], bounds: List[int]) -> Optional[List[int]]:
+        """Return the part of a rectangle inside the bounds, or None if there is none.
+        """
+        left = max(rect[0], bounds[0])
+        top = max(rect[1], bounds[1])
+        right = min(rect[0] + rect[2], bounds[0] + bounds[2])
+        bottom = min(rect[1] + rect[3], bounds[1] + bounds[3])
+
+        if left < right and top < bottom:
+            return [left, top, right - left, bottom - top]
+        return None
+
+    @staticmethod
+    def __merge_regions(regions: List[List[int]]) -> List[List[int]]:
+        """Merge overlapping regions until none overlap, so nothing is drawn twice.
+
+        Only a region grown by a merge is checked again, so with n regions there are at most 2n - 1 passes over the
+        merged ones.
+        """
+        merged = []
+        pending = [list(region) for region in regions]
+        while pending:
+            x, y, w, h = pending.pop()
+            for i, (mx, my, mw, mh) in enumerate(merged):
+                if x < mx + mw and mx < x + w and y < my + mh and my < y + h:
+                    # They overlap. Take the other one out, and check the region grown to cover both again.
+                    del merged[i]
+                    right, bottom = max(x + w, mx + mw), max(y + h, my + mh)
+                    x, y = min(x, mx), min(y, my)
+                    pending.append([x, y, right - x, bottom - y])
+                    break
             else:
-                self.driftwood.frame.clear()
-            self.driftwood.frame.calc_rects()
-            self.__build_frame()
-            self.driftwood.frame.finish_frame()
-            self.changed = False
+                merged.append([x, y, w, h])
+        return merged
+
+    def __stream(self) -> None:
+        """Load the chunks of an infinite map around the player, or around the middle of the view if there is none.
+        """
+        player = self.driftwood.entity.player
+        if player:
+            x, y = player.x // self.tilemap.tilewidth, player.y // self.tilemap.tileheight
+        else:
+            x_begin, x_end, y_begin, y_end = self.calculate_visible_tile_bounds()
+            x, y = (x_begin + x_end) // 2, (y_begin + y_end) // 2
+        self.tilemap._stream(x, y)
+
+    def _invalidate_bakes(self, tile: 'tile.Tile' = None, rect: List[int] = None) -> None:
+        """Throw away baked static layers, so they are rebuilt when next drawn.
+
+        This is called when tile graphics or layers change. Without a tile or a rectangle, all of them are thrown away.
+
+        Args:
+            tile: (optional) Only throw away the bakes containing this tile.
+            rect: (optional) Only throw away the bakes over this rectangle [x, y, w, h] of every layer, in tiles.
+        """
+        if rect is not None:
+            cxs = range(rect[0] // self.CHUNK_SIZE, (rect[0] + rect[2] - 1) // self.CHUNK_SIZE + 1)
+            cys = range(rect[1] // self.CHUNK_SIZE, (rect[1] + rect[3] - 1) // self.CHUNK_SIZE + 1)
+            chunks = {(cx, cy) for cx in cxs for cy in cys}
+            self.__chunks = {key: value for key, value in self.__chunks.items() if key[1:] not in chunks}
+            for chunk in chunks:
+                self.__covers.pop(chunk, None)
+            for key in [key for key in self.__bakes if key[2:] in chunks]:
+                self.__destroy_bake(key)
+            self.__unbaked = {key: value for key, value in self.__unbaked.items() if key[2:] not in chunks}
+            self.invalidate(rect, tiles=True)
+            return
+
+        if tile is None:
+            for tex in self.__bakes.values():
+                SDL_DestroyTexture(tex)
+            self.__bakes = collections.OrderedDict()
+            self.__bakebytes = 0
+            self.__unbaked = {}
+            self.__chunks = {}
+            self.__covers = {}
 
-    def __build_frame(self) -> None:
-        """Build the frame and pass to WindowManager.
+        else:
+            l = self.tilemap.layers.index(tile.layer)
+            cx = tile.pos[0] // self.CHUNK_SIZE
+            cy = tile.pos[1] // self.CHUNK_SIZE
+            self.__chunks.pop((l, cx, cy), None)
+
+            # The tile may have covered or uncovered tiles in other layers, so all of the chunk's bakes must go.
+            self.__covers.pop((cx, cy), None)
+            for key in [key for key in self.__bakes if key[2:] == (cx, cy)]:
+                self.__destroy_bake(key)
+            for key in [key for key in self.__unbaked if key[2:] == (cx, cy)]:
+                del self.__unbaked[key]
+            self.invalidate([tile.pos[0], tile.pos[1], 1, 1], tiles=True)
+            return
+
+        self.changed = True
+
+    def __build_frame(self, region: List[int], shift: List[int]) -> None:
+        """Build a region of the frame and pass to WindowManager.
+
+        The map is divided into chunks. In each chunk, every run of consecutive static layers is drawn from a baked
+        texture. A run ends at a layer with animated tiles in the chunk, or with lights or entities anywhere, which are
+        then drawn over it in order from the layer's retained command list. Tiles hidden under an opaque static tile in
+        a higher layer are never drawn. Finally, give the frame to WindowManager for display.
 
-        For every tile and entity in each layer, copy its graphic onto the frame, then give the frame to WindowManager
-        for display.
+        Args:
+            region: Only draw the tiles touching this region [x, y, w, h] of the area.
+            shift: Amount to move the region by to reach where it is kept in the back buffer.
         """
         tilemap = self.tilemap
+        width = tilemap.width
+        offset = [self.offset[0] + shift[0], self.offset[1] + shift[1]]
+        copy = self.driftwood.frame._copy
+        counts = self._counts
+
+        # Find the tiles that will show up if we draw them, and the chunks they are in.
+        x_begin = max((region[0] - self.offset[0]) // tilemap.tilewidth, 0)
+        y_begin = max((region[1] - self.offset[1]) // tilemap.tileheight, 0)
+        x_end = min((region[0] + region[2] - 1 - self.offset[0]) // tilemap.tilewidth, tilemap.width - 1)
+        y_end = min((region[1] + region[3] - 1 - self.offset[1]) // tilemap.tileheight, tilemap.height - 1)
+        if x_begin > x_end or y_begin > y_end:
+            x_begin, x_end, y_begin, y_end = 0, -1, 0, -1  # The region touches no tiles.
+        chunks = [(cx, cy)
+                  for cy in range(y_begin // self.CHUNK_SIZE, y_end // self.CHUNK_SIZE + 1)
+                  for cx in range(x_begin // self.CHUNK_SIZE, x_end // self.CHUNK_SIZE + 1)]
+        first = dict.fromkeys(chunks, 0)  # The first layer of each chunk's current run.
+
+        # The region without the area offset, for culling lights and entities.
+        view = [region[0] - self.offset[0], region[1] - self.offset[1], region[2], region[3]]
+
+        # Start with the bottom layer and work up.
+        last_layer = len(tilemap.layers) - 1
+        for l in range(len(tilemap.layers)):
+            commands = self.__layer_commands(l)
+            animated = []
+
+            for chunk in chunks:
+                chunk_animated = self.__chunk(l, *chunk)[1]
+
+                if not chunk_animated and not commands and l < last_layer:
+                    # Nothing needs to go between this layer and the next, so they can share a bake.
+                    continue
+
+                # Draw the static tiles of this run of layers, unless the whole chunk is covered above it.
+                cover, lowest = self.__cover(*chunk)
+                if lowest <= l:
+                    self.__draw_bake(first[chunk], l, chunk, offset)
+                else:
+                    counts["tiles_culled"] += sum(len(self.__chunk(m, *chunk)[0]) for m in range(first[chunk], l + 1))
+                first[chunk] = l + 1
+
+                for seq in chunk_animated:
+                    if x_begin <= seq % width <= x_end and y_begin <= seq // width <= y_end:
+                        if cover.get(seq, -1) <= l:
+                            animated.append(seq)
+                        else:
+                            counts["tiles_culled"] += 1
+
+            # Draw the visible animated tiles over the bakes.
+            if animated:
+                self.__draw_tiles(l, animated, offset)
+
+            if not commands:
+                continue
+
+            # Draw the lights and entities of the layer that are in view, in order.
+            spatial = self.__spatial[l]
+            visible = spatial.query(view)
+            self.culled += len(spatial) - len(visible)
+            lights = sum(1 for owner in visible if hasattr(owner, "lightmap"))
+            counts["lights_drawn"] += lights
+            counts["entities_drawn"] += len(visible) - lights
+            lights = sum(1 for owner in spatial if hasattr(owner, "lightmap")) - lights
+            counts["lights_culled"] += lights
+            counts["entities_culled"] += len(spatial) - len(visible) - lights
+            owners = self.__owners
+            for i in sorted(i for owner in visible for i in owners[owner][2]):
+                tex, srcrect, dstrect, alpha, blendmode, colormod = commands[i]
+                copy(tex, srcrect, [dstrect[0] + offset[0], dstrect[1] + offset[1], dstrect[2], dstrect[3]],
+                     alpha, blendmode, colormod)
+
+    def _patch_commands(self, owner) -> None:
+        """Bring the draw records of an entity or light up to date after it changed.
+
+        The records are patched in place. If the entity or light changed layers or gained or lost records, its layers'
+        command lists are thrown away to be rebuilt instead.
+
+        Args:
+            owner: Entity or Light instance.
+        """
+        if owner not in self.__owners:
+            return  # Not drawn yet.
+
+        l, records, indices = self.__owners[owner]
+        if owner.layer != l:
+            self.__forget_layer(l)
+            self.__forget_layer(owner.layer)
+            return
+
+        if hasattr(owner, "lightmap"):
+            new_records = [self.__light_record(owner)]
+        else:
+            new_records = sum(self.__entity_records(owner), [])
+
+        if len(new_records) != len(records):
+            self.__forget_layer(l)
+            return
+
+        for record, new_record in zip(records, new_records):
+            record[:] = new_record
+        self.__spatial[l].insert(owner, self.__bounds(records))
+
+    def _forget_commands(self) -> None:
+        """Throw away all retained command lists, so they are rebuilt when next drawn.
+        """
+        self.__commands = {}
+        self.__owners = {}
+        self.__spatial = {}
+
+    def __forget_layer(self, l: int) -> None:
+        """Throw away the retained command list of one layer.
+        """
+        if l in self.__spatial:
+            for owner in self.__spatial[l]:
+                del self.__owners[owner]
+            del self.__spatial[l]
+        self.__commands.pop(l, None)
+
+    def __layer_commands(self, l: int) -> List[list]:
+        """Return the retained command list for the lights and entities of a layer, building it if needed.
+
+        Lights come first, then entities in order of eid, then the tall parts of the entities over all of them.
+        """
+        if l in self.__commands:
+            return self.__commands[l]
+
+        commands = []
+        spatial = spatialhash.SpatialHash(4 * max(self.tilemap.tilewidth, self.tilemap.tileheight))
+
+        owners = []  # [[owner, body records, tall part records], ...]
+        for light in self.driftwood.light.layer(l):
+            owners.append([light, [self.__light_record(light)], []])
+        for entity in self.driftwood.entity.layer(l):
+            owners.append([entity] + list(self.__entity_records(entity)))
+
+        # Number the records in drawing order: lights and entity bodies, then the tall parts.
+        for owner, body, tall in owners:
+            self.__owners[owner] = [l, body + tall, list(range(len(commands), len(commands) + len(body)))]
+            commands.extend(body)
+        for owner, body, tall in owners:
+            self.__owners[owner][2].extend(range(len(commands), len(commands) + len(tall)))
+            commands.extend(tall)
+            spatial.insert(owner, self.__bounds(body + tall))
+
+        self.__commands[l] = commands
+        self.__spatial[l] = spatial
+        return commands
+
+    @staticmethod
+    def __bounds(records: List[list]) -> List[int]:
+        """Return the rectangle covering the dstrects of some draw records.
+        """
+        if not records:
+            return [0, 0, 0, 0]
+        left = min(record[2][0] for record in records)
+        top = min(record[2][1] for record in records)
+        right = max(record[2][0] + record[2][2] for record in records)
+        bottom = max(record[2][1] + record[2][3] for record in records)
+        return [left, top, right - left, bottom - top]
+
+    @staticmethod
+    def __light_record(light) -> list:
+        """Work out the draw record for a light.
+        """
+        return [light.lightmap.texture, (0, 0, light.lightmap.width, light.lightmap.height),
+                [light.x - light.w // 2, light.y - light.h // 2, light.w, light.h],
+                light.alpha, light.blendmode, light.colormod]
+
+    def __entity_records(self, entity) -> Tuple[List[list], List[list]]:
+        """Work out the draw records for an entity's body, and for the tall parts drawn over the rest of its layer.
+        """
+        tall_amount = entity.height - self.tilemap.tileheight
+        texture = entity.spritesheet.texture
+        body = []
+        tall = []
+
+        # Draw the layers of the entity.
+        for srcrect in entity.srcrect():
+            # Get the destination rectangle needed by SDL_RenderCopy.
+            dstrect = [entity.x, entity.y - tall_amount, entity.width, entity.height]
+            body.append([texture] + self.__clip_to_area(srcrect, dstrect) + [None, None, None])
+
+            if tall_amount:  # It's taller than the tile. Figure out where to put the tall part.
+                dstrect = [entity.x, entity.y - tall_amount, entity.width, tall_amount]
+                tall_srcrect = [srcrect[0], srcrect[1], srcrect[2], tall_amount]
+                tall.append([texture] + self.__clip_to_area(tall_srcrect, dstrect) + [None, None, None])
+
+        return body, tall
+
+    def __clip_to_area(self, srcrect: List[int], dstrect: List[int]) -> List[List[int]]:
+        """Clip a copy so it doesn't appear outside the area, returning the new srcrect and dstrect.
+        """
+        areawidth = self.tilemap.width * self.tilemap.tilewidth
+        areaheight = self.tilemap.height * self.tilemap.tileheight
+
+        clip_left = max(-dstrect[0], 0)
+        clip_top = max(-dstrect[1], 0)
+        clip_right = max(dstrect[0] + dstrect[2] - areawidth, 0)
+        clip_bot = max(dstrect[1] + dstrect[3] - areaheight, 0)
+
+        return [
+            [srcrect[0] + clip_left, srcrect[1] + clip_top,
+             srcrect[2] - clip_left - clip_right, srcrect[3] - clip_top - clip_bot],
+            [dstrect[0] + clip_left, dstrect[1] + clip_top,
+             dstrect[2] - clip_left - clip_right, dstrect[3] - clip_top - clip_bot]
+        ]
+
+    def __chunk(self, l: int, cx: int, cy: int) -> List[List[int]]:
+        """Return the sequence numbers of the static and animated tiles in a chunk of a layer, sorting them if needed.
+        """
+        key = (l, cx, cy)
+        if key in self.__chunks:
+            return self.__chunks[key]
+
+        tilemap = self.tilemap
+        width = tilemap.width
+        layer = tilemap.layers[l]
+        table = tilemap._gid_table()
+        x_begin, x_end = cx * self.CHUNK_SIZE, min((cx + 1) * self.CHUNK_SIZE, width)
+        y_begin, y_end = cy * self.CHUNK_SIZE, min((cy + 1) * self.CHUNK_SIZE, tilemap.height)
+
+        if table and layer._grid is not None:
+            # Sort the whole chunk at once by the kind of each tile's graphic.
+            kind = table[0]
+            block = layer._grid[y_begin:y_end, x_begin:x_end]
+            kinds = kind[numpy.where(block < len(kind), block, 0)]
+            seqs = numpy.arange(y_begin, y_end)[:, None] * width + numpy.arange(x_begin, x_end)
+
+            # Tiles given animations of their own are sorted one by one.
+            seqs_own = [seq for seq in layer._types
+                        if x_begin <= seq % width < x_end and y_begin <= seq // width < y_end]
+            if seqs_own:
+                kinds[numpy.isin(seqs, seqs_own)] = 0
+
+            static = seqs[kinds == 1].tolist()
+            animated = seqs[kinds == 2].tolist()
+
+        else:
+            seqs_own = [y * width + x for y in range(y_begin, y_end) for x in range(x_begin, x_end)]
+            static = []
+            animated = []
+
+        for seq in seqs_own:
+            tileset, tiletype = layer._tiletype(seq)
+            if not tileset:
+                continue  # Nothing to draw.
+            if tiletype.afps and len(tiletype.members) > 1:
+                animated.append(seq)
+            else:
+                static.append(seq)
+
+        self.__chunks[key] = [static, animated]
+        return self.__chunks[key]
+
+    def __cover(self, cx: int, cy: int) -> list:
+        """Return which tiles in a chunk are hidden by an opaque static tile above them, finding out if needed.
+
+        Returns:
+            [{seq: highest layer with an opaque static tile at seq}, lowest of those layers if every tile in the chunk
+            has one, otherwise -1]. A tile in layer l is hidden if the layer for its seq is above l.
+        """
+        key = (cx, cy)
+        if key in self.__covers:
+            return self.__covers[key]
+
+        tilemap = self.tilemap
+        cover = {}
+
+        # Work down from the top layer, so the first opaque tile found at each seq is the highest one.
+        for l in reversed(range(len(tilemap.layers))):
+            graphic = tilemap.layers[l]._graphic
+            for seq in self.__chunk(l, cx, cy)[0]:
+                if seq in cover:
+                    continue
+                tileset, member = graphic(seq)
+                if member != -1 and tileset.opaque[member]:
+                    cover[seq] = l
+
+        # Number of tiles in the chunk. Chunks on the right and bottom edges may be cut short.
+        size = min(self.CHUNK_SIZE, tilemap.width - cx * self.CHUNK_SIZE) * \
+            min(self.CHUNK_SIZE, tilemap.height - cy * self.CHUNK_SIZE)
+        lowest = min(cover.values()) if len(cover) == size else -1
+
+        self.__covers[key] = [cover, lowest]
+        return self.__covers[key]
+
+    def __draw_bake(self, first: int, last: int, chunk: Tuple[int, int], offset: List[int]) -> None:
+        """Draw the static tiles of a run of layers in a chunk from its baked texture, baking it first if needed.
+
+        A bake starts out transparent, so a see-through tile in it would end up blended twice: once into the bake, and
+        again when the bake is drawn. A run is only baked in a chunk where every tile has an opaque tile in the run or
+        above it. The bake then replaces what is under it instead of being blended, which gives exactly the pixels of
+        drawing its tiles directly. Other runs are drawn tile by tile.
+        """
+        frame = self.driftwood.frame
+        tilemap = self.tilemap
+        key = (first, last) + chunk
+
+        if key in self.__unbaked:
+            for l, seqs in zip(range(first, last + 1), self.__unbaked[key]):
+                self.__draw_tiles(l, seqs, offset)
+            return
+
+        # Position and size of the chunk in pixels. Chunks on the right and bottom edges may be cut short.
+        x = chunk[0] * self.CHUNK_SIZE * tilemap.tilewidth
+        y = chunk[1] * self.CHUNK_SIZE * tilemap.tileheight
+        w = min(self.CHUNK_SIZE, tilemap.width - chunk[0] * self.CHUNK_SIZE) * tilemap.tilewidth
+        h = min(self.CHUNK_SIZE, tilemap.height - chunk[1] * self.CHUNK_SIZE) * tilemap.tileheight
+
+        tex = self.__bakes.get(key)
+        if tex:
+            self.__bakes.move_to_end(key)
+
+        else:
+            # Leave out the tiles hidden under opaque tiles above them.
+            cover, lowest = self.__cover(*chunk)
+            layers = [[seq for seq in self.__chunk(l, *chunk)[0] if cover.get(seq, -1) <= l]
+                      for l in range(first, last + 1)]
+            self._counts["tiles_culled"] += (sum(len(self.__chunk(l, *chunk)[0]) for l in range(first, last + 1)) -
+                                             sum(len(seqs) for seqs in layers))
+            if not any(layers):
+                return  # Nothing to bake.
+
+            if lowest < first:
+                # Something shows through the run here, so it can't be baked.
+                self.__unbaked[key] = layers
+                for l, seqs in zip(range(first, last + 1), layers):
+                    self.__draw_tiles(l, seqs, offset)
+                return
+
+            tex = frame._create_target(w, h)
+            if not tex:
+                return
+            frame._begin_target(tex)
+            for l, seqs in zip(range(first, last + 1), layers):
+                self.__draw_tiles(l, seqs, (-x, -y))
+            frame._end_target()
+            SDL_SetTextureBlendMode(tex, SDL_BLENDMODE_NONE)
+
+            self.__bakes[key] = tex
+            self.__bakebytes += w * h * 4
+
+            # Stay within budget by destroying the bakes drawn longest ago.
+            while self.__bakebytes > self.BAKE_BUDGET and len(self.__bakes) > 1:
+                self.__destroy_bake(next(iter(self.__bakes)))
+
+        frame._copy(tex, [0, 0, w, h], [x + offset[0], y + offset[1], w, h])
+
+    def __destroy_bake(self, key: Tuple[int, int, int, int]) -> None:
+        """Destroy a chunk bake and give back its memory budget.
+        """
+        tex = self.__bakes.pop(key)
+        w, h = c_int(), c_int()
+        SDL_QueryTexture(tex, None, None, byref(w), byref(h))
+        self.__bakebytes -= w.value * h.value * 4
+        SDL_DestroyTexture(tex)
+
+    def __draw_tiles(self, l: int, seqs: List[int], offset: List[int]) -> None:
+        """Draw the tiles with the given sequence numbers from layer l, one draw call per tileset.
+        """
+        tilemap = self.tilemap
+
+        table = tilemap._gid_table()
+        if table and len(seqs) >= self.VECTOR_THRESHOLD and tilemap.layers[l]._grid is not None:
+            self.__draw_tiles_vectorized(l, seqs, offset, table)
+            return
+
+        width = tilemap.width
         tilewidth = tilemap.tilewidth
         tileheight = tilemap.tileheight
-        offset = self.offset
+        graphic = tilemap.layers[l]._graphic
+        frame = self.driftwood.frame
+        quads = self.__quads
+        drawn = 0
 
-        # Find the tiles that will show up if we draw them.
-        x_begin, x_end, y_begin, y_end = self.calculate_visible_tile_bounds()
+        # Gather each tile into the batch for its tileset.
+        for seq in seqs:
+            # Retrieve data about the tile.
+            tileset, member = graphic(seq)
 
-        # Start with the bottom layer and work up.
-        for l in range(len(tilemap.layers)):
-            layer = tilemap.layers[l]
-
-            srcrect = [-1, -1, tilewidth, tileheight]
-            dstrect = [-1, -1, tilewidth, tileheight]
-
-            # Draw each tile in the layer into its position.
-            for y in range(y_begin, y_end + 1):
-                for x in range(x_begin, x_end + 1):
-                    # Retrieve data about the tile.
-                    tile = layer.tiles[y * tilemap.width + x]
-                    tileset = tile.tileset
-
-                    if not tileset and not tile.gid:
-                        # This is a dummy tile, don't draw it.
-                        continue
-
-                    member = tile.members[tile._Tile__cur_member]
-
-                    if member == -1:
-                        # This tile is invisible at this point in its animation, don't draw it.
-                        continue
-
-                    # Get the source and destination rectangles needed by SDL_RenderCopy.
-                    srcrect[0] = member % tileset.width * tilewidth
-                    srcrect[1] = member // tileset.width * tileheight
-
-                    dstrect[0] = x * tilewidth + offset[0]
-                    dstrect[1] = y * tileheight + offset[1]
-
-                    # Copy the tile onto our frame.
-                    r = self.driftwood.frame.copy(tileset.texture, srcrect, dstrect)
-                    if r < 0:
-                        self.driftwood.log.msg("ERROR", "Area", "__build_frame", "SDL", SDL_GetError())
-
-            # Draw the lights onto the layer.
-            for light in self.driftwood.light.layer(l):
-                srcrect = 0, 0, light.lightmap.width, light.lightmap.height
-                dstrect = [light.x - light.w // 2, light.y - light.h // 2, light.w, light.h]
-                dstrect[0] += self.offset[0]
-                dstrect[1] += self.offset[1]
-
-                r = self.driftwood.frame.copy(light.lightmap.texture, srcrect, dstrect, alpha=light.alpha,
-                                              blendmode=light.blendmode, colormod=light.colormod)
-                if r < 0:
-                    self.driftwood.log.msg("ERROR", "Area", "__build_frame", "SDL", SDL_GetError())
-
-            arearect = (
-                0,
-                0,
-                self.tilemap.width * self.tilemap.tilewidth,
-                self.tilemap.height * self.tilemap.tileheight,
-            )
-
-            tall_parts = []
-
-            # Draw each entity on the layer into its position.
-            for entity in self.driftwood.entity.layer(l):
-                tall_amount = entity.height - self.tilemap.tileheight
-
-                # Get the destination rectangle needed by SDL_RenderCopy.
-                dstrect = [entity.x, entity.y - tall_amount, entity.width, entity.height]
-
-                # Draw the layers of the entity.
-                for srcrect in entity.srcrect():
-                    srcrect = list(srcrect)
-                    # Clip entities so they don't appear outside the area.
-                    clip_left = 0 if arearect[0] <= dstrect[0] else arearect[0] - dstrect[0]
-                    clip_top = 0 if arearect[1] <= dstrect[1] else arearect[1] - dstrect[1]
-                    clip_right = 0 if dstrect[0] + dstrect[2] <= arearect[2] \
-                        else (dstrect[0] + dstrect[2]) - arearect[2]
-                    clip_bot = 0 if dstrect[1] + dstrect[3] <= arearect[3] \
-                        else (dstrect[1] + dstrect[3]) - arearect[3]
-
-                    srcrect[0] += clip_left
-                    dstrect[0] += clip_left
-                    srcrect[1] += clip_top
-                    dstrect[1] += clip_top
-                    srcrect[2] -= clip_left + clip_right
-                    dstrect[2] -= clip_left + clip_right
-                    srcrect[3] -= clip_top + clip_bot
-                    dstrect[3] -= clip_top + clip_bot
-
-                    # Area rumble et al.
-                    dstrect[0] += self.offset[0]
-                    dstrect[1] += self.offset[1]
-
-                    # Copy the entity onto our frame.
-                    r = self.driftwood.frame.copy(entity.spritesheet.texture, srcrect, dstrect)
-                    if r < 0:
-                        self.driftwood.log.msg("ERROR", "Area", "__build_frame", "SDL", SDL_GetError())
-
-                    if tall_amount:  # It's taller than the tile. Figure out where to put the tall part.
-                        dstrect = [entity.x, entity.y - tall_amount, entity.width,
-                                   entity.height - (entity.height - tall_amount)]
-
-                        srcrect[3] = dstrect[3]
-
-                        # Clip entities so they don't appear outside the area.
-                        clip_left = 0 if arearect[0] <= dstrect[0] else arearect[0] - dstrect[0]
-                        clip_top = 0 if arearect[1] <= dstrect[1] else arearect[1] - dstrect[1]
-                        clip_right = 0 if dstrect[0] + dstrect[2] <= arearect[2] \
-                            else (dstrect[0] + dstrect[2]) - arearect[2]
-                        clip_bot = 0 if dstrect[1] + dstrect[3] <= arearect[3] \
-                            else (dstrect[1] + dstrect[3]) - arearect[3]
-
-                        srcrect[0] += clip_left
-                        dstrect[0] += clip_left
-                        srcrect[1] += clip_top
-                        dstrect[1] += clip_top
-                        srcrect[2] -= clip_left + clip_right
-                        dstrect[2] -= clip_left + clip_right
-                        srcrect[3] -= clip_top + clip_bot
-                        dstrect[3] -= clip_top + clip_bot
-
-                        # Area rumble et al.
-                        dstrect[0] += self.offset[0]
-                        dstrect[1] += self.offset[1]
-
-                        tall_parts.append([entity.spritesheet.texture, srcrect, dstrect])
-
-                # Draw the tall bits here.
-                for tall in tall_parts:
-                    r = self.driftwood.frame.copy(*tall)
-                    if r < 0:
-                        self.driftwood.log.msg("ERROR", "Area", "__build_frame", "SDL", SDL_GetError())
+            if member == -1:
+                # This is a dummy tile, or invisible at this point in its animation, don't draw it.
+                continue
+
+            batch = quads.get(tileset.name)
+            if batch is None:
+                batch = frame._quad_batch(tileset.texture, tileset.image.width, tileset.image.height,
+                                          tileset.srcrects, tileset.rects)
+                quads[tileset.name] = batch
+
+            # Queue the tile's graphic from the tileset's table at its position.
+            batch.add(member, seq % width * tilewidth + offset[0], seq // width * tileheight + offset[1])
+            drawn += 1
+
+        self._counts["tiles_drawn"] += drawn
+
+        # Tiles in a layer never overlap, so the order of the tilesets is free.
+        for batch in quads.values():
+            frame._draw_quads(batch)
+
+    def __draw_tiles_vectorized(self, l: int, seqs: List[int], offset: List[int], table: list) -> None:
+        """Draw tiles like __draw_tiles(), but work out the graphics and positions of all of them at once with NumPy.
+
+        Only animated tiles and tiles with animations of their own are looked up one by one.
+        """
+        tilemap = self.tilemap
+        layer = tilemap.layers[l]
+        frame = self.driftwood.frame
+        quads = self.__quads
+        kind, tileset_index, member, tilesets = table
+
+        seqs = numpy.asarray(seqs)
+        gids = layer._grid.ravel()[seqs]
+        gids = numpy.where(gids < len(kind), gids, 0)
+        indices = tileset_index[gids]
+        members = member[gids]
+
+        special = kind[gids] == 2
+        if layer._types:
+            special |= numpy.isin(seqs, list(layer._types))
+        for i in numpy.flatnonzero(special).tolist():
+            tileset, members[i] = layer._graphic(int(seqs[i]))
+            indices[i] = tilesets.index(tileset) if tileset else -1
+
+        # Leave out dummy tiles, and tiles invisible at this point in their animation.
+        shown = (indices != -1) & (members != -1)
+        xs = seqs % tilemap.width * tilemap.tilewidth + offset[0]
+        ys = seqs // tilemap.width * tilemap.tileheight + offset[1]
+
+        for n in numpy.unique(indices[shown]).tolist():
+            tileset = tilesets[n]
+            batch = quads.get(tileset.name)
+            if batch is None:
+                batch = frame._quad_batch(tileset.texture, tileset.image.width, tileset.image.height,
+                                          tileset.srcrects, tileset.rects)
+                quads[tileset.name] = batch
+
+            selected = shown & (indices == n)
+            batch.add_array(members[selected], xs[selected], ys[selected])
+
+        self._counts["tiles_drawn"] += int(numpy.count_nonzero(shown))
+
+        for batch in quads.values():
+            frame._draw_quads(batch)
 
     def calculate_visible_tile_bounds(self) -> [int]:
         tilemap = self.tilemap
@@ -310,8 +846,8 @@ class AreaManager:
 
         viewport_width, viewport_height = self.driftwood.window.resolution()
 
-        viewport_left_bound = -self.driftwood.frame._frame[2].x
-        viewport_top_bound = -self.driftwood.frame._frame[2].y
+        viewport_left_bound = self.driftwood.frame.camera[0]
+        viewport_top_bound = self.driftwood.frame.camera[1]
         viewport_right_bound = viewport_left_bound + viewport_width
         viewport_bottom_bound = viewport_top_bound + viewport_height
 
@@ -26,6 +26,7 @@
 # **********
 
 import gc
+import sys
 from typing import Any, KeysView, Optional
 
 
@@ -165,6 +166,14 @@ class CacheManager:
 
         return True
 
+    def _resident_bytes(self) -> int:
+        """Estimate the memory held by the files in the cache, for statistics.
+
+        Returns:
+            Size in bytes.
+        """
+        return sum(sys.getsizeof(entry["contents"]) for entry in self.__cache.values())
+
     def clean(self) -> bool:
         """Perform garbage collection on expired files.
 
@@ -120,6 +120,10 @@ class ConfigManager:
         parser.add_argument("--maxfps", nargs=1, dest="maxfps", type=int, metavar="<fps>", help="set max fps")
         parser.add_argument("--mvol", nargs=1, dest="mvol", type=int, metavar="<0-128>", help="set music volume")
         parser.add_argument("--svol", nargs=1, dest="svol", type=int, metavar="<0-128>", help="set sfx volume")
+        parser.add_argument("--headless", default=None, action="store_true", dest="headless",
+                            help="render offscreen without a display")
+        parser.add_argument("--checksum", default=None, action="store_true", dest="checksum",
+                            help="read back and checksum each frame")
 
         group1 = parser.add_mutually_exclusive_group()
         group1.add_argument("--window", default=None, action="store_false", dest="fullscreen",
@@ -239,6 +243,16 @@ class ConfigManager:
             else:
                 self.__config["window"]["fullscreen"] = False
 
+        if self.__cmdline_args.headless:
+            self.__config["window"]["headless"] = True
+        elif "headless" not in self.__config["window"]:
+            self.__config["window"]["headless"] = False
+
+        if self.__cmdline_args.checksum:
+            self.__config["window"]["checksum"] = True
+        elif "checksum" not in self.__config["window"]:
+            self.__config["window"]["checksum"] = False
+
         if self.__cmdline_args.verbose is not None:
             if self.__cmdline_args.verbose:
                 self.__config["log"]["verbose"] = True
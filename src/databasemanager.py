@@ -25,11 +25,14 @@
 # IN THE SOFTWARE.
 # **********
 
-import json
+import contextlib
 import os
 import sys
 import ubjson
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
+
+# Marks a key removed inside a transaction buffer.
+_REMOVED = object()
 
 
 class DatabaseManager:
@@ -57,6 +60,9 @@ class DatabaseManager:
         # Has the database changed in memory?
         self.__changed = False
 
+        # Buffered writes of the open transaction, if any. Removed keys map to _REMOVED.
+        self.__pending = None
+
         # Make sure the database directory is accessible.
         if not self.__test_db_dir():
             sys.exit(1)  # Fail.
@@ -71,6 +77,8 @@ class DatabaseManager:
         self.driftwood.tick.register(self._tick, during_pause=True)
 
     def __contains__(self, item: str) -> bool:
+        if self.__pending is not None and item in self.__pending:
+            return self.__pending[item] is not _REMOVED
         if item in self.__database:
             return True
         return False
@@ -102,6 +110,10 @@ class DatabaseManager:
             self.driftwood.log.msg("ERROR", "Database", "open", "bad argument", e)
             return None
 
+        if self.__pending is not None:
+            self.driftwood.log.msg("ERROR", "Database", "open", "cannot open a database inside a transaction")
+            return False
+
         self.flush()  # Write the current database to disk first.
 
         filename = os.path.join(self.driftwood.config["database"]["root"], filename)
@@ -141,8 +153,17 @@ class DatabaseManager:
             self.driftwood.log.msg("ERROR", "Cache", "get", "bad argument", e)
             return None
 
-        # Get the key.
-        if key in self.__database:
+        # Get the key, looking at the open transaction first.
+        if self.__pending is not None and key in self.__pending:
+            if self.__pending[key] is not _REMOVED:
+                self.driftwood.log.info("Database", "get", "\"{0}\"".format(key))
+                return self.__pending[key]
+            else:
+                # Removed in the open transaction.
+                self.driftwood.log.msg("ERROR", "Database", "get", "no such key", "\"{0}\"".format(key))
+                return None
+
+        elif key in self.__database:
             self.driftwood.log.info("Database", "get", "\"{0}\"".format(key))
             return self.__database[key]
 
@@ -169,14 +190,16 @@ class DatabaseManager:
             return None
 
         # Is it serializable?
-        try:
-            ret = json.dumps(obj)
-        except TypeError:
+        if not self.__serializable(obj):
             self.driftwood.log.msg("ERROR", "Database", "put", "bad object type for key", "\"{0}\"".format(key))
             return False
 
-        self.__database[key] = obj
-        self.__changed = True
+        if self.__pending is not None:
+            # Buffer the write until the transaction commits.
+            self.__pending[key] = obj
+        else:
+            self.__database[key] = obj
+            self.__changed = True
         self.driftwood.log.info("Database", "put", "\"{0}\"".format(key))
         return True
 
@@ -198,15 +221,65 @@ class DatabaseManager:
             return None
 
         # Remove the key.
-        if key in self.__database:
-            del self.__database[key]
+        if key in self:
+            if self.__pending is not None:
+                # Buffer the removal until the transaction commits.
+                self.__pending[key] = _REMOVED
+            else:
+                del self.__database[key]
+                self.__changed = True
             self.driftwood.log.info("Database", "remove", "\"{0}\"".format(key))
-            self.__changed = True
             return True
         else:
             self.driftwood.log.msg("ERROR", "Database", "remove", "no such key", "\"{0}\"".format(key))
             return False
 
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator['DatabaseManager']:
+        """Group several writes into one atomic change.
+
+        Use as "with Driftwood.database.transaction():". Puts and removes inside the block are buffered and only
+        applied when the block exits normally, marking the database changed once so it is written to disk in a single
+        pass. If the block raises an exception, every buffered change is discarded and the exception propagates.
+
+        Transactions may be nested. An inner transaction that raises only rolls back its own changes, and nothing
+        is applied until the outermost transaction commits.
+
+        Yields:
+            This DatabaseManager instance.
+        """
+        outermost = self.__pending is None
+        if outermost:
+            self.__pending = {}
+            savepoint = None
+        else:
+            savepoint = dict(self.__pending)
+
+        try:
+            yield self
+
+        except BaseException:
+            # Roll back to where this transaction started.
+            if outermost:
+                self.__pending = None
+            else:
+                self.__pending = savepoint
+            self.driftwood.log.info("Database", "transaction", "rolled back")
+            raise
+
+        if outermost:
+            # Commit.
+            pending, self.__pending = self.__pending, None
+            for key, obj in pending.items():
+                if obj is _REMOVED:
+                    if key in self.__database:
+                        del self.__database[key]
+                else:
+                    self.__database[key] = obj
+            if pending:
+                self.__changed = True
+            self.driftwood.log.info("Database", "transaction", "committed {0} key(s)".format(len(pending)))
+
     def flush(self) -> bool:
         """Force the database to write to disk now.
         
@@ -218,6 +291,40 @@ class DatabaseManager:
         self.driftwood.log.info("Database", "flush", self.filename)
         return True
 
+    @staticmethod
+    def __serializable(obj: Any) -> bool:
+        """Check that an object only contains types JSON and UBJSON can store.
+
+        This walks the structure instead of serializing it, so it costs one type check per contained value. Subclasses
+        are accepted like both serializers accept them, such as an OrderedDict or an IntEnum.
+        """
+        stack = [obj]
+        path = set()  # Containers being walked, to catch reference cycles.
+        while stack:
+            item = stack.pop()
+            if item is path:  # Marker: we are leaving the container below it.
+                path.discard(id(stack.pop()))
+                continue
+
+            if item is None or isinstance(item, (int, float, str)):
+                continue
+
+            if not isinstance(item, (list, tuple, dict)) or id(item) in path:
+                return False
+
+            path.add(id(item))
+            stack.append(item)
+            stack.append(path)
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    if not isinstance(key, str):
+                        return False
+                    stack.append(value)
+            else:
+                stack.extend(item)
+
+        return True
+
     def __test_db_dir(self) -> bool:
         """Test if we can create or open the database directory.
         """
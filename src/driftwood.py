@@ -126,6 +126,12 @@ class Driftwood:
         if evtype is self.input.ONDOWN:
             pdb.set_trace()
 
+    def _stats(self, evtype: int) -> None:
+        """Show or hide the statistics overlay if the stats key is pressed.
+        """
+        if evtype is self.input.ONDOWN:
+            self.frame.toggle_stats()
+
     def _run(self) -> int:
         """Perform startup procedures and enter the mainloop.
         """
@@ -142,9 +148,10 @@ class Driftwood:
             # Escape key pauses the engine.
             self.input.register(self.keycode.SDLK_ESCAPE, self._handle_pause)
 
-            # Register the debug console key if debug mode is enabled.
+            # Register the debug console and statistics keys if debug mode is enabled.
             if self.config["input"]["debug"]:
                 self.input.register("console", self._console)
+                self.input.register("stats", self._stats)
 
             # This is the mainloop.
             while self.running:
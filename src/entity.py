@@ -28,7 +28,7 @@
 import entitymanager
 import spritesheet
 import tile
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple
 
 
 class Entity:
@@ -93,9 +93,9 @@ class Entity:
         self.collision = []
         self.travel = False
         self.spritesheet = None
-        self.layer = 0
-        self.x = 0
-        self.y = 0
+        self.__layer = 0
+        self.__x = 0
+        self.__y = 0
         self.tile = None
         self.width = 0
         self.height = 0
@@ -127,7 +127,37 @@ class Entity:
 
         self._on_kill = None
 
-    def srcrect(self) -> List[List[int]]:
+        self.__drawn = None  # Where we were last marked to be redrawn.
+
+    # The position is kept in the EntityManager's spatial hash whenever it changes.
+    @property
+    def layer(self) -> int:
+        return self.__layer
+
+    @layer.setter
+    def layer(self, value: int) -> None:
+        self.__layer = value
+        self.manager._moved(self)
+
+    @property
+    def x(self) -> int:
+        return self.__x
+
+    @x.setter
+    def x(self, value: int) -> None:
+        self.__x = value
+        self.manager._moved(self)
+
+    @property
+    def y(self) -> int:
+        return self.__y
+
+    @y.setter
+    def y(self, value: int) -> None:
+        self.__y = value
+        self.manager._moved(self)
+
+    def srcrect(self) -> List[Tuple[int, int, int, int]]:
         """Return a list of (x, y, w, h) srcrects for the layers of the current graphic frame of the entity.
         """
         if self.__cur_member < len(self.members):
@@ -137,21 +167,13 @@ class Entity:
             current_member = self.members[0]
 
         if current_member is not -1:
+            table = self.spritesheet.srcrects(self.width, self.height)
             if type(current_member) is list:  # This is a layered member.
-                ret = []
-                for layer in current_member:
-                    ret.append(
-                        [((layer * self.width) % self.spritesheet.imagewidth),
-                         ((layer * self.width) // self.spritesheet.imagewidth) * self.height,
-                         self.width, self.height]
-                    )
-                return ret
-            else:
-                return [[((current_member * self.width) % self.spritesheet.imagewidth),
-                         ((current_member * self.width) // self.spritesheet.imagewidth) * self.height,
-                         self.width, self.height]]
+                return [table[layer] if layer < len(table) else (0, 0, 0, 0) for layer in current_member]
+            elif current_member < len(table):
+                return [table[current_member]]
 
-        return [[0, 0, 0, 0]]
+        return [(0, 0, 0, 0)]
 
     def set_stance(self, stance: str) -> bool:
         """Set the current stance and return true if succeeded, false if failed.
@@ -222,10 +244,24 @@ class Entity:
         elif self.manager.driftwood.tick.registered(self.__next_member):
             self.manager.driftwood.tick.unregister(self.__next_member)
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
         return True
 
+    def _invalidate(self) -> None:
+        """Mark where we were and where we are now to be redrawn.
+        """
+        area = self.manager.driftwood.area
+        tall_amount = self.height - self._tileheight
+        rect = [self.x, self.y - tall_amount, self.width, self.height]
+
+        if self.__drawn and self.__drawn != rect:
+            area.invalidate(self.__drawn)
+        area.invalidate(rect)
+        self.__drawn = rect
+
+        area._patch_commands(self)
+
     def _read(self, filename: str, data: dict, eid: int) -> None:
         """Read the entity descriptor.
         """
@@ -275,6 +311,11 @@ class Entity:
             y // self._tileheight
         )
 
+    def _is_player(self) -> bool:
+        """Return whether this entity is the player.
+        """
+        return bool(self.manager.player) and self.manager.player.eid == self.eid
+
     def _check_occupies(self) -> None:
         """Figure out which tiles we are partially occupying.
         """
@@ -293,11 +334,12 @@ class Entity:
 
         # Call the on_exit event if set.
         if "on_exit" in self.manager.driftwood.area.tilemap.properties:
-            args = self.manager.driftwood.area.tilemap.properties["on_exit"].split(',')
-            if len(args) < 2:
+            trigger = self.manager.driftwood.script._trigger(self.manager.driftwood.area.tilemap.properties["on_exit"])
+            if not trigger:
                 self.manager.driftwood.log.msg("ERROR", "Entity", "_do_exit", "invalid on_exit event",
-                                               self.tile.properties["on_exit"])
-            self.manager.driftwood.script.call(*args)
+                                               self.manager.driftwood.area.tilemap.properties["on_exit"])
+            else:
+                trigger()
 
         # Leave the current area
         self.manager.driftwood.area._blur()
@@ -355,64 +397,57 @@ class Entity:
         """Call the on_tile event if set.
         """
         if "on_tile" in self.tile.properties:
-            args = self.tile.properties["on_tile"].split(',')
-            if len(args) < 2:
+            trigger = self.manager.driftwood.script._trigger(self.tile.properties["on_tile"])
+            if not trigger:
                 self.manager.driftwood.log.msg("ERROR", "Entity", "_call_on_tile", "invalid on_tile event",
                                                self.tile.properties["on_tile"])
                 return
-            self.manager.driftwood.script.call(*args)
+            trigger()
 
     def _call_on_layer(self) -> None:
         """Call the on_layer event if set.
         """
         if "on_layer" in self.manager.driftwood.area.tilemap.layers[self.layer].properties:
-            args = self.manager.driftwood.area.tilemap.layers[self.layer].properties["on_layer"].split(',')
-            if len(args) < 2:
+            trigger = self.manager.driftwood.script._trigger(
+                self.manager.driftwood.area.tilemap.layers[self.layer].properties["on_layer"])
+            if not trigger:
                 self.manager.driftwood.log.msg("ERROR", "Entity", "_call_on_layer", "invalid on_layer event",
                                                self.layer)
                 return
-            self.manager.driftwood.script.call(*args)
+            trigger()
 
-    def _prepare_exit_dest(self, exit_dest: List[Optional[str]], tile: tile.Tile) -> List[Union[int, str, None]]:
-        """Prepare coordinates for teleport().
+    def _follow_exit(self, destination: str, tile: tile.Tile) -> None:
+        """Teleport through an exit within this area, or prepare to leave for another area.
+
+        Args:
+            destination: The exit's destination string, "area,layer,x,y".
+            tile: The tile the exit belongs to.
         """
-        # layer coordinate.
-        if not exit_dest[1]:  # Stays the same.
-            exit_dest[1] = None
-        elif exit_dest[1].startswith('+'):  # Increments upward.
-            exit_dest[1] = self.layer + int(exit_dest[1][1:])
-        elif exit_dest[1].startswith('-'):  # Increments downward.
-            exit_dest[1] = self.layer - int(exit_dest[1][1:])
-        else:  # Set to a specific coordinate.
-            exit_dest[1] = int(exit_dest[1])
-
-        # x coordinate.
-        if not exit_dest[2]:  # Stays the same.
-            exit_dest[2] = None
-        elif exit_dest[2].startswith('+'):  # Increments upward.
-            exit_dest[2] = tile.pos[0] + int(exit_dest[2][1:])
-        elif exit_dest[2].startswith('-'):  # Increments downward.
-            exit_dest[2] = tile.pos[0] - int(exit_dest[2][1:])
-        else:  # Set to a specific coordinate.
-            exit_dest[2] = int(exit_dest[2])
-
-        # y coordinate.
-        if not exit_dest[3]:  # Stays the same.
-            exit_dest[3] = None
-        elif exit_dest[3].startswith('+'):  # Increments upward.
-            exit_dest[3] = tile.pos[1] + int(exit_dest[3][1:])
-        elif exit_dest[3].startswith('-'):  # Increments downward.
-            exit_dest[3] = tile.pos[1] - int(exit_dest[3][1:])
-        else:  # Set to a specific coordinate.
-            exit_dest[3] = int(exit_dest[3])
-
-        return exit_dest
+        ex = self.manager._exit(destination)
+        if not ex:
+            return
+
+        if not ex.area:  # This area.
+            # Prepare coordinates for teleport().
+            exit_dest = ex.resolve(self.layer, tile.pos)
+
+            # Do the teleport.
+            self.teleport(exit_dest[1], exit_dest[2], exit_dest[3])
+
+        else:  # Another area.
+            self._next_area = list(ex.dest)
+
+    def _exit_dest(self, destination: str) -> Optional[List[str]]:
+        """Return the destination [area, layer, x, y] of an exit to another area, or None if it is invalid.
+        """
+        ex = self.manager._exit(destination)
+        return list(ex.dest) if ex else None
 
     def __next_member(self, seconds: float) -> None:
         """Set to change the animation frame.
         """
         self.__cur_member = (self.__cur_member + 1) % len(self.members)
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
     def _terminate(self) -> None:
         """Cleanup before deletion.
@@ -499,7 +534,7 @@ class TileModeEntity(Entity):
         if layer is not None:
             self._call_on_layer()
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
         return True
 
@@ -629,15 +664,17 @@ class TileModeEntity(Entity):
         ent = self.manager.entity_at(tile.pos[0] * self._tilewidth, tile.pos[1] * self._tileheight)
         if ent and "interact" in ent.properties:
             # Interact with entity.
-            args = ent.properties["interact"].split(',')
-            self.manager.driftwood.script.call(*args)
-            success = True
+            trigger = self.manager.driftwood.script._trigger(ent.properties["interact"])
+            if trigger:
+                trigger()
+                success = True
 
         # Check if this tile is interactable.
         if "interact" in tile.properties:
-            args = tile.properties["interact"].split(',')
-            self.manager.driftwood.script.call(*args)
-            success = True
+            trigger = self.manager.driftwood.script._trigger(tile.properties["interact"])
+            if trigger:
+                trigger()
+                success = True
 
         return success
 
@@ -677,75 +714,50 @@ class TileModeEntity(Entity):
         if y not in [-1, 0, 1]:
             y = 0
 
-        # Perform collision detection.
-        dsttile = self.manager.driftwood.area.tilemap.layers[self.layer].tile(self.tile.pos[0] + x,
-                                                                              self.tile.pos[1] + y)
-
         if not self.tile or self._next_tile:  # Bizarre situation, abort.
             return False
         elif self.tile:
+            # Perform collision detection.
+            dstlayer = self.manager.driftwood.area.tilemap.layers[self.layer]
+            dstseq = dstlayer._seq(self.tile.pos[0] + x, self.tile.pos[1] + y)
+
             # Don't walk on nowalk tiles or off the edge of the map unless there's a lazy exit.
-            if dsttile:  # Does a tile exist where we're going?
+            if dstseq != -1:  # Does a tile exist where we're going?
                 if "tile" in self.collision:  # We are colliding with tiles.
-                    if dsttile.nowalk or dsttile.nowalk == "":
-                        # Is the tile a player or npc specific nowalk?
-                        if (dsttile.nowalk == "player" and self.manager.player.eid == self.eid
-                            or dsttile.nowalk == "npc" and self.manager.player.eid != self.eid):
-                            self._collide(dsttile)
-                            return False
-
-                        # Any other values are an unconditional nowalk.
-                        elif dsttile.nowalk not in ["player", "npc"]:
-                            self._collide(dsttile)
-                            return False
+                    if dstlayer._blocks(dstseq, self._is_player()):
+                        self._collide(dstlayer.tiles[dstseq])
+                        return False
 
                 # Prepare exit from the previous tile.
                 for ex in self.tile.exits.keys():
                     if (ex == "exit:up" and y == -1) or (ex == "exit:down" and y == 1) or (
                                     ex == "exit:left" and x == -1) or (ex == "exit:right" and x == 1):
-                        exit_dest = self.tile.exits[ex].split(',')
-                        if not exit_dest[0]:  # This area.
-                            # Prepare coordinates for teleport().
-                            exit_dest = self._prepare_exit_dest(exit_dest, self.tile)
-
-                            # Do the teleport.
-                            self.teleport(exit_dest[1], exit_dest[2], exit_dest[3])
-
-                        else:  # Another area.
-                            self._next_area = exit_dest
+                        self._follow_exit(self.tile.exits[ex], self.tile)
 
                 # Prepare exit for this tile.
-                for ex in dsttile.exits.keys():
-                    if ex == "exit":
-                        exit_dest = dsttile.exits[ex].split(',')
-                        if not exit_dest[0]:  # This area.
-                            # Prepare coordinates for teleport().
-                            exit_dest = self._prepare_exit_dest(exit_dest, dsttile)
-
-                            # Tell teleport() we got here by walking onto an exit.
-                            # self._cw_teleport = True
-                            self.teleport(exit_dest[1], exit_dest[2], exit_dest[3])
-                            # self._cw_teleport = False
-
-                        else:  # Another area.
-                            self._next_area = exit_dest
+                if dstlayer._has_exits(dstseq):
+                    dsttile = dstlayer.tiles[dstseq]
+                    if "exit" in dsttile.exits:
+                        self._follow_exit(dsttile.exits["exit"], dsttile)
 
             else:  # Are we allowed to walk off the edge of the area to follow a lazy exit?
+                next_area = None
                 if "exit:up" in self.tile.exits and y == -1:
-                    self._next_area = self.tile.exits["exit:up"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:up"])
 
                 elif "exit:down" in self.tile.exits and y == 1:
-                    self._next_area = self.tile.exits["exit:down"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:down"])
 
                 elif "exit:left" in self.tile.exits and x == -1:
-                    self._next_area = self.tile.exits["exit:left"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:left"])
 
                 elif "exit:right" in self.tile.exits and x == 1:
-                    self._next_area = self.tile.exits["exit:right"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:right"])
 
-                else:
-                    self._collide(dsttile)
+                if not next_area:  # No lazy exit this way, or an invalid one, which was logged.
+                    self._collide(None)
                     return False
+                self._next_area = next_area
 
         # Entity collision detection.
         if "entity" in self.collision:
@@ -757,35 +769,39 @@ class TileModeEntity(Entity):
     def __detect_entity_collision(self, x: int, y: int) -> bool:
         """Detect if this entity will collide with another.
         """
-        for eid in self.manager.entities:
+        dsttile = self.tile.offset(*self._last_walk)
+        if not dsttile:  # Walking off the edge of the area.
+            return True
+
+        # Only entities within a tile of where we're going can be on it or moving onto or off of it.
+        near = [(dsttile.pos[0] - 1) * self._tilewidth, (dsttile.pos[1] - 1) * self._tileheight,
+                3 * self._tilewidth, 3 * self._tileheight]
+
+        for ent in self.manager.entities_in_rect(self.layer, near):
             # This is us.
-            if eid == self.eid:
+            if ent.eid == self.eid:
                 continue
-            ent = self.manager.entities[eid]
             # Collision detection.
-            if ent.layer == self.layer:  # Are we on the same layer?
-                if ent.mode is "tile":  # Checking against another tile mode entity.
-                    # It's moving. What tile is it moving to? Are we trying to move to the same tile?
-                    if ent.walking and ("next" in self.collision) and \
-                                    self.tile.offset(*self._last_walk) is ent.tile.offset(*ent.walking):
-                        self.manager.collision(self, self.manager.entities[eid])
-                        return False
+            if ent.mode is "tile":  # Checking against another tile mode entity.
+                # It's moving. What tile is it moving to? Are we trying to move to the same tile?
+                if ent.walking and ("next" in self.collision) and dsttile == ent.tile.offset(*ent.walking):
+                    self.manager.collision(self, ent)
+                    return False
 
-                    # What tile is it moving from? Are we trying to occupy that tile?
-                    if ent.walking and ("prev" in self.collision) and self.tile.offset(*self._last_walk) is ent.tile:
-                        self.manager.collision(self, self.manager.entities[eid])
-                        return False
+                # What tile is it moving from? Are we trying to occupy that tile?
+                if ent.walking and ("prev" in self.collision) and dsttile == ent.tile:
+                    self.manager.collision(self, ent)
+                    return False
 
-                    # Is it standing still? Don't step on it.
-                    if not ent.walking and ("here" in self.collision) and \
-                                    self.tile.offset(*self._last_walk) is ent.tile:
-                        self.manager.collision(self, self.manager.entities[eid])
-                        return False
+                # Is it standing still? Don't step on it.
+                if not ent.walking and ("here" in self.collision) and dsttile == ent.tile:
+                    self.manager.collision(self, ent)
+                    return False
 
-                elif ent.mode is "pixel":  # Checking against a pixel mode entity.
-                    # Does a pixel mode entity occupy any part of this tile?
-                    if self.tile.offset(*self._last_walk) in ent._occupies:
-                        return False
+            elif ent.mode is "pixel":  # Checking against a pixel mode entity.
+                # Does a pixel mode entity occupy any part of this tile?
+                if dsttile in ent._occupies:
+                    return False
 
         return True
 
@@ -810,13 +826,13 @@ class TileModeEntity(Entity):
     def __inch_along(self, seconds_past: float) -> None:
         """Set our incremental position for rendering as we move between tiles.
         """
-        self.manager.driftwood.area.changed = True
-
         self._partial_xy[0] += self.walking[0] * self.speed * seconds_past
         self._partial_xy[1] += self.walking[1] * self.speed * seconds_past
         self.x = int(self._partial_xy[0])
         self.y = int(self._partial_xy[1])
 
+        self._invalidate()
+
     def __is_at_next_tile(self) -> bool:
         """Check if we've reached or overreached our destination."""
         # tileheight = self.manager.driftwood.area.tilemap.tileheight
@@ -842,6 +858,7 @@ class TileModeEntity(Entity):
                 self.y = self.tile.pos[1] * tilemap.tileheight
                 self._partial_xy = [self.x, self.y]
                 self._prev_xy = [self.x, self.y]
+                self._invalidate()
 
                 self._next_tile = None
                 self._walk_stop()
@@ -867,6 +884,7 @@ class TileModeEntity(Entity):
         if self.tile:
             self.x = self.tile.pos[0] * tilewidth
             self.y = self.tile.pos[1] * tileheight
+            self._invalidate()
 
         self.walk_state = Entity.NOT_WALKING
         self.walking = []
@@ -941,7 +959,7 @@ class PixelModeEntity(Entity):
         if layer is not None:
             self._call_on_layer()
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
         return True
 
@@ -1025,7 +1043,7 @@ class PixelModeEntity(Entity):
             self.__arrive_at_tile()  # Arrive at a tile.
             return True
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
         return can_walk
 
@@ -1076,20 +1094,24 @@ class PixelModeEntity(Entity):
         if not tile:
             return False
 
-        # Check if this tile contains an interactable entity.
-        # FIXME: This will not work in pixel mode. Need to either iterate entities or let tiles know of occupants.
-        ent = self.manager.entity_at(tile.pos[0] * self._tilewidth, tile.pos[1] * self._tileheight)
-        if ent and "interact" in ent.properties:
-            # Interact with entity.
-            args = ent.properties["interact"].split(',')
-            self.manager.driftwood.script.call(*args)
-            success = True
+        # Check if this tile contains an interactable entity. Pixel mode entities can stand anywhere on it.
+        for ent in self.manager.entities_in_rect(self.layer, [tile.pos[0] * self._tilewidth,
+                                                              tile.pos[1] * self._tileheight,
+                                                              self._tilewidth, self._tileheight]):
+            if ent.eid != self.eid and "interact" in ent.properties:
+                # Interact with entity.
+                trigger = self.manager.driftwood.script._trigger(ent.properties["interact"])
+                if trigger:
+                    trigger()
+                    success = True
+                break
 
         # Check if this tile is interactable.
         if "interact" in tile.properties:
-            args = tile.properties["interact"].split(',')
-            self.manager.driftwood.script.call(*args)
-            success = True
+            trigger = self.manager.driftwood.script._trigger(tile.properties["interact"])
+            if trigger:
+                trigger()
+                success = True
 
         return success
 
@@ -1098,12 +1120,14 @@ class PixelModeEntity(Entity):
         of the entity, rather than its edge, collides with the edge of the tile. Alternatively you can look at it as the
         edge of the entity colliding with the center of the tile.
         """
+        return self.manager.driftwood.area.tilemap.layers[layer].tile(*self._cross(x, y))
+
+    def _cross(self, x: int, y: int) -> Tuple[float, float]:
+        """Return the position in tiles of the tile we are about to cross onto at this position in pixels.
+        """
         # FIXME: This hasn't been tested with entities that aren't the same size as the tile.
         # The player is only barely taller, so we wouldn't notice any issues.
-        return self.manager.driftwood.area.tilemap.layers[layer].tile(
-            (x + (self.width / 2)) // self._tilewidth,
-            (y + (self.height / 2)) // self._tileheight
-        )
+        return (x + (self.width / 2)) // self._tilewidth, (y + (self.height / 2)) // self._tileheight
 
     def _walk_stop(self) -> None:
         """Stop walking.
@@ -1156,7 +1180,7 @@ class PixelModeEntity(Entity):
         if self.tile != prev_tile:  # We must be on a new tile now.
             self.__arrive_at_tile()
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
 
     def __can_walk(self, x: int, y: int, absolute: bool = False) -> bool:
         """Check if nothing is preventing us from walking in this direction.
@@ -1165,74 +1189,43 @@ class PixelModeEntity(Entity):
             self._next_tile = self.layer, self.x + x, self.y + y
         else:
             self._next_tile = self.layer, x, y
-        dsttile = self._tile_cross(*self._next_tile)
+        dstlayer = self.manager.driftwood.area.tilemap.layers[self._next_tile[0]]
+        dstseq = dstlayer._seq(*self._cross(self._next_tile[1], self._next_tile[2]))
 
         if not self.tile:  # Bizarre situation, abort.
             return False
         else:
             # Don't walk on nowalk tiles or off the edge of the map unless there's a lazy exit.
-            if dsttile:  # Does a tile exist where we're going?
+            if dstseq != -1:  # Does a tile exist where we're going?
                 if "tile" in self.collision:  # We are colliding with tiles.
-                    if dsttile.nowalk or dsttile.nowalk == "":
-                        # Is the tile a player or npc specific nowalk?
-                        if (dsttile.nowalk == "player" and self.manager.player.eid == self.eid
-                            or dsttile.nowalk == "npc" and self.manager.player.eid != self.eid):
-                            self._collide(dsttile)
-                            return False
-
-                        # Any other values are an unconditional nowalk.
-                        elif dsttile.nowalk not in ["player", "npc"]:
-                            self._collide(dsttile)
-                            return False
-
-                # Prepare exit for this tile.
-                for ex in dsttile.exits.keys():
-                    if ex == "exit":
-                        exit_dest = dsttile.exits[ex].split(',')
-                        if not exit_dest[0]:  # This area.
-                            # Prepare coordinates for teleport().
-                            exit_dest = self._prepare_exit_dest(exit_dest, dsttile)
-
-                            # Tell teleport() we got here by walking onto an exit.
-                            # self._cw_teleport = True
-                            self.teleport(exit_dest[1], exit_dest[2], exit_dest[3])
-                            # self._cw_teleport = False
-
-                        else:  # Another area.
-                            self._next_area = exit_dest
+                    if dstlayer._blocks(dstseq, self._is_player()):
+                        self._collide(dstlayer.tiles[dstseq])
+                        return False
 
                 # Prepare exit for this tile.
-                for ex in dsttile.exits.keys():
-                    if ex == "exit":
-                        exit_dest = dsttile.exits[ex].split(',')
-                        if not exit_dest[0]:  # This area.
-                            # Prepare coordinates for teleport().
-                            exit_dest = self._prepare_exit_dest(exit_dest, dsttile)
-
-                            # Tell teleport() we got here by walking onto an exit.
-                            # self._cw_teleport = True
-                            self.teleport(exit_dest[1], exit_dest[2], exit_dest[3])
-                            # self._cw_teleport = False
-
-                        else:  # Another area.
-                            self._next_area = exit_dest
+                if dstlayer._has_exits(dstseq):
+                    dsttile = dstlayer.tiles[dstseq]
+                    if "exit" in dsttile.exits:
+                        self._follow_exit(dsttile.exits["exit"], dsttile)
 
             else:  # Are we allowed to walk off the edge of the area to follow a lazy exit?
+                next_area = None
                 if "exit:up" in self.tile.exits and y == -1:
-                    self._next_area = self.tile.exits["exit:up"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:up"])
 
                 elif "exit:down" in self.tile.exits and y == 1:
-                    self._next_area = self.tile.exits["exit:down"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:down"])
 
                 elif "exit:left" in self.tile.exits and x == -1:
-                    self._next_area = self.tile.exits["exit:left"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:left"])
 
                 elif "exit:right" in self.tile.exits and x == 1:
-                    self._next_area = self.tile.exits["exit:right"].split(',')
+                    next_area = self._exit_dest(self.tile.exits["exit:right"])
 
-                else:
-                    self._collide(dsttile)
+                if not next_area:  # No lazy exit this way, or an invalid one, which was logged.
+                    self._collide(None)
                     return False
+                self._next_area = next_area
 
         # Entity collision detection.
         if "entity" in self.collision:
@@ -1243,22 +1236,19 @@ class PixelModeEntity(Entity):
 
     def __detect_entity_collision(self, x: int, y: int) -> bool:
         # Detect if this entity will collide with another.
-        for eid in self.manager.entities:
+        for ent in self.manager.entities_in_rect(self.layer, [x, y, self.width, self.height]):
             # This is us.
-            if eid == self.eid:
+            if ent.eid == self.eid:
                 continue
-            ent = self.manager.entities[eid]
-            # Collision detection.
-            if ent.layer == self.layer:  # Are we on the same layer?
-                # Bounding box collision. Check if any of our corners or sides are inside another entity.
-                xw = x + self.width - 1  # Our right side.
-                yw = y + self.height - 1  # Our bottom side.
-                ex = ent.x  # Entity's left side.
-                ey = ent.y  # Entity's top side.
-                exw = ex + ent.width - 1  # Entity's right side.
-                eyw = ey + ent.height - 1  # Entity's bottom side.
-                if x < exw and ex < xw and y < eyw and ey < yw:
-                    return False
+            # Bounding box collision. Check if any of our corners or sides are inside another entity.
+            xw = x + self.width - 1  # Our right side.
+            yw = y + self.height - 1  # Our bottom side.
+            ex = ent.x  # Entity's left side.
+            ey = ent.y  # Entity's top side.
+            exw = ex + ent.width - 1  # Entity's right side.
+            eyw = ey + ent.height - 1  # Entity's bottom side.
+            if x < exw and ex < xw and y < eyw and ey < yw:
+                return False
         return True
 
     def __do_walk(self, x: int, y: int) -> None:
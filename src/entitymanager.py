@@ -28,9 +28,10 @@
 import jsonschema
 import sys
 import traceback
-from typing import ItemsView, List, Optional
+from typing import ItemsView, List, Optional, Tuple
 
 import entity
+import spatialhash
 import spritesheet
 from __schema__ import _SCHEMA
 
@@ -71,6 +72,12 @@ class EntityManager:
 
         self.__last_eid = -1
 
+        self.__spatial = {}  # {layer: SpatialHash of the entities by the rectangle they stand on}
+        self.__hashed_on = {}  # {eid: layer the entity is hashed on}
+
+        # Exit destinations, mapped by the string they were read from.
+        self.__exits = {}  # {"area,layer,x,y": _Exit or None if invalid}
+
     def __contains__(self, eid: int) -> bool:
         if self.entity(eid):
             return True
@@ -201,11 +208,62 @@ class EntityManager:
             self.driftwood.log.msg("ERROR", "Entity", "entity_at", "bad argument", e)
             return None
 
-        for eid in self.entities:
-            if self.entities[eid].x == x and self.entities[eid].y == y:
-                return self.entities[eid]
+        found = [ent for spatial in self.__spatial.values() for ent in spatial.query([x, y, 1, 1])
+                 if ent.x == x and ent.y == y]
+        if found:
+            return min(found, key=lambda by_eid: by_eid.eid)
         return None
 
+    def entities_in_rect(self, layer: int, rect: List[int]) -> List[_entity.Entity]:
+        """Retrieve a list of the entities on a layer that overlap a rectangle.
+
+        Args:
+            layer: Layer to find entities on.
+            rect: Rectangle [x, y, w, h] to look in, in pixels.
+
+        Returns: List of Entity class instances.
+        """
+        # Input Check
+        try:
+            CHECK(layer, int, _min=0)
+            CHECK(rect, list, _equals=4)
+            for n in rect:
+                CHECK(n, int)
+        except CheckFailure as e:
+            self.driftwood.log.msg("ERROR", "Entity", "entities_in_rect", "bad argument", e)
+            return []
+
+        if layer not in self.__spatial:
+            return []
+
+        # Put them in order of eid so they don't switch around if we iterate them.
+        return sorted(self.__spatial[layer].query(rect), key=lambda by_eid: by_eid.eid)
+
+    def entities_near(self, layer: int, x: int, y: int, radius: int) -> List[_entity.Entity]:
+        """Retrieve a list of the entities on a layer that come within a distance of a pixel coordinate.
+
+        The distance is measured along each axis, so this looks in a square around the coordinate.
+
+        Args:
+            layer: Layer to find entities on.
+            x: The x coordinate to look around.
+            y: The y coordinate to look around.
+            radius: Distance in pixels to look within.
+
+        Returns: List of Entity class instances.
+        """
+        # Input Check
+        try:
+            CHECK(layer, int, _min=0)
+            CHECK(x, int)
+            CHECK(y, int)
+            CHECK(radius, int, _min=0)
+        except CheckFailure as e:
+            self.driftwood.log.msg("ERROR", "Entity", "entities_near", "bad argument", e)
+            return []
+
+        return self.entities_in_rect(layer, [x - radius, y - radius, 2 * radius + 1, 2 * radius + 1])
+
     def layer(self, layer: int) -> List[_entity.Entity]:
         """Retrieve a list of entities on a certain layer.
 
@@ -221,14 +279,11 @@ class EntityManager:
             self.driftwood.log.msg("ERROR", "Entity", "layer", "bad argument", e)
             return []
 
-        ents = []
-
-        for eid in self.entities:
-            if self.entities[eid].layer == layer:
-                ents.append(self.entities[eid])
+        if layer not in self.__spatial:
+            return []
 
         # Put them in order of eid so they don't switch around if we iterate them.
-        return sorted(ents, key=lambda by_eid: by_eid.eid)
+        return sorted(self.__spatial[layer], key=lambda by_eid: by_eid.eid)
 
     def kill(self, eid: int) -> bool:
         """Kill an entity by eid.
@@ -251,6 +306,7 @@ class EntityManager:
                 self.driftwood.script.call(self.entities[eid]._on_kill[0], self.entities[eid]._on_kill[1],
                                            self.entities[eid])
             self.entities[eid]._terminate()
+            self.__unhash(eid)
             del self.entities[eid]
             self.driftwood.area.changed = True
             return True
@@ -278,13 +334,14 @@ class EntityManager:
 
         for eid in self.entities:
             if self.entities[eid].filename == filename:
-                to_kill += eid
+                to_kill.append(eid)
 
         for eid in to_kill:
             if self.entities[eid]._on_kill:  # Call a function before killing the entity.
                 self.driftwood.script.call(self.entities[eid]._on_kill[0], self.entities[eid]._on_kill[1],
                                            self.entities[eid])
             self.entities[eid]._terminate()
+            self.__unhash(eid)
             del self.entities[eid]
 
         self.driftwood.area.changed = True
@@ -330,6 +387,68 @@ class EntityManager:
 
         return True
 
+    def _moved(self, ent: _entity.Entity) -> None:
+        """Bring the spatial hash up to date after an entity changed its position or layer.
+
+        This method is marked private because entities call it themselves whenever they move.
+
+        Args:
+            ent: The entity that moved.
+        """
+        if self.entities.get(ent.eid) is not ent:
+            return  # Not inserted yet.
+
+        if self.__hashed_on.get(ent.eid, ent.layer) != ent.layer:
+            self.__unhash(ent.eid)
+
+        if ent.layer not in self.__spatial:
+            tilemap = self.driftwood.area.tilemap
+            self.__spatial[ent.layer] = spatialhash.SpatialHash(4 * max(tilemap.tilewidth, tilemap.tileheight))
+        self.__spatial[ent.layer].insert(ent, [ent.x, ent.y, max(ent.width, 1), max(ent.height, 1)])
+        self.__hashed_on[ent.eid] = ent.layer
+
+    def __unhash(self, eid: int) -> None:
+        """Take an entity out of the spatial hash.
+        """
+        if eid in self.__hashed_on:
+            self.__spatial[self.__hashed_on[eid]].remove(self.entities[eid])
+            del self.__hashed_on[eid]
+
+            if not self.__hashed_on:
+                # Nothing is left, so the next entity starts a hash sized for the area it is in.
+                self.__spatial = {}
+
+    def _rehash(self) -> None:
+        """Build the spatial hash over again, sized for the tiles of the area that was just focused.
+
+        This method is marked private because AreaManager calls it for the entities that travel between areas.
+        """
+        entities = [self.entities[eid] for eid in self.__hashed_on]
+        self.__spatial = {}
+        self.__hashed_on = {}
+        for ent in entities:
+            self._moved(ent)
+
+    def _exit(self, destination: str) -> Optional['_Exit']:
+        """Read an exit destination of the form "area,layer,x,y", only once for each distinct string.
+
+        This method is marked private because entities call it on every walking check.
+
+        Args:
+            destination: The exit's destination string.
+
+        Returns: _Exit instance, or None if the destination is invalid.
+        """
+        if destination in self.__exits:
+            return self.__exits[destination]
+
+        try:
+            self.__exits[destination] = _Exit(destination)
+        except (AttributeError, ValueError):
+            self.driftwood.log.msg("ERROR", "Entity", "_exit", "invalid exit destination", destination)
+            self.__exits[destination] = None
+        return self.__exits[destination]
+
     def _terminate(self) -> None:
         """Cleanup before deletion.
         """
@@ -337,3 +456,56 @@ class EntityManager:
             self.entities[eid]._terminate()
         self.entities = None
         self.spritesheets = None
+        self.__spatial = {}
+        self.__hashed_on = {}
+
+
+class _Exit:
+    """An exit destination, read from its "area,layer,x,y" string.
+
+    The area is empty for an exit within the current area. Each coordinate is empty to stay the same, "+n" or "-n" to
+    move by n from the exit's tile and layer, or a number to go to. Any parts after these are ignored.
+
+    Attributes:
+        area: Filename of the area to go to, or an empty string.
+        dest: The destination string split into [area, layer, x, y, ...].
+    """
+
+    def __init__(self, destination: str):
+        """_Exit class initializer.
+
+        Raises: ValueError if the destination is invalid.
+        """
+        self.dest = destination.split(',')
+        if len(self.dest) < 4:
+            raise ValueError("exit destination needs four parts")
+        self.area = self.dest[0]
+
+        self.__coords = [self.__read(coord) for coord in self.dest[1:4]]  # [(relative, value) or None, ...]
+
+    @staticmethod
+    def __read(coord: str) -> Optional[Tuple[bool, int]]:
+        if not coord:  # Stays the same.
+            return None
+        if coord.startswith('+'):  # Increments upward.
+            return True, int(coord[1:])
+        if coord.startswith('-'):  # Increments downward.
+            return True, -int(coord[1:])
+        return False, int(coord)  # Set to a specific coordinate.
+
+    def resolve(self, layer: int, pos: List[int]) -> list:
+        """Return the destination [area, layer, x, y] for teleport(), measured from a tile. Unchanged parts are None.
+
+        Args:
+            layer: Layer of the tile.
+            pos: Position [x, y] of the tile.
+        """
+        dest = [self.area]
+        for coord, base in zip(self.__coords, [layer, pos[0], pos[1]]):
+            if coord is None:
+                dest.append(None)
+            elif coord[0]:
+                dest.append(base + coord[1])
+            else:
+                dest.append(coord[1])
+        return dest
@@ -48,6 +48,13 @@ class AudioFile:
 
         self.__load(self.__data)
 
+    def __sizeof__(self) -> int:
+        # The file, and the decoded samples of a sound effect. Music is decoded as it plays.
+        size = object.__sizeof__(self) + len(self.__data or b"")
+        if self.audio and not self.__is_music:
+            size += self.audio.contents.alen
+        return size
+
     def __load(self, data: bytes) -> None:
         """Load the audio data with SDL_Mixer.
         """
@@ -93,6 +100,9 @@ class FontFile:
 
         self.__load(self.__data)
 
+    def __sizeof__(self) -> int:
+        return object.__sizeof__(self) + len(self.__data or b"")
+
     def __load(self, data: bytes) -> None:
         """Load the font data with SDL_TTF.
         """
@@ -136,6 +146,15 @@ class ImageFile:
         SDL_QueryTexture(self.texture, None, None, byref(tw), byref(th))
         self.width, self.height = tw.value, th.value
 
+    def __sizeof__(self) -> int:
+        # The file, the decoded surface, and the texture, assuming four bytes per pixel.
+        size = object.__sizeof__(self) + len(self.__data or b"")
+        if self.surface:
+            size += self.surface.contents.pitch * self.surface.contents.h
+        if self.texture:
+            size += self.width * self.height * 4
+        return size
+
     def __load(self, data: bytes) -> None:
         """Load the image data with SDL_Image.
         """
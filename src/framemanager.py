@@ -25,25 +25,65 @@
 # IN THE SOFTWARE.
 # **********
 
-from ctypes import byref
-from ctypes import c_ubyte
+from ctypes import addressof, byref
+from ctypes import c_float, c_ubyte, c_uint32
+import sdl2
 from sdl2 import *
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import filetype
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Optional. Only needed by _QuadBatch.add_array().
+
+# Vertex order of a quad is top-left, top-right, bottom-left, bottom-right. These are its two triangles.
+_QUAD_INDICES = (0, 1, 2, 2, 1, 3)
+
+# A tiny bitmap font for the statistics overlay, so it needs no font file. Each glyph is three pixels wide and five
+# high, given as its rows from top to bottom.
+_GLYPHS = {
+    "0": "111 101 101 101 111", "1": "010 110 010 010 111", "2": "111 001 111 100 111", "3": "111 001 111 001 111",
+    "4": "101 101 111 001 001", "5": "111 100 111 001 111", "6": "111 100 111 101 111", "7": "111 001 001 010 010",
+    "8": "111 101 111 101 111", "9": "111 101 111 001 111", "A": "010 101 111 101 101", "B": "110 101 110 101 110",
+    "C": "011 100 100 100 011", "D": "110 101 101 101 110", "E": "111 100 110 100 111", "F": "111 100 110 100 100",
+    "G": "011 100 101 101 011", "H": "101 101 111 101 101", "I": "111 010 010 010 111", "J": "001 001 001 101 010",
+    "K": "101 101 110 101 101", "L": "100 100 100 100 111", "M": "101 111 111 101 101", "N": "110 101 101 101 101",
+    "O": "010 101 101 101 010", "P": "110 101 110 100 100", "Q": "010 101 101 110 011", "R": "110 101 110 101 101",
+    "S": "011 100 010 001 110", "T": "111 010 010 010 010", "U": "101 101 101 101 111", "V": "101 101 101 101 010",
+    "W": "101 101 111 111 101", "X": "101 101 010 101 101", "Y": "101 101 010 010 010", "Z": "111 001 010 100 111",
+    ".": "000 000 000 000 010", ":": "000 010 000 010 000", "/": "001 001 010 100 100", "-": "000 000 111 000 000",
+    "%": "101 001 010 100 101"
+}
+
 
 class FrameManager:
     """The Frame Manager
 
     This class manages the current graphical frame. It allows manipulating and adding content to its back buffer,
-    which can then be copied onto the front buffer and framed in the window. Alternatively, a texture or ImageFile
-    may be given to replace the current frame. WindowManager queries us for the current frame each tick.
+    which can then be copied onto the front buffer and framed in the window.
+
+    The back buffer is the size of the view plus a margin, and is addressed as a ring: area position x, y is kept at
+    x mod width, y mod height. When the camera scrolls, only the newly exposed strips need drawing, and the view is
+    copied out of the back buffer in at most four pieces. WindowManager copies those pieces onto the window each tick
+    the frame changed, then copies the overlays, widgets and statistics overlay over them, so those never have to be
+    erased from the back buffer.
+
+    Many copies can be submitted as a batch between begin_batch() and end_batch(). The render target is bound once
+    for the whole batch, and texture alpha, blend and color modulation are only changed when they differ from the
+    previous copy of the same texture.
+
+    Statistics about the last frame are available from stats(), and can be shown over the window with toggle_stats().
 
     Attributes:
         driftwood: Base class instance.
         offset: Offset at which to draw the viewport.
         centering: Whether to center on the player in large areas.
+        camera: Position in the area of the top left corner of the view.
+        geometry: Whether quad batches are drawn with SDL_RenderGeometry. Requires SDL >= 2.0.18 and a hardware
+            renderer.
+        show_stats: Whether the statistics overlay is shown.
         changed: Whether the frame has been changed. [STATE_NOTCHANGED, STATE_BACKBUFFER_NEEDS_UPDATE, STATE_CHANGED]
     """
 
@@ -65,7 +105,7 @@ class FrameManager:
         self.STATE_NOTCHANGED, self.STATE_CHANGED = range(2)
 
         self.driftwood = driftwood
-        self._frame = None  # [self.__backbuffer, srcrect, dstrect]
+        self._frame = None  # [[self.__backbuffer, srcrect, dstrect], ...] in up to four pieces.
 
         # Offset at which to draw the viewport.
         self.offset = [0, 0]
@@ -73,9 +113,50 @@ class FrameManager:
         # Whether to center on the player in large areas.
         self.centering = True
 
+        # Position in the area of the top left corner of the view.
+        self.camera = [0, 0]
+
+        # Rectangle of the area held in the back buffer, and the strips of it not drawn yet. None means all of it.
+        self._valid = None
+        self._exposed = None
+
         self.__imagefile = None
         self.__backbuffer = None
+        self.__area = [0, 0]  # Size of the area the back buffer looks at.
+        self.__size = [0, 0]  # Size of the back buffer.
         self.__overlay = []
+        self.__held = []  # Overlays given for the current frame, kept so the widgets and statistics can be redrawn.
+        self.__region = None  # SDL_Rect the batch is clipped to, if any.
+
+        # Overlays to copy onto the window after the frame: [[texture, srcrect, dstrect], ...]
+        self._overlays = []
+
+        # Batch state. The rectangles are reused by every copy instead of being allocated per call.
+        self.__batching = False
+        self.__src = SDL_Rect()
+        self.__dst = SDL_Rect()
+        self.__texstate = {}  # {texture address: [alpha, blendmode, colormod]} as currently set on the texture.
+        self.__texorig = {}  # {texture address: [texture, [alpha, blendmode, colormod]]} to restore after the batch.
+
+        # Whether we can submit a whole quad batch in one draw call.
+        self.geometry = self.__check_geometry()
+
+        # Vertex and index buffers for quad batches, grown as needed.
+        self.__capacity = 0  # In quads.
+        self.__vertices = None
+        self.__floats = None  # A float view over the vertices.
+        self.__array = None  # With NumPy, a [vertex, float] array view over the vertices.
+        self.__indices = None
+
+        # Draw calls and texture switches while drawing the current frame, and the totals for the last one.
+        self.__draws = 0
+        self.__switches = 0
+        self.__lasttex = None  # Address of the last texture drawn.
+        self.__counts = [0, 0]
+
+        # The statistics overlay.
+        self.show_stats = False
+        self.__stats_overlay = _StatsOverlay(self)
 
         self.changed = self.STATE_NOTCHANGED
 
@@ -85,6 +166,11 @@ class FrameManager:
         Returns:
             True if succeeded, False if failed.
         """
+        if self.__batching:
+            # The back buffer is already bound.
+            SDL_RenderClear(self.driftwood.window.renderer)
+            return True
+
         r = SDL_SetRenderTarget(self.driftwood.window.renderer, self.__backbuffer)
         if type(r) is int and r < 0:
             self.driftwood.log.msg("ERROR", "Frame", "clear", "SDL", SDL_GetError())
@@ -101,14 +187,17 @@ class FrameManager:
 
         return True
 
-    def prepare(self, width: int, height: int) -> bool:
+    def prepare(self, width: int, height: int, margin: int = 0) -> bool:
         """Prepare and clear the back buffer.
 
-        Set up our back buffer as a texture of the specified size. This also clears the back buffer.
+        Set up our back buffer for an area of the specified size. The back buffer is only as large as the part of the
+        area that fits in the window plus a margin, so its size does not grow with the area. This also clears the back
+        buffer.
 
         Args:
-            width: Width in pixels.
-            height: Height in pixels.
+            width: Width of the area in pixels.
+            height: Height of the area in pixels.
+            margin: (optional) Extra pixels to keep drawn around the view, so small scrolls back and forth are free.
 
         Returns:
             True if succeeded, False if failed.
@@ -117,6 +206,7 @@ class FrameManager:
         try:
             CHECK(width, int)
             CHECK(height, int)
+            CHECK(margin, int, _min=0)
         except CheckFailure as e:
             self.driftwood.log.msg("ERROR", "Frame", "prepare", "bad argument", e)
             return False
@@ -125,10 +215,16 @@ class FrameManager:
         if self.__backbuffer:
             SDL_DestroyTexture(self.__backbuffer)
 
+        ww, wh = self.driftwood.window.resolution()
+        self.__area = [width, height]
+        self.__size = [min(width, ww + margin), min(height, wh + margin)]
+        self._valid = None
+        self._exposed = None
+
         # Recreate backbuffer
         self.__backbuffer = SDL_CreateTexture(self.driftwood.window.renderer,
                                               SDL_PIXELFORMAT_ARGB8888, SDL_TEXTUREACCESS_TARGET,
-                                              width, height)
+                                              self.__size[0], self.__size[1])
 
         if type(self.__backbuffer) is int and self.__backbuffer < 0:
             self.driftwood.log.msg("ERROR", "Frame", "prepare", "SDL", SDL_GetError())
@@ -137,22 +233,20 @@ class FrameManager:
         return True
 
     def calc_rects(self) -> None:
-        """Calculate the srcrect and dstrect for copying the back buffer onto the window's renderer.
+        """Calculate the camera, scroll the back buffer, and work out the pieces to copy onto the window's renderer.
 
-        Can be run after a world update but before drawing starts for a frame.
+        Can be run after a world update but before drawing starts for a frame. Afterward, _exposed holds the strips of
+        the area that scrolled into the back buffer and must be drawn, or None if all of it must be drawn.
         """
-        # Get texture width and height.
-        tw, th = c_int(), c_int()
-        SDL_QueryTexture(self.__backbuffer, None, None, byref(tw), byref(th))
-        tw, th = tw.value, th.value
+        # Get area width and height.
+        tw, th = self.__area
 
         # Both the dstrect and the window size are measured in logical
         # coordinates at this stage.  The transformation to physical
         # coordinates happens below in tick().
 
-        # Set up viewport calculation variables.
-        srcrect, dstrect = SDL_Rect(), SDL_Rect()
-        srcrect.x, srcrect.y, srcrect.w, srcrect.h = 0, 0, tw, th
+        # Set up viewport calculation variables. The dstrect is worked out for the whole area.
+        dstrect = SDL_Rect()
         dstrect.x, dstrect.y, dstrect.w, dstrect.h = 0, 0, tw, th
 
         # Get logical window width and height.
@@ -198,42 +292,241 @@ class FrameManager:
             else:
                 dstrect.y = int(wh / 2 - th / 2)
 
-        # Adjust the viewport offset.
-        dstrect.x += self.offset[0]
-        dstrect.y += self.offset[1]
+        # The view is the part of the area inside the window.
+        self.camera = [max(-dstrect.x, 0), max(-dstrect.y, 0)]
+        view = [self.camera[0], self.camera[1], min(tw, ww), min(th, wh)]
+
+        self.__scroll(view)
+
+        # Copy the view out of the back buffer piece by piece, adjusting for the viewport offset.
+        left = max(dstrect.x, 0) + self.offset[0]
+        top = max(dstrect.y, 0) + self.offset[1]
+        self._frame = []
+        for bufrect, x, y in self._wrap(view):
+            srcrect, piece = SDL_Rect(*bufrect), SDL_Rect()
+            piece.x, piece.y, piece.w, piece.h = left + x - view[0], top + y - view[1], bufrect[2], bufrect[3]
+            self._frame.append([self.__backbuffer, srcrect, piece])
+
+    def _wrap(self, rect: List[int]) -> List[list]:
+        """Find where a rectangle of the area held in the back buffer is stored.
 
-        # Adjust and copy the frame onto the viewport.
-        self._frame = [self.__backbuffer, srcrect, dstrect]
+        The rectangle wraps around the edges of the back buffer, so it may be split into as many as four pieces.
+
+        Args:
+            rect: Rectangle of the area [x, y, w, h], no larger than the back buffer.
+
+        Returns:
+            List of [back buffer rectangle [x, y, w, h], area x, area y] for each piece.
+        """
+        bw, bh = self.__size
+        x, y, w, h = rect
+        pieces = []
+
+        ay = y
+        while ay < y + h:
+            by = ay % bh
+            ph = min(y + h - ay, bh - by)
+            ax = x
+            while ax < x + w:
+                bx = ax % bw
+                pw = min(x + w - ax, bw - bx)
+                pieces.append([[bx, by, pw, ph], ax, ay])
+                ax += pw
+            ay += ph
+
+        return pieces
+
+    def __scroll(self, view: List[int]) -> None:
+        """Move the rectangle of the area held in the back buffer just far enough to contain the view.
+
+        The strips that scroll in are left in _exposed for drawing.
+        """
+        bw, bh = self.__size
+        tw, th = self.__area
+        old = self._valid
+
+        if old is None:
+            # Center the back buffer on the view.
+            x = view[0] - (bw - view[2]) // 2
+            y = view[1] - (bh - view[3]) // 2
+        else:
+            x, y = old[0], old[1]
+            if view[0] < x:
+                x = view[0]
+            elif view[0] + view[2] > x + bw:
+                x = view[0] + view[2] - bw
+            if view[1] < y:
+                y = view[1]
+            elif view[1] + view[3] > y + bh:
+                y = view[1] + view[3] - bh
+
+        # Stay inside the area.
+        x = max(0, min(x, tw - bw))
+        y = max(0, min(y, th - bh))
+        self._valid = [x, y, bw, bh]
+
+        if old is None or abs(x - old[0]) >= bw or abs(y - old[1]) >= bh:
+            self._exposed = None  # Nothing we had is still in view.
+            return
+
+        self._exposed = []
+        if x > old[0]:
+            self._exposed.append([old[0] + bw, y, x - old[0], bh])
+        elif x < old[0]:
+            self._exposed.append([x, y, old[0] - x, bh])
+        if y > old[1]:
+            self._exposed.append([x, old[1] + bh, bw, y - old[1]])
+        elif y < old[1]:
+            self._exposed.append([x, y, bw, old[1] - y])
 
     def finish_frame(self) -> bool:
-        """Draw the last components of a frame, including widgets and overlays.
+        """Finish a frame, collecting the widgets and overlays to be copied over it.
 
         Requires that calc_rects have already been called for the frame.
 
         Returns:
             True if succeeded, False if failed.
         """
+        # The frame is drawn, so its counts are final.
+        self.__counts = [self.__draws, self.__switches]
+        self.__draws = 0
+        self.__switches = 0
+        self.__lasttex = None
+
+        self.__held = self.__overlay
+        self.__overlay = []
+        self.__finish_overlays()
+
+        # Mark the frame changed.
+        self.changed = self.STATE_CHANGED
+
+        return True
+
+    def __finish_overlays(self) -> None:
+        """Collect the overlays given for the frame, the widgets, and the statistics overlay if shown.
+        """
         # Tell WidgetManager it should draw the widgets now.
         self.driftwood.widget._draw_widgets()
 
-        dstrect = self._frame[2]
+        if self.show_stats:
+            self.__stats_overlay.draw(self.stats())
 
-        # Draw overlays, taking into account the viewport position.
-        for overlay in self.__overlay:
-            overlay[2][0] -= dstrect.x
-            overlay[2][1] -= dstrect.y
-            ok = self.copy(*overlay)
-            if not ok:
-                self.driftwood.log.msg("ERROR", "Frame", "finish_frame", "failed to copy overlay", str(overlay))
-                self.__overlay = []
-                return False
+        # Overlays go straight onto the window, so they never have to be erased from the back buffer.
+        self._overlays = []
+        for tex, srcrect, dstrect in self.__held + self.__overlay:
+            src, dst = SDL_Rect(), SDL_Rect()
+            src.x, src.y, src.w, src.h = srcrect
+            dst.x, dst.y, dst.w, dst.h = dstrect
+            self._overlays.append([tex, src, dst])
         self.__overlay = []  # These should only be texture references.
 
-        # Mark the frame changed.
+    def stats(self) -> dict:
+        """Get statistics about the last frame drawn and the last tick, for finding out what is slowing the engine.
+
+        Tiles drawn from a chunk's existing bake are not counted as drawn, only those drawn into the frame or a new
+        bake. Tiles are culled when they were hidden under opaque tiles, and entities and lights when out of view.
+
+        Returns:
+            Dictionary of statistics:
+                frame_time: Seconds between the starts of the last two ticks.
+                tick_time: Seconds spent in tick callbacks during the last tick.
+                draw_calls: Copies and quad batches submitted for the last frame.
+                texture_switches: Number of those that used a different texture than the one before.
+                tiles_drawn, tiles_culled: Tiles drawn and skipped in the last frame.
+                entities_drawn, entities_culled: Entities drawn and skipped in the last frame.
+                lights_drawn, lights_culled: Lights drawn and skipped in the last frame.
+                cache_bytes: Estimated memory held by the files in the cache.
+                tick_callbacks: Number of registered tick callbacks.
+        """
+        stats = {
+            "frame_time": self.driftwood.tick._last_interval,
+            "tick_time": self.driftwood.tick._last_duration,
+            "draw_calls": self.__counts[0],
+            "texture_switches": self.__counts[1]
+        }
+        stats.update(self.driftwood.area._counts)
+        stats["cache_bytes"] = self.driftwood.cache._resident_bytes()
+        stats["tick_callbacks"] = len(self.driftwood.tick)
+
+        return stats
+
+    def toggle_stats(self) -> bool:
+        """Show or hide the statistics overlay in the corner of the window.
+
+        While shown, the statistics are redrawn a few times a second even if the frame has not changed.
+
+        Returns:
+            True
+        """
+        self.show_stats = not self.show_stats
+
+        if self.show_stats:
+            self.driftwood.tick.register(self._refresh_stats, delay=0.25, during_pause=True)
+        else:
+            self.driftwood.tick.unregister(self._refresh_stats)
+
+        self._refresh_stats()
+
+        return True
+
+    def _refresh_stats(self) -> None:
+        """Tick callback which redraws the overlays over the current frame, to keep the statistics up to date.
+        """
+        self.__finish_overlays()
         self.changed = self.STATE_CHANGED
 
+    def begin_batch(self) -> bool:
+        """Start a batch of copies onto the back buffer.
+
+        The back buffer stays bound as the render target until end_batch() is called. Every copy() made in between is
+        submitted without switching render targets.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        if self.__batching:
+            self.driftwood.log.msg("WARNING", "Frame", "begin_batch", "batch already started")
+            return False
+
+        r = SDL_SetRenderTarget(self.driftwood.window.renderer, self.__backbuffer)
+        if type(r) is int and r < 0:
+            self.driftwood.log.msg("ERROR", "Frame", "begin_batch", "SDL", SDL_GetError())
+            return False
+
+        self.__batching = True
         return True
 
+    def end_batch(self) -> bool:
+        """Finish a batch of copies started by begin_batch().
+
+        Restores the alpha, blend and color modulation of every texture the batch changed, and switches rendering back
+        to the window.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        if not self.__batching:
+            self.driftwood.log.msg("WARNING", "Frame", "end_batch", "no batch started")
+            return False
+
+        ret = True
+
+        # Put back the texture states we changed.
+        for key, (tex, orig) in self.__texorig.items():
+            if not self.__set_state(tex, self.__texstate[key], *orig):
+                ret = False
+        self.__texstate = {}
+        self.__texorig = {}
+        self.__batching = False
+
+        # Tell SDL to switch rendering back to the window's frame.
+        r = SDL_SetRenderTarget(self.driftwood.window.renderer, None)
+        if type(r) is int and r < 0:
+            self.driftwood.log.msg("ERROR", "Frame", "end_batch", "SDL", SDL_GetError())
+            ret = False
+
+        return ret
+
     def copy(self,
              tex: SDL_Texture,
              srcrect: List[int],
@@ -243,7 +536,8 @@ class FrameManager:
              colormod: Tuple[int, int, int] = None) -> bool:
         """Copy a texture onto the back buffer.
         
-        Copy the source rectangle from the texture tex to the destination rectangle in our back buffer.
+        Copy the source rectangle from the texture tex to the destination rectangle in our back buffer. If no batch is
+        in progress, the copy is made as a batch of one.
         
         Args:
             tex: Texture to copy.
@@ -267,95 +561,276 @@ class FrameManager:
             self.driftwood.log.msg("ERROR", "Frame", "copy", "bad argument", e)
             return False
 
-        # We have to finish before we return.
-        ret = True
+        if self.__batching:
+            return self._copy(tex, srcrect, dstrect, alpha, blendmode, colormod)
 
-        # Set up the rectangles.
-        src = SDL_Rect()
-        dst = SDL_Rect()
-        src.x, src.y, src.w, src.h = srcrect
+        if not self.begin_batch():
+            return False
+        ret = self._copy(tex, srcrect, dstrect, alpha, blendmode, colormod)
+        return self.end_batch() and ret
+
+    def _copy(self,
+              tex: SDL_Texture,
+              srcrect: List[int],
+              dstrect: List[int],
+              alpha: int = None,
+              blendmode: int = None,
+              colormod: Tuple[int, int, int] = None) -> bool:
+        """Copy a texture onto the back buffer during a batch, without checking input.
+
+        This is the engine's fast path for drawing the area. Same arguments as copy().
+        """
+        if type(srcrect) is SDL_Rect:
+            src = srcrect  # Already ready to use, such as from a tileset's table.
+        else:
+            src = self.__src
+            src.x, src.y, src.w, src.h = srcrect
+        dst = self.__dst
         dst.x, dst.y, dst.w, dst.h = dstrect
 
-        r = SDL_SetRenderTarget(self.driftwood.window.renderer, self.__backbuffer)
+        ret = True
+
+        # Only touch the texture state if this copy modulates it, or an earlier copy in the batch did.
+        key = addressof(tex.contents)
+        self.__draws += 1
+        if key != self.__lasttex:
+            self.__switches += 1
+            self.__lasttex = key
+        if alpha or blendmode or colormod or key in self.__texstate:
+            ret = self.__modulate(tex, key, alpha, blendmode, colormod)
+
+        # Copy the texture onto the back buffer.
+        r = SDL_RenderCopy(self.driftwood.window.renderer, tex, src, dst)
         if type(r) is int and r < 0:
             self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
             ret = False
 
-        prev_alpha = None
-        prev_blendmode = None
-        prev_colormod = None
+        return ret
 
-        if alpha:
-            prev_alpha = c_ubyte()
-            r = SDL_GetTextureAlphaMod(tex, byref(prev_alpha))
-            if type(r) is int and r < 0:
-                self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+    def __modulate(self, tex: SDL_Texture, key: int, alpha: int, blendmode: int,
+                   colormod: Tuple[int, int, int]) -> bool:
+        """Bring a texture's modulation state to what a copy wants, changing only what differs.
 
-            r = SDL_SetTextureAlphaMod(tex, alpha)
-            if type(r) is int and r < 0:
-                self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+        Modulation not requested by the copy falls back to the state the texture had before the batch touched it.
+        """
+        state = self.__texstate.get(key)
 
-        if blendmode:
+        if state is None:
+            # First time this batch touches the texture. Remember its state so we can restore it.
+            prev_alpha = c_ubyte()
             prev_blendmode = c_int()
-            r = SDL_GetTextureBlendMode(tex, byref(prev_blendmode))
-            if type(r) is int and r < 0:
+            prev_colormod = (c_ubyte(), c_ubyte(), c_ubyte())
+            if (SDL_GetTextureAlphaMod(tex, byref(prev_alpha)) < 0 or
+                    SDL_GetTextureBlendMode(tex, byref(prev_blendmode)) < 0 or
+                    SDL_GetTextureColorMod(tex, byref(prev_colormod[0]), byref(prev_colormod[1]),
+                                           byref(prev_colormod[2])) < 0):
                 self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+                return False
+            state = [prev_alpha.value, prev_blendmode.value,
+                     (prev_colormod[0].value, prev_colormod[1].value, prev_colormod[2].value)]
+            self.__texstate[key] = state
+            self.__texorig[key] = [tex, list(state)]
+
+        orig = self.__texorig[key][1]
+        return self.__set_state(tex, state,
+                                alpha if alpha else orig[0],
+                                blendmode if blendmode else orig[1],
+                                tuple(colormod) if colormod else orig[2])
+
+    def __set_state(self, tex: SDL_Texture, state: list, alpha: int, blendmode: int,
+                    colormod: Tuple[int, int, int]) -> bool:
+        """Set the parts of a texture's modulation state that differ from the tracked state.
+        """
+        ret = True
 
-            r = SDL_SetTextureBlendMode(tex, blendmode)
+        if state[0] != alpha:
+            r = SDL_SetTextureAlphaMod(tex, alpha)
             if type(r) is int and r < 0:
                 self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
                 ret = False
+            state[0] = alpha
 
-        if colormod:
-            prev_colormod = (c_ubyte(), c_ubyte(), c_ubyte())
-            r = SDL_GetTextureColorMod(tex, byref(prev_colormod[0]), byref(prev_colormod[1]), byref(prev_colormod[2]))
+        if state[1] != blendmode:
+            r = SDL_SetTextureBlendMode(tex, blendmode)
             if type(r) is int and r < 0:
                 self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
                 ret = False
+            state[1] = blendmode
 
+        if state[2] != colormod:
             r = SDL_SetTextureColorMod(tex, *colormod)
             if type(r) is int and r < 0:
                 self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
                 ret = False
+            state[2] = colormod
 
-        # Copy the texture onto the back buffer.
-        r = SDL_RenderCopy(self.driftwood.window.renderer, tex, src, dst)
-        if type(r) is int and r < 0:
-            self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-            ret = False
+        return ret
 
-        if alpha:
-            r = SDL_SetTextureAlphaMod(tex, prev_alpha.value)
-            if type(r) is int and r < 0:
-                self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+    def _quad_batch(self, tex: SDL_Texture, texwidth: int, texheight: int, srcrects: Tuple[Tuple[int, ...], ...],
+                    rects: Tuple[SDL_Rect, ...]) -> '_QuadBatch':
+        """Create a batch of quads copied from one texture, for use with _draw_quads().
 
-        if blendmode:
-            r = SDL_SetTextureBlendMode(tex, prev_blendmode.value)
-            if type(r) is int and r < 0:
-                self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+        Args:
+            tex: Texture the quads are copied from.
+            texwidth: Width of the texture in pixels.
+            texheight: Height of the texture in pixels.
+            srcrects: Table of the (x, y, w, h) source rectangles quads may be copied from, such as a tileset's.
+            rects: The same table as SDL_Rects.
 
-        if colormod:
-            r = SDL_SetTextureColorMod(tex, prev_colormod[0].value, prev_colormod[1].value, prev_colormod[2].value)
-            if type(r) is int and r < 0:
-                self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
-                ret = False
+        Returns:
+            _QuadBatch instance.
+        """
+        return _QuadBatch(self, tex, texwidth, texheight, srcrects, rects)
 
-        # Tell SDL to switch rendering back to the window's frame.
-        r = SDL_SetRenderTarget(self.driftwood.window.renderer, None)
+    def _draw_quads(self, batch: '_QuadBatch') -> bool:
+        """Draw every quad in a batch with a single SDL_RenderGeometry call, then empty the batch.
+
+        Must be called during a frame batch. Without geometry support, quads were already copied as they were added.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        count = batch.count
+        if not count:
+            return True
+
+        if count > self.__capacity:
+            self.__grow(count)
+
+        # Scatter the vertex lists into the interleaved vertex buffer.
+        floats = self.__floats
+        end = len(batch.xs) * 5  # Five floats per vertex.
+        floats[0:end:5] = batch.xs
+        floats[1:end:5] = batch.ys
+        floats[3:end:5] = batch.us
+        floats[4:end:5] = batch.vs
+
+        # Then the vertex arrays after them, a whole column at a time.
+        start = len(batch.xs)
+        for xs, ys, us, vs in batch.arrays:
+            vertices = self.__array[start:start + len(xs)]
+            vertices[:, 0] = xs
+            vertices[:, 1] = ys
+            vertices[:, 3] = us
+            vertices[:, 4] = vs
+            start += len(xs)
+        batch.clear()
+
+        # Draw the texture with its own modulation if this batch changed it earlier.
+        ret = True
+        key = addressof(batch.texture.contents)
+        self.__draws += 1
+        if key != self.__lasttex:
+            self.__switches += 1
+            self.__lasttex = key
+        if key in self.__texstate:
+            ret = self.__modulate(batch.texture, key, None, None, None)
+
+        r = sdl2.SDL_RenderGeometry(self.driftwood.window.renderer, batch.texture, self.__vertices, count * 4,
+                                    self.__indices, count * 6)
         if type(r) is int and r < 0:
-            self.driftwood.log.msg("ERROR", "Frame", "copy", "SDL", SDL_GetError())
+            self.driftwood.log.msg("ERROR", "Frame", "_draw_quads", "SDL", SDL_GetError())
             ret = False
 
         return ret
 
+    def _begin_region(self, rect: List[int]) -> bool:
+        """Clip the copies of the current batch to a region of the back buffer, and clear that region.
+
+        The rest of the back buffer keeps what was drawn in earlier frames.
+
+        Args:
+            rect: Region of the back buffer [x, y, w, h].
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        renderer = self.driftwood.window.renderer
+
+        self.__region = SDL_Rect(*rect)
+        r = SDL_RenderSetClipRect(renderer, self.__region)
+        if type(r) is int and r < 0:
+            self.driftwood.log.msg("ERROR", "Frame", "_begin_region", "SDL", SDL_GetError())
+            self.__region = None
+            return False
+
+        # SDL_RenderClear ignores the clip rectangle, so fill the region instead.
+        SDL_RenderFillRect(renderer, self.__region)
+
+        return True
+
+    def _end_region(self) -> None:
+        """Stop clipping the copies of the current batch.
+        """
+        self.__region = None
+        SDL_RenderSetClipRect(self.driftwood.window.renderer, None)
+
+    def _create_target(self, width: int, height: int) -> Optional[SDL_Texture]:
+        """Create a transparent texture that can be drawn into with _begin_target(), such as a baked layer.
+
+        Args:
+            width: Width in pixels.
+            height: Height in pixels.
+
+        Returns:
+            Texture if succeeded, None if failed.
+        """
+        tex = SDL_CreateTexture(self.driftwood.window.renderer, SDL_PIXELFORMAT_ARGB8888, SDL_TEXTUREACCESS_TARGET,
+                                width, height)
+        if not tex or (type(tex) is int and tex < 0):
+            self.driftwood.log.msg("ERROR", "Frame", "_create_target", "SDL", SDL_GetError())
+            return None
+
+        SDL_SetTextureBlendMode(tex, SDL_BLENDMODE_BLEND)
+        return tex
+
+    def _begin_target(self, tex: SDL_Texture) -> bool:
+        """Redirect the copies of the current batch into a texture made by _create_target(), and clear it.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        renderer = self.driftwood.window.renderer
+
+        r = SDL_SetRenderTarget(renderer, tex)
+        if type(r) is int and r < 0:
+            self.driftwood.log.msg("ERROR", "Frame", "_begin_target", "SDL", SDL_GetError())
+            return False
+
+        # The clip rectangle belongs to the back buffer.
+        if self.__region:
+            SDL_RenderSetClipRect(renderer, None)
+
+        # Clear to transparent, keeping the draw color used for the back buffer.
+        color = [c_ubyte(), c_ubyte(), c_ubyte(), c_ubyte()]
+        SDL_GetRenderDrawColor(renderer, *[byref(c) for c in color])
+        SDL_SetRenderDrawColor(renderer, 0, 0, 0, 0)
+        SDL_RenderClear(renderer)
+        SDL_SetRenderDrawColor(renderer, *[c.value for c in color])
+
+        return True
+
+    def _end_target(self) -> bool:
+        """Point the current batch back at the back buffer after _begin_target().
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        r = SDL_SetRenderTarget(self.driftwood.window.renderer, self.__backbuffer)
+        if type(r) is int and r < 0:
+            self.driftwood.log.msg("ERROR", "Frame", "_end_target", "SDL", SDL_GetError())
+            return False
+
+        if self.__region:
+            SDL_RenderSetClipRect(self.driftwood.window.renderer, self.__region)
+
+        return True
+
     def overlay(self, tex: SDL_Texture, srcrect: List[int], dstrect: List[int]) -> bool:
         """Schedule to copy a texture directly onto the window, ignoring any frame or viewport calculations.
 
+        Overlays are copied over the frame by WindowManager, and stay until the next frame is finished.
+
         Args:
             tex: Texture to copy.
             srcrect: Source rectangle [x, y, w, h]
@@ -378,11 +853,223 @@ class FrameManager:
 
         return True
 
+    def __check_geometry(self) -> bool:
+        """Check whether both SDL and PySDL2 support SDL_RenderGeometry, and whether the renderer draws it like
+        SDL_RenderCopy.
+
+        The software renderer rasterizes geometry differently from its copies, so the edges of each tile would sample
+        the neighboring texels. It keeps copying tiles one at a time instead.
+        """
+        if not hasattr(sdl2, "SDL_RenderGeometry") or not hasattr(sdl2, "SDL_Vertex"):
+            return False
+
+        version = SDL_version()
+        SDL_GetVersion(byref(version))
+        if (version.major, version.minor, version.patch) < (2, 0, 18):
+            return False
+
+        info = SDL_RendererInfo()
+        if SDL_GetRendererInfo(self.driftwood.window.renderer, byref(info)) < 0:
+            return False
+        return not info.flags & SDL_RENDERER_SOFTWARE
+
+    def __grow(self, count: int) -> None:
+        """Grow the quad vertex and index buffers to hold at least count quads.
+        """
+        capacity = max(count, self.__capacity * 2, 256)
+
+        self.__vertices = (sdl2.SDL_Vertex * (capacity * 4))()
+        self.__floats = (c_float * (capacity * 20)).from_buffer(self.__vertices)
+        if numpy is not None:
+            self.__array = numpy.frombuffer(self.__floats, numpy.float32).reshape(capacity * 4, 5)
+
+        # Every vertex is opaque white, so the texture is drawn unmodified. This never changes.
+        (c_uint32 * (capacity * 20)).from_buffer(self.__vertices)[2::5] = [0xFFFFFFFF] * (capacity * 4)
+
+        indices = []
+        for quad in range(capacity):
+            indices.extend([quad * 4 + i for i in _QUAD_INDICES])
+        self.__indices = (c_int * len(indices))(*indices)
+
+        self.__capacity = capacity
+
     def _terminate(self) -> None:
         """Cleanup before deletion.
         """
+        if self.__batching:
+            self.end_batch()
         if self.__backbuffer:
             SDL_DestroyTexture(self.__backbuffer)
             self.__backbuffer = None
         if self._frame:
             self._frame = None
+        self.__stats_overlay._terminate()
+        self._overlays = []
+        self.__held = []
+        self._valid = None
+
+
+class _QuadBatch:
+    """Quad Batch
+
+    Collects textured quads copied from one texture so they can be drawn together by FrameManager._draw_quads().
+    Quads are copied from a table of source rectangles, whose texture coordinates are worked out once up front.
+    Positions and texture coordinates are kept per vertex, ready to be scattered into SDL_Vertex structures. With
+    NumPy, many quads can be added at once as arrays, which are kept as they are until drawn.
+
+    Without SDL_RenderGeometry, each quad is copied onto the back buffer as soon as it is added instead.
+    """
+
+    def __init__(self, frame: FrameManager, tex: SDL_Texture, texwidth: int, texheight: int,
+                 srcrects: Tuple[Tuple[int, ...], ...], rects: Tuple[SDL_Rect, ...]):
+        self.texture = tex
+        self.count = 0
+
+        self.xs = []
+        self.ys = []
+        self.us = []
+        self.vs = []
+        self.arrays = []  # [(xs, ys, us, vs), ...] NumPy arrays with a value per vertex.
+
+        self.__frame = frame
+        self.__geometry = frame.geometry
+        self.__sizes = tuple(srcrect[2:4] for srcrect in srcrects)
+        self.__rects = rects
+        self.__dstrect = [0, 0, 0, 0]
+
+        # Normalized texture coordinates of each source rectangle's four vertices.
+        self.__us = tuple((x / texwidth, (x + w) / texwidth) * 2 for x, y, w, h in srcrects)
+        self.__vs = tuple((y / texheight,) * 2 + ((y + h) / texheight,) * 2 for x, y, w, h in srcrects)
+        self.__tables = None  # NumPy versions of the sizes and texture coordinates, made when first needed.
+
+    def add(self, index: int, dx: int, dy: int) -> None:
+        """Add a quad copying the source rectangle at index in the table to dx,dy on the back buffer.
+        """
+        w, h = self.__sizes[index]
+
+        if not self.__geometry:
+            dstrect = self.__dstrect
+            dstrect[0], dstrect[1], dstrect[2], dstrect[3] = dx, dy, w, h
+            self.__frame._copy(self.texture, self.__rects[index], dstrect)
+            return
+
+        self.xs.extend((dx, dx + w, dx, dx + w))
+        self.ys.extend((dy, dy, dy + h, dy + h))
+        self.us.extend(self.__us[index])
+        self.vs.extend(self.__vs[index])
+        self.count += 1
+
+    def add_array(self, indices: 'numpy.ndarray', dxs: 'numpy.ndarray', dys: 'numpy.ndarray') -> None:
+        """Add many quads at once, given NumPy arrays of indices in the table and positions on the back buffer.
+        """
+        if not self.__geometry:
+            for index, dx, dy in zip(indices.tolist(), dxs.tolist(), dys.tolist()):
+                self.add(index, dx, dy)
+            return
+
+        if self.__tables is None:
+            self.__tables = (numpy.array(self.__sizes, numpy.float32).reshape(-1, 2),
+                             numpy.array(self.__us, numpy.float32).reshape(-1, 4),
+                             numpy.array(self.__vs, numpy.float32).reshape(-1, 4))
+        sizes, us, vs = self.__tables
+
+        # Positions of the four vertices of each quad.
+        xs = numpy.repeat(dxs.astype(numpy.float32)[:, None], 4, axis=1)
+        ys = numpy.repeat(dys.astype(numpy.float32)[:, None], 4, axis=1)
+        xs[:, 1::2] += sizes[indices, 0:1]
+        ys[:, 2:] += sizes[indices, 1:2]
+
+        self.arrays.append((xs.ravel(), ys.ravel(), us[indices].ravel(), vs[indices].ravel()))
+        self.count += len(indices)
+
+    def clear(self) -> None:
+        """Empty the batch.
+        """
+        self.xs = []
+        self.ys = []
+        self.us = []
+        self.vs = []
+        self.arrays = []
+        self.count = 0
+
+
+class _StatsOverlay:
+    """Statistics Overlay
+
+    Draws the statistics from FrameManager.stats() in the top left corner of the window through FrameManager.overlay(),
+    one glyph of the built-in bitmap font at a time over a translucent panel.
+    """
+
+    # Glyphs are drawn this many times their size.
+    SCALE = 2
+
+    def __init__(self, frame: FrameManager):
+        self.__frame = frame
+        self.__texture = None  # The font, each glyph in order, then a cell of the panel color.
+        self.__columns = {char: n for n, char in enumerate(sorted(_GLYPHS))}
+
+    def draw(self, stats: dict) -> None:
+        """Draw the statistics as overlays.
+        """
+        if not self.__texture:
+            self.__texture = self.__create_texture()
+            if not self.__texture:
+                return
+
+        lines = [
+            "FRAME {0:.2f} MS  TICK {1:.2f} MS".format(stats["frame_time"] * 1000, stats["tick_time"] * 1000),
+            "DRAWS {0}  TEXTURES {1}".format(stats["draw_calls"], stats["texture_switches"]),
+            "TILES {0} / {1} CULLED".format(stats["tiles_drawn"], stats["tiles_culled"]),
+            "ENTITIES {0} / {1} CULLED".format(stats["entities_drawn"], stats["entities_culled"]),
+            "LIGHTS {0} / {1} CULLED".format(stats["lights_drawn"], stats["lights_culled"]),
+            "CACHE {0} KIB".format(stats["cache_bytes"] // 1024),
+            "CALLBACKS {0}".format(stats["tick_callbacks"])
+        ]
+
+        # Each glyph takes up a cell one pixel wider and taller than itself.
+        cw, ch = 4 * self.SCALE, 6 * self.SCALE
+        overlay = self.__frame.overlay
+
+        # The panel.
+        overlay(self.__texture, [len(_GLYPHS) * 3, 0, 3, 5],
+                [0, 0, max(len(line) for line in lines) * cw + 2 * cw, len(lines) * ch + 2 * self.SCALE])
+
+        for row, line in enumerate(lines):
+            for col, char in enumerate(line):
+                if char in self.__columns:
+                    overlay(self.__texture, [self.__columns[char] * 3, 0, 3, 5],
+                            [(col + 1) * cw, row * ch + 2 * self.SCALE, 3 * self.SCALE, 5 * self.SCALE])
+
+    def __create_texture(self) -> Optional[SDL_Texture]:
+        """Draw the font into a texture.
+        """
+        driftwood = self.__frame.driftwood
+
+        surface = SDL_CreateRGBSurfaceWithFormat(0, (len(_GLYPHS) + 1) * 3, 5, 32, SDL_PIXELFORMAT_ARGB8888)
+        if not surface:
+            driftwood.log.msg("ERROR", "Frame", "_StatsOverlay", "SDL", SDL_GetError())
+            return None
+
+        SDL_FillRect(surface, None, 0x00000000)
+        for char, column in self.__columns.items():
+            for y, row in enumerate(_GLYPHS[char].split()):
+                for x, bit in enumerate(row):
+                    if bit == "1":
+                        SDL_FillRect(surface, SDL_Rect(column * 3 + x, y, 1, 1), 0xFFFFFFFF)
+        SDL_FillRect(surface, SDL_Rect(len(_GLYPHS) * 3, 0, 3, 5), 0xA0000000)
+
+        tex = SDL_CreateTextureFromSurface(driftwood.window.renderer, surface)
+        SDL_FreeSurface(surface)
+        if not tex:
+            driftwood.log.msg("ERROR", "Frame", "_StatsOverlay", "SDL", SDL_GetError())
+            return None
+
+        SDL_SetTextureBlendMode(tex, SDL_BLENDMODE_BLEND)
+        return tex
+
+    def _terminate(self) -> None:
+        """Cleanup before deletion.
+        """
+        if self.__texture:
+            SDL_DestroyTexture(self.__texture)
+            self.__texture = None
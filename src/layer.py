@@ -25,21 +25,112 @@
 # IN THE SOFTWARE.
 # **********
 
-from typing import Dict, Optional
+import base64
+import collections
+import gzip
+import sys
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
 
 import tile
 import tilemap
+import tileset
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Optional. Without it there is no _grid.
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # Optional. Without it maps with zstd compressed layers can't be read.
+
+# Collision flags of a tile, from its nowalk value.
+NOWALK = 1  # Nothing can walk onto the tile.
+NOWALK_PLAYER = 2  # The player can't walk onto the tile.
+NOWALK_NPC = 4  # Entities other than the player can't walk onto the tile.
+
+
+def _nowalk_flags(nowalk) -> int:
+    """Return the collision flags for a nowalk value.
+
+    "player" and "npc" only stop those entities. Any other true value, or an empty string, stops everything.
+    """
+    if nowalk == "player":
+        return NOWALK_PLAYER
+    if nowalk == "npc":
+        return NOWALK_NPC
+    if nowalk or nowalk == "":
+        return NOWALK
+    return 0
+
+
+def _read_gids(layerdata: dict) -> array:
+    """Return the gids of a layer's data in an array, without flip bits.
+
+    The data is either a list of gids, or with base64 encoding a string of little-endian 32-bit gids, which may be
+    compressed with zlib, gzip or zstd. Encoded data goes straight into the array.
+
+    Raises: ValueError if the data can't be decoded.
+    """
+    data = layerdata["data"]
+    encoding = layerdata.get("encoding", "csv")
+
+    if encoding == "base64":
+        compression = layerdata.get("compression", "")
+        try:
+            raw = base64.b64decode(data)
+            if compression == "zlib":
+                raw = zlib.decompress(raw)
+            elif compression == "gzip":
+                raw = gzip.decompress(raw)
+            elif compression == "zstd":
+                if zstandard is None:
+                    raise ValueError("zstd compression needs the zstandard module")
+                raw = zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+            elif compression:
+                raise ValueError("unknown compression \"{0}\"".format(compression))
+        except ValueError:
+            raise
+        except Exception as e:  # zlib.error, OSError, EOFError and zstandard.ZstdError don't share much else.
+            raise ValueError(str(e))
+        if len(raw) % 4:
+            raise ValueError("data is not a whole number of gids")
+        gids = array('I')
+        gids.frombytes(raw)
+        if sys.byteorder == "big":
+            gids.byteswap()
+
+    elif encoding == "csv":
+        gids = array('I', data)
+
+    else:
+        raise ValueError("unknown encoding \"{0}\"".format(encoding))
+
+    if gids and max(gids) > tilemap.GID_MASK:
+        if numpy is not None:
+            masked = numpy.frombuffer(gids, numpy.uintc)
+            masked &= tilemap.GID_MASK
+        else:
+            gids = array('I', (gid & tilemap.GID_MASK for gid in gids))
+    return gids
 
 
 class Layer:
     """This class abstracts a layer.
 
+    Tiles are stored compactly. The layer keeps the gid of each tile in an array, what tiles with the same graphic
+    have in common is kept once by their tileset, and the few tiles with state of their own keep it in dictionaries
+    here. Tile instances are views onto this, made when asked for.
+
     Attributes:
         tilemap: Parent Tilemap instance.
 
         properties: A dictionary containing layer properties.
 
-        tiles: The list of Tile class instances for each tile.
+        tiles: A list-like of Tile views for each tile.
     """
 
     def __init__(self, driftwood, tilemap: 'tilemap.Tilemap', layerdata: dict, zpos: int):
@@ -57,19 +148,65 @@ class Layer:
         self.zpos = zpos
         self.properties = {}
 
-        self.tiles = _TileLoader(driftwood, self)
+        self.tiles = _TileList(self)
 
         # This contains the JSON of the layer.
         self._layer = layerdata
 
+        # The gid of each tile, without flip bits. An infinite map's layer only holds the gids of its loaded chunks.
+        self._chunks = {}  # {(cx, cy): JSON chunk segment} for each map chunk with tiles in this layer.
+        try:
+            if tilemap.infinite:
+                self._gids = _ChunkedGids(tilemap.width, tilemap.height, tilemap.chunkwidth, tilemap.chunkheight)
+                for chunk in layerdata.get("chunks", []):
+                    self._chunks[((chunk["x"] - tilemap.origin[0]) // tilemap.chunkwidth,
+                                  (chunk["y"] - tilemap.origin[1]) // tilemap.chunkheight)] = chunk
+            else:
+                self._gids = _read_gids(layerdata)
+            if len(self._gids) != tilemap.width * tilemap.height:
+                raise ValueError("{0} tiles for a {1}x{2} map".format(len(self._gids), tilemap.width,
+                                                                       tilemap.height))
+        except ValueError as e:
+            self.driftwood.log.msg("ERROR", "Layer", zpos, "__init__", "could not read tile data", e)
+            self._gids = array('I', bytes(4 * tilemap.width * tilemap.height))  # Carry on with an empty layer.
+
+        # With NumPy, a [y, x] view of the same gids for looking at many tiles at once.
+        self._grid = None
+        if numpy is not None and isinstance(self._gids, array) and self._gids:
+            self._grid = numpy.frombuffer(self._gids, numpy.uintc).reshape(tilemap.height, tilemap.width)
+
+        # State of the few tiles that have their own.
+        self._types = {}  # {seq: _TileType} for tiles given an animation of their own by Tile.setgid().
+        self._properties = {}  # {seq: properties} for tiles under objects whose properties were asked for.
+        self._nowalk = {}  # {seq: nowalk}
+
+        # The collision flags of each tile, so walking checks look at a byte instead of the tile's nowalk.
+        if tilemap.infinite:
+            self._collision = _SparseFlags()
+        else:
+            self._collision = bytearray(tilemap.width * tilemap.height)
+        self._exits = {}  # {seq: {exit type: destination}}
+
+        # The objects of the object layers merged into this one, looked at when a tile's state is first asked for.
+        self._objects = []  # [_ObjectIndex, ...]
+        self.__tiletype_exits = {}  # {_TileType: exits as in _Object.exits} for graphics of tiles under objects.
+
+        # Animated tiles with the same members and speed share an animation, starting when first drawn.
+        self.__animations = {}  # {seq: _Animation}
+        self.__shared = {}  # {(members, afps): _Animation}
+
         self.__prepare_layer()
 
     def __getitem__(self, item: int) -> '_AbstractColumn':
         return _AbstractColumn(self, item)
 
     def clear(self) -> None:
-        for tile in self.tiles:
-            self.tiles[tile].unregister()
+        """Stop animating the tiles of the layer.
+        """
+        for animation in self.__shared.values():
+            animation._terminate()
+        self.__animations = {}
+        self.__shared = {}
 
     def tile(self, x: int, y: int) -> Optional['tile.Tile']:
         """Retrieve a tile from the layer by its coordinates.
@@ -124,104 +261,322 @@ class Layer:
                                    "tried to lookup nonexistent tile at", "{0}x{1}".format(x, y))
             return None
 
-    def _process_objects(self, objdata: dict) -> None:
+    def preload(self, rect: List[int] = None) -> bool:
+        """Look up the graphics of the tiles in the layer all at once, instead of as they are first drawn.
+
+        The tileset and shared tile data of each distinct graphic are looked up once. Preloading the area around where
+        the view will be avoids a stutter when it is first drawn.
+
+        Args:
+            rect: (optional) Only load the tiles in this rectangle [x, y, w, h], measured in tiles.
+
+        Returns:
+            True if succeeded, False if failed.
+        """
+        # Input Check
+        try:
+            if rect is not None:
+                CHECK(rect, list, _equals=4)
+        except CheckFailure as e:
+            self.driftwood.log.msg("ERROR", "Layer", self.zpos, "preload", "bad argument", e)
+            return False
+
+        width, height = self.tilemap.width, self.tilemap.height
+
+        if rect is None:
+            gids = set(self._gids) if isinstance(self._gids, array) else self._gids.distinct()
+        else:
+            x_begin, y_begin = max(rect[0], 0), max(rect[1], 0)
+            x_end, y_end = min(rect[0] + rect[2], width), min(rect[1] + rect[3], height)
+            gids = set()
+            for y in range(y_begin, y_end):
+                gids.update(self._gids[y * width + x_begin:y * width + x_end])
+
+        for gid in gids:
+            self.tilemap._tiletype(gid)
+
+        return True
+
+    def _seq(self, x: float, y: float) -> int:
+        """Return the sequence number of the tile at a position, or -1 if it is off the map.
+
+        Unlike tile(), this takes pixel-derived coordinates that may be floats, and makes no Tile. It is for checks
+        made many times a tick.
+        """
+        if x < 0 or y < 0 or x >= self.tilemap.width or y >= self.tilemap.height:
+            return -1
+        return int(y) * self.tilemap.width + int(x)
+
+    def _blocks(self, seq: int, player: bool) -> bool:
+        """Return whether a tile's collision flags stop an entity walking onto it.
+
+        Args:
+            seq: Sequence number of the tile.
+            player: Whether the entity is the player.
+        """
+        return bool(self._collision[seq] & (NOWALK | (NOWALK_PLAYER if player else NOWALK_NPC)))
+
+    def _set_nowalk(self, seq: int, nowalk) -> None:
+        """Set the nowalk value of a tile and its collision flags.
+        """
+        self._nowalk[seq] = nowalk
+        self._collision[seq] = _nowalk_flags(nowalk)
+
+    def _update_collision(self, seq: int) -> None:
+        """Work out the collision flags of a tile again from its nowalk, after its graphic or objects changed.
+        """
+        self._collision[seq] = _nowalk_flags(self._tile_nowalk(seq))
+
+    def __update_object_collision(self, rect: List[int]) -> None:
+        """Work out the collision flags of the tiles in a rectangle [x, y, w, h] under objects without a nowalk.
+
+        The graphics of those tiles may have a nowalk of their own.
+        """
+        width = self.tilemap.width
+        for index in self._objects:
+            for obj in index.objects:
+                if "nowalk" in obj.properties:
+                    continue
+                for ty in range(max(obj.y, rect[1]), min(obj.y + obj.h, rect[1] + rect[3])):
+                    for tx in range(max(obj.x, rect[0]), min(obj.x + obj.w, rect[0] + rect[2])):
+                        self._update_collision(ty * width + tx)
+
+    def _load_chunk(self, key: Tuple[int, int]) -> bool:
+        """Read the tiles of a chunk of an infinite map into the layer.
+
+        Args:
+            key: Position (cx, cy) of the chunk, measured in chunks.
+
+        Returns:
+            True if the layer has tiles there and they were read, False otherwise.
+        """
+        chunk = self._chunks.get(key)
+        if not chunk:
+            return False
+
+        try:
+            gids = _read_gids({"data": chunk["data"], "encoding": self._layer.get("encoding", "csv"),
+                               "compression": self._layer.get("compression", "")})
+            if len(gids) != self.tilemap.chunkwidth * self.tilemap.chunkheight:
+                raise ValueError("{0} tiles for a {1}x{2} chunk".format(len(gids), self.tilemap.chunkwidth,
+                                                                         self.tilemap.chunkheight))
+        except ValueError as e:
+            self.driftwood.log.msg("ERROR", "Layer", self.zpos, "_load_chunk", "could not read tile data", key, e)
+            return False
+
+        self._gids.chunks[key] = gids
+        self.__update_object_collision([key[0] * self.tilemap.chunkwidth, key[1] * self.tilemap.chunkheight,
+                                        self.tilemap.chunkwidth, self.tilemap.chunkheight])
+        return True
+
+    def _evict_chunk(self, key: Tuple[int, int]) -> None:
+        """Forget the tiles of a chunk of an infinite map, along with any graphics they were given.
+
+        Args:
+            key: Position (cx, cy) of the chunk, measured in chunks.
+        """
+        if self._gids.chunks.pop(key, None) is None:
+            return
+
+        width = self.tilemap.width
+        x_begin, y_begin = key[0] * self.tilemap.chunkwidth, key[1] * self.tilemap.chunkheight
+        x_end, y_end = min(x_begin + self.tilemap.chunkwidth, width), y_begin + self.tilemap.chunkheight
+        for y in range(y_begin, min(y_end, self.tilemap.height)):
+            for seq in range(y * width + x_begin, y * width + x_end):
+                self._types.pop(seq, None)
+                self._unanimate(seq)
+
+    def _tiletype(self, seq: int) -> Tuple[Optional['tileset.Tileset'], Optional['tileset._TileType']]:
+        """Return the tileset of a tile and what it has in common with others, or (None, None) if it has no graphic.
+        """
+        ts, tiletype = self.tilemap._tiletype(self._gids[seq])
+        if seq in self._types:
+            return ts, self._types[seq]
+        return ts, tiletype
+
+    def _graphic(self, seq: int) -> Tuple[Optional['tileset.Tileset'], int]:
+        """Return the tileset of a tile and the member it shows right now, starting its animation if needed.
+
+        Returns:
+            (Tileset instance, member), or (None, -1) if there is nothing to draw.
+        """
+        ts, tiletype = self._tiletype(seq)
+        if not ts:
+            return None, -1
+
+        if tiletype.afps and len(tiletype.members) > 1:
+            animation = self.__animations.get(seq)
+            if not animation:
+                animation = self.__animate(seq, tiletype)
+            return ts, tiletype.members[animation.frame]
+
+        return ts, tiletype.members[0]
+
+    def __animate(self, seq: int, tiletype: 'tileset._TileType') -> '_Animation':
+        """Add a tile to the animation it shares with the other tiles like it, starting the animation if needed.
+        """
+        key = (tiletype.members, tiletype.afps)
+        animation = self.__shared.get(key)
+        if not animation:
+            animation = _Animation(self, len(tiletype.members), tiletype.afps)
+            self.__shared[key] = animation
+
+        animation.seqs.add(seq)
+        self.__animations[seq] = animation
+        return animation
+
+    def _unanimate(self, seq: int) -> None:
+        """Take a tile out of its animation, stopping the animation if no tiles are left in it.
+        """
+        animation = self.__animations.pop(seq, None)
+        if animation:
+            animation.seqs.discard(seq)
+            if not animation.seqs:
+                animation._terminate()
+                self.__shared = {key: value for key, value in self.__shared.items() if value is not animation}
+
+    def _tile_properties(self, seq: int) -> dict:
+        """Return the properties of a tile.
+
+        A tile under objects gets its own properties the first time they are asked for, layered over its graphic's
+        with a ChainMap so nothing is copied. Changes go to the tile alone.
+        """
+        if seq in self._properties:
+            return self._properties[seq]
+
+        tiletype = self._tiletype(seq)[1]
+        objs = self.__objects_at(seq)
+        if not objs:
+            return tiletype.properties if tiletype else {}
+
+        self._properties[seq] = collections.ChainMap({}, *[obj.properties for obj in reversed(objs)],
+                                                     tiletype.properties if tiletype else {})
+        return self._properties[seq]
+
+    def _tile_nowalk(self, seq: int):
+        """Return the nowalk value of a tile, from the last object over it with one if it wasn't set.
+
+        A tile under objects without one takes the nowalk of its graphic, like the rest of its properties.
+        """
+        if seq in self._nowalk:
+            return self._nowalk[seq]
+        objs = self.__objects_at(seq)
+        for obj in reversed(objs):
+            if "nowalk" in obj.properties:
+                return obj.properties["nowalk"]
+        if objs:
+            tiletype = self._tiletype(seq)[1]
+            if tiletype:
+                return tiletype.properties.get("nowalk")
+        return None
+
+    def _tile_exits(self, seq: int) -> dict:
+        """Return the exits of a tile, working them out from the objects over it the first time they are asked for.
+        """
+        if seq not in self._exits:
+            self._exits[seq] = self.__object_exits(seq)
+        return self._exits[seq]
+
+    def _has_exits(self, seq: int) -> bool:
+        """Return whether a tile has any exits, without keeping an empty dictionary of them if it has none.
+        """
+        if seq in self._exits:
+            return bool(self._exits[seq])
+        objs = self.__objects_at(seq)
+        return bool(objs) and (any(obj.exits for obj in objs) or bool(self.__graphic_exits(seq)))
+
+    def __objects_at(self, seq: int) -> List['_Object']:
+        """Return the objects over a tile, in the order they were merged into the layer.
+        """
+        if not self._objects:
+            return []
+        x, y = seq % self.tilemap.width, seq // self.tilemap.width
+        objs = []
+        for index in self._objects:
+            objs.extend(index.at(x, y))
+        return objs
+
+    def __graphic_exits(self, seq: int) -> dict:
+        """Return the exits in the tileset properties of a tile's graphic, reading them once per graphic.
+        """
+        tiletype = self._tiletype(seq)[1]
+        if not tiletype:
+            return {}
+        if tiletype not in self.__tiletype_exits:
+            self.__tiletype_exits[tiletype] = _read_exits(self.driftwood, tiletype.properties)
+        return self.__tiletype_exits[tiletype]
+
+    def __object_exits(self, seq: int) -> dict:
+        """Return the exits the objects over a tile give it.
+
+        Under objects, the exits of the tile's graphic count too, and the objects' own replace them. A wide exit gives
+        each tile under its object a destination moved along by the tile's place in the object. A wide exit of a
+        graphic is not moved along.
+        """
+        x, y = seq % self.tilemap.width, seq // self.tilemap.width
+        objs = self.__objects_at(seq)
+        if not objs:
+            return {}
+
+        exits = {exittype: ','.join(coords) for exittype, (coords, axis) in self.__graphic_exits(seq).items()}
+        for obj in objs:
+            for exittype, (coords, axis) in obj.exits.items():
+                if axis is not None:
+                    coords = list(coords)
+                    coords[axis] = str(int(coords[axis]) + (x - obj.x if axis == 2 else y - obj.y))
+                exits[exittype] = ','.join(coords)
+        return exits
+
+    def _process_objects(self, objdata: dict, index: '_ObjectIndex' = None) -> None:
         """Process and merge an object layer into the tile layer below.
 
+        The objects are kept as rectangles, and only looked at for a tile when its properties, nowalk or exits are
+        asked for. Only collision flags and entity auto-spawn triggers are set up now.
+
         This method is marked private even though it's called from Tilemap, because it should not be called outside the
         engine code.
 
         Args:
             objdata: JSON object layer segment.
+            index: (optional) The objects of the layer, if already read. The global object layer is read once and
+                merged by reference into every tile layer.
         """
         if "properties" in objdata:
             self.properties.update(objdata["properties"])
 
-        for obj in objdata["objects"]:
-            # Is the object properly sized?
-            if (obj["x"] % self.tilemap.tilewidth or obj["y"] % self.tilemap.tileheight or
-                        obj["width"] % self.tilemap.tilewidth or obj["height"] % self.tilemap.tileheight):
-                self.driftwood.log.msg("ERROR", "Layer", self.zpos, "_process_objects",
-                                       "invalid object size or placement")
-                continue
-
-            # Map object properties onto their tiles.
-            for x in range(0, obj["width"] // self.tilemap.tilewidth):
-                for y in range(0, obj["height"] // self.tilemap.tileheight):
-                    tx = obj["x"] // self.tilemap.tilewidth + x
-                    ty = obj["y"] // self.tilemap.tileheight + y
-
-                    # Insert the object properties.
-                    if "properties" in obj:
-                        self.__expand_properties(obj["properties"])
-                        self.tile(tx, ty).properties.update(obj["properties"])
-
-                    # Set nowalk if present.
-                    if "nowalk" in self.tile(tx, ty).properties:
-                        self.tile(tx, ty).nowalk = self.tile(tx, ty).properties["nowalk"]
-
-                    # Set exit if present.
-                    for exittype in ["exit", "exit:up", "exit:down", "exit:left", "exit:right"]:
-                        if exittype in self.tile(tx, ty).properties:
-
-                            # First check for and handle wide exits.
-                            exit_coords = self.tile(tx, ty).properties[exittype].split(',')
-                            if len(exit_coords) != 4:
-                                self.driftwood.log.msg("ERROR", "Layer", self.zpos, "_process_objects",
-                                                       "invalid exit trigger",
-                                                       self.tile(tx, ty).properties[exittype])
-                                continue
-
-                            if (exit_coords[2] and exit_coords[2][-1] == '+') and \
-                                    (exit_coords[3] and exit_coords[3][-1] == '+'):  # Invalid wide exit.
-                                self.driftwood.log.msg("ERROR", "Layer", "_process_objects",
-                                                       "cannot have multi-directional wide exits")
-
-                            # Check for and handle horizontal wide exit.
-                            elif exit_coords[2] and exit_coords[2][-1] == '+':
-                                base_coord = int(exit_coords[2][:1])  # Chop off the plus sign.
-                                if tx % self.tilemap.width == base_coord:  # This is the first position.
-                                    for wx in range(0, (obj["width"] // self.tilemap.tilewidth)):  # Set exits.
-                                        final_coords = exit_coords
-                                        final_coords[2] = str(base_coord + wx)
-                                        self.tile(tx + wx, ty).exits[exittype] = ','.join(final_coords)
-                                else:  # This is not the first position, skip.
-                                    continue
-
-                            # Check for and handle vertical wide exit.
-                            elif exit_coords[3] and exit_coords[3][-1] == '+':
-                                base_coord = int(exit_coords[3][:1])  # Chop off the plus sign.
-                                if ty == base_coord:  # This is the first position.
-                                    for wy in range(0, (obj["height"] // self.tilemap.tileheight)):  # Set exits.
-                                        final_coords = exit_coords
-                                        final_coords[3] = str(base_coord + wy)
-                                        self.tile(tx, ty + wy).exits[exittype] = ','.join(final_coords)
-                                else:  # This is not the first position, skip.
-                                    continue
-
-                            else:  # Just a regular exit.
-                                self.tile(tx, ty).exits[exittype] = self.tile(tx, ty).properties[exittype]
-
-                    # Handle entity auto-spawn triggers.
-                    if "entity" in self.tile(tx, ty).properties:
-                        self.driftwood.area._autospawns.append([self.tile(tx, ty).properties["entity"],
-                                                                self.zpos, tx, ty])
-
-    def __expand_properties(self, properties: Dict[str, str]) -> None:
-        new_props = {}
-        old_props = []
-
-        # Expand user-defined trigger shortcuts
-        for property_name in properties:
-            if self.driftwood.script.is_custom_trigger(property_name):
-                property = properties[property_name]
-                event, trigger = self.driftwood.script.lookup(property_name, property)
-                new_props[event] = trigger
-                old_props.append(property_name)
-
-        for event in new_props:
-            properties[event] = new_props[event]
-        for prop in old_props:
-            del properties[prop]
+        if index is None:
+            index = _ObjectIndex(self.driftwood, self.tilemap, objdata)
+        self._objects.append(index)
+
+        width = self.tilemap.width
+        for obj in index.objects:
+            # Set nowalk if present.
+            if "nowalk" in obj.properties:
+                flags = _nowalk_flags(obj.properties["nowalk"])
+                for ty in range(obj.y, obj.y + obj.h):
+                    begin = ty * width + obj.x
+                    if isinstance(self._collision, bytearray):
+                        self._collision[begin:begin + obj.w] = bytes([flags]) * obj.w
+                    else:
+                        for seq in range(begin, begin + obj.w):
+                            self._collision[seq] = flags
+            else:
+                # The graphics under the object may have a nowalk of their own.
+                for ty in range(obj.y, obj.y + obj.h):
+                    for seq in range(ty * width + obj.x, ty * width + obj.x + obj.w):
+                        self._update_collision(seq)
+
+            # Handle entity auto-spawn triggers. An object without one spawns those of the graphics under it.
+            if "entity" in obj.properties:
+                for ty in range(obj.y, obj.y + obj.h):
+                    for tx in range(obj.x, obj.x + obj.w):
+                        self.driftwood.area._autospawns.append([obj.properties["entity"], self.zpos, tx, ty])
+            else:
+                for ty in range(obj.y, obj.y + obj.h):
+                    for tx in range(obj.x, obj.x + obj.w):
+                        tiletype = self._tiletype(ty * width + tx)[1]
+                        if tiletype and "entity" in tiletype.properties:
+                            self.driftwood.area._autospawns.append([tiletype.properties["entity"], self.zpos, tx, ty])
 
     def __prepare_layer(self) -> None:
         # Set layer properties if present.
@@ -231,11 +586,195 @@ class Layer:
     def _terminate(self) -> None:
         """Cleanup before deletion.
         """
-        for tile in self.tiles:
-            self.tiles[tile]._terminate()
+        self.clear()
         self.tiles = []
 
 
+class _ChunkedGids:
+    """The gids of a layer of an infinite map, kept only for the chunks that are loaded.
+
+    Indexed by seq like the array of gids of other layers. Tiles in chunks that are not loaded have no graphic.
+
+    Attributes:
+        chunks: Dictionary of the gids of each loaded chunk, in arrays. Stored by (cx, cy) position in chunks.
+    """
+
+    def __init__(self, width: int, height: int, chunkwidth: int, chunkheight: int):
+        self.chunks = {}  # {(cx, cy): array of gids}
+
+        self.__width = width
+        self.__height = height
+        self.__chunkwidth = chunkwidth
+        self.__chunkheight = chunkheight
+
+    def __len__(self) -> int:
+        return self.__width * self.__height
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[seq] for seq in range(*item.indices(len(self)))]
+
+        y, x = divmod(item, self.__width)
+        chunk = self.chunks.get((x // self.__chunkwidth, y // self.__chunkheight))
+        if chunk is None:
+            return 0
+        return chunk[(y % self.__chunkheight) * self.__chunkwidth + x % self.__chunkwidth]
+
+    def __setitem__(self, seq: int, gid: int) -> None:
+        y, x = divmod(seq, self.__width)
+        key = (x // self.__chunkwidth, y // self.__chunkheight)
+        if key not in self.chunks:
+            self.chunks[key] = array('I', bytes(4 * self.__chunkwidth * self.__chunkheight))
+        self.chunks[key][(y % self.__chunkheight) * self.__chunkwidth + x % self.__chunkwidth] = gid
+
+    def distinct(self) -> set:
+        """Return the set of gids in the loaded chunks.
+        """
+        gids = {0}
+        for chunk in self.chunks.values():
+            gids.update(chunk)
+        return gids
+
+
+class _Object:
+    """An object from an object layer, measured in tiles.
+
+    Attributes:
+        x: x-coordinate of the top left tile.
+        y: y-coordinate of the top left tile.
+        w: Width in tiles.
+        h: Height in tiles.
+        properties: Dictionary of the object's properties, with trigger shortcuts expanded.
+        exits: Dictionary of the object's exits by exit type. Each is the destination [area, layer, x, y], and which
+            of those is counted across a wide exit (2 for x, 3 for y) or None.
+    """
+
+    __slots__ = ["x", "y", "w", "h", "properties", "exits"]
+
+    def __init__(self, x: int, y: int, w: int, h: int, properties: dict, exits: dict):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.properties = properties
+        self.exits = exits
+
+
+class _ObjectIndex:
+    """The objects of an object layer, kept in a grid of cells so the objects over a tile are found quickly.
+
+    Attributes:
+        objects: List of the objects with properties, in the order they appear in the object layer.
+    """
+
+    # Width and height of a cell in tiles.
+    CELL_SIZE = 16
+
+    def __init__(self, driftwood, tilemap: 'tilemap.Tilemap', objdata: dict):
+        """_ObjectIndex class initializer.
+
+        Args:
+            driftwood: Base class instance.
+            tilemap: The Tilemap instance the objects are on.
+            objdata: JSON object layer segment.
+        """
+        self.objects = []
+
+        self.__cells = {}  # {(cx, cy): [_Object, ...]}
+
+        tw, th = tilemap.tilewidth, tilemap.tileheight
+        for obj in objdata["objects"]:
+            # Is the object properly sized?
+            if obj["x"] % tw or obj["y"] % th or obj["width"] % tw or obj["height"] % th:
+                driftwood.log.msg("ERROR", "Layer", "_process_objects", "invalid object size or placement")
+                continue
+
+            # Is the object on the map? An infinite map's tiles are counted from the top left of its chunks.
+            x, y = obj["x"] // tw - tilemap.origin[0], obj["y"] // th - tilemap.origin[1]
+            w, h = obj["width"] // tw, obj["height"] // th
+            if x < 0 or y < 0 or x + w > tilemap.width or y + h > tilemap.height:
+                driftwood.log.msg("ERROR", "Layer", "_process_objects", "object outside the map")
+                continue
+
+            if not obj.get("properties") or not w or not h:
+                continue
+            _expand_properties(driftwood, obj["properties"])
+            self.__add(_Object(x, y, w, h, obj["properties"], _read_exits(driftwood, obj["properties"])))
+
+    def at(self, x: int, y: int) -> List[_Object]:
+        """Return the objects over a tile, in the order they appear in the object layer.
+        """
+        return [obj for obj in self.__cells.get((x // self.CELL_SIZE, y // self.CELL_SIZE), ())
+                if obj.x <= x < obj.x + obj.w and obj.y <= y < obj.y + obj.h]
+
+    def __add(self, obj: _Object) -> None:
+        self.objects.append(obj)
+        for cy in range(obj.y // self.CELL_SIZE, (obj.y + obj.h - 1) // self.CELL_SIZE + 1):
+            for cx in range(obj.x // self.CELL_SIZE, (obj.x + obj.w - 1) // self.CELL_SIZE + 1):
+                self.__cells.setdefault((cx, cy), []).append(obj)
+
+
+def _expand_properties(driftwood, properties: Dict[str, str]) -> None:
+    """Expand user-defined trigger shortcuts in a dictionary of properties.
+    """
+    new_props = {}
+    old_props = []
+
+    for property_name in properties:
+        if driftwood.script.is_custom_trigger(property_name):
+            property = properties[property_name]
+            event, trigger = driftwood.script.lookup(property_name, property)
+            new_props[event] = trigger
+            old_props.append(property_name)
+
+    for event in new_props:
+        properties[event] = new_props[event]
+    for prop in old_props:
+        del properties[prop]
+
+
+def _read_exits(driftwood, properties: dict) -> dict:
+    """Read the exits in an object's properties.
+
+    Returns: Dictionary of [destination, axis] for each exit type, as in _Object.exits.
+    """
+    exits = {}
+    for exittype in ["exit", "exit:up", "exit:down", "exit:left", "exit:right"]:
+        if exittype not in properties:
+            continue
+
+        # Parts after "area,layer,x,y" are ignored, as they are by _Exit.
+        exit_coords = properties[exittype].split(',')
+        if len(exit_coords) < 4:
+            driftwood.log.msg("ERROR", "Layer", "_process_objects", "invalid exit trigger", properties[exittype])
+            continue
+        exit_coords = exit_coords[:4]
+
+        wide_x = bool(exit_coords[2]) and exit_coords[2][-1] == '+'
+        wide_y = bool(exit_coords[3]) and exit_coords[3][-1] == '+'
+        if wide_x and wide_y:  # Invalid wide exit.
+            driftwood.log.msg("ERROR", "Layer", "_process_objects", "cannot have multi-directional wide exits")
+            continue
+
+        # Chop off the plus sign of a wide exit.
+        axis = 2 if wide_x else 3 if wide_y else None
+        if axis is not None:
+            exit_coords[axis] = exit_coords[axis][:-1]
+        exits[exittype] = [exit_coords, axis]
+
+    return exits
+
+
+class _SparseFlags(dict):
+    """The collision flags of a layer of an infinite map, kept only for the tiles that have any.
+
+    Indexed by seq like the bytearray of flags of other layers.
+    """
+
+    def __missing__(self, seq: int) -> int:
+        return 0
+
+
 class _AbstractColumn:
     def __init__(self, layer: Layer, x: int):
         self._layer = layer
@@ -245,60 +784,77 @@ class _AbstractColumn:
         return self._layer.tile(self.__x, item)
 
 
-class _TileLoader:
-    """Tile Loader
+class _TileList:
+    """Tile List
 
-    Implements lazy map loading by reading and caching each individual tile as needed. This class pretends to be a
-    list.
+    Makes a Tile view for each tile asked for by its sequence number. This class pretends to be a list.
     """
 
-    def __init__(self, driftwood, layer):
-        self.driftwood = driftwood
-        self.__tiles = {}
+    def __init__(self, layer: Layer):
         self.__layer = layer
 
-    def __getitem__(self, item: int) -> Optional['tile.Tile']:
+    def __getitem__(self, item: int) -> 'tile.Tile':
         # Returns a tile by its sequence number.
-        return self.__get(item)
+        if not 0 <= item < len(self.__layer._gids):
+            raise IndexError("tile index out of range")
+        return tile.Tile(self.__layer, item)
 
     def __len__(self) -> int:
         # Returns the total size in tiles of the tilemap.
-        return self.__layer.tilemap.width * self.__layer.tilemap.height
+        return len(self.__layer._gids)
 
     def __iter__(self):
-        # Allow us to be iterated like a list. This will necessarily load all tiles and is not recommended.
-        for seq in range(self.__len__()):
-            return self.__get(seq)
+        # Allow us to be iterated like a list.
+        for seq in range(len(self.__layer._gids)):
+            yield tile.Tile(self.__layer, seq)
 
-    def __get(self, seq: int) -> Optional['tile.Tile']:
-        # Get a tile by its sequence number, loading if not loaded.
-        if seq in self.__tiles:
-            # Already loaded. Return the cached tile.
-            return self.__tiles[seq]
 
-        else:
-            # Iterate through the tile graphic IDs.
-            layer = self.__layer
-            gid = layer._layer["data"][seq]
-            range_inclusive = lambda start, end: range(start, end + 1)
-
-            # Does this tile actually exist?
-            if gid:
-                # Find which tileset the tile's graphic is in.
-                for ts in layer.tilemap.tilesets:
-                    if gid in range_inclusive(*ts.range):
-                        # Create the Tile instance for this tile.
-                        self.__tiles[seq] = tile.Tile(layer, seq, ts, gid)
-                        break  # Stop searching.
-
-                if not seq in self.__tiles:
-                    # We found nothing. Set nothing.
-                    self.driftwood.log.msg("WARNING", "Layer", layer.zpos, "_TileLoader", "Orphan gid", gid,
-                                           "for tile", seq)
-                    self.__tiles[seq] = tile.Tile(layer, seq, None, None)
-
-            # No tile, here create a dummy tile.
+class _Animation:
+    """Animation
+
+    Animates every tile in a layer with the same members and speed, so they show the same member at once and share
+    one tick callback.
+
+    Attributes:
+        frame: Which of the members is shown.
+        seqs: Set of the sequence numbers of the tiles in the animation.
+    """
+
+    def __init__(self, layer: Layer, length: int, afps: float):
+        self.frame = 0
+        self.seqs = set()
+
+        self.__layer = layer
+        self.__length = length
+
+        self.__layer.tilemap.area.driftwood.tick.register(self._tick, delay=(1 / afps))
+
+    def _tick(self, seconds_past: float) -> None:
+        """Tick callback which moves on to the next member and redraws the tiles.
+        """
+        self.frame = (self.frame + 1) % self.__length
+
+        area = self.__layer.tilemap.area
+        width = self.__layer.tilemap.width
+        size = area.CHUNK_SIZE
+
+        # Redraw one rectangle around the tiles in each chunk, instead of one per tile.
+        bounds = {}  # {(cx, cy): [left, top, right, bottom]}
+        for seq in self.seqs:
+            x, y = seq % width, seq // width
+            rect = bounds.get((x // size, y // size))
+            if rect is None:
+                bounds[(x // size, y // size)] = [x, y, x, y]
             else:
-                self.__tiles[seq] = tile.Tile(layer, seq, None, None)
+                rect[0], rect[1] = min(rect[0], x), min(rect[1], y)
+                rect[2], rect[3] = max(rect[2], x), max(rect[3], y)
+
+        for left, top, right, bottom in bounds.values():
+            area.invalidate([left, top, right - left + 1, bottom - top + 1], tiles=True)
 
-            return self.__tiles[seq]
+    def _terminate(self) -> None:
+        """Cleanup before deletion.
+        """
+        driftwood = self.__layer.tilemap.area.driftwood
+        if driftwood.tick.registered(self._tick):
+            driftwood.tick.unregister(self._tick)
@@ -85,9 +85,24 @@ class Light:
         self.colormod = colormod
         self.entity = entity
 
+        self.__drawn = None  # Where we were last marked to be redrawn.
+
         if entity is not None:
             self.manager.driftwood.tick.register(self._track_entity, message=(entity, layermod))
 
+    def _invalidate(self) -> None:
+        """Mark where we were and where we are now to be redrawn.
+        """
+        area = self.manager.driftwood.area
+        rect = [self.x - self.w // 2, self.y - self.h // 2, self.w, self.h]
+
+        if self.__drawn and self.__drawn != rect:
+            area.invalidate(self.__drawn)
+        area.invalidate(rect)
+        self.__drawn = rect
+
+        area._patch_commands(self)
+
     def _track_entity(self, seconds_past: float, msg: Tuple[entity.Entity, int]) -> None:
         """Follow an entity's position.
         """
@@ -100,4 +115,4 @@ class Light:
         except AttributeError:
             self.manager.driftwood.tick.unregister(self._track_entity)
 
-        self.manager.driftwood.area.changed = True
+        self._invalidate()
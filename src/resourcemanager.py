@@ -31,7 +31,7 @@ import os
 import sys
 import traceback
 import zipfile
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 import filetype
 
@@ -54,6 +54,7 @@ class ResourceManager:
         self.driftwood = driftwood
         self.__injections = {}
         self.__duplicate_file_counts = {}
+        self.__atlas_table = None  # The contents of atlas.json once read, or {} if there is none.
 
     def inject(self, filename: str, data: Any) -> bool:
         """Inject data to be retrieved later by a fake filename.
@@ -330,6 +331,40 @@ class ResourceManager:
 
         return obj
 
+    def request_atlas_region(self, filename: str) -> Optional[Tuple[filetype.ImageFile, int, int, int, int]]:
+        """Find where an image was packed into a texture atlas by the atlas builder tool, if it was.
+
+        The atlas table is read from atlas.json at the root of the path the first time this is called.
+
+        Args:
+            filename: The filename of the packed image.
+
+        Returns:
+            Tuple of the atlas image and the x, y, width and height of the image in it if packed, None otherwise.
+        """
+        # Input Check
+        try:
+            CHECK(filename, str)
+        except CheckFailure as e:
+            self.driftwood.log.msg("ERROR", "Resource", "request_atlas_region", "bad argument", e)
+            return None
+
+        if self.__atlas_table is None:
+            self.__atlas_table = {}
+            if "atlas.json" in self.__injections or "atlas.json" in self.driftwood.path:
+                table = self.request_json("atlas.json")
+                if table and "atlases" in table and "images" in table:
+                    self.__atlas_table = table
+
+        if not self.__atlas_table or filename not in self.__atlas_table["images"]:
+            return None
+
+        number, x, y, w, h = self.__atlas_table["images"][filename]
+        atlas = self.request_image(self.__atlas_table["atlases"][number])
+        if not atlas:
+            return None
+        return atlas, x, y, w, h
+
     def request_raw(self, filename: str, binary: bool = False) -> Optional[bytes]:
         """Retrieve the raw contents of a file.
 
@@ -61,6 +61,9 @@ class ScriptManager:
         # Dictionary of module instances mapped by filename.
         self.__modules = {}
 
+        # Triggers read from map and entity properties, mapped by the string they were read from.
+        self.__triggers = {}  # {"filename,function,arg,...": _Trigger}
+
     def __contains__(self, item: str) -> bool:
         return self._module(item) is not None
 
@@ -97,13 +100,61 @@ class ScriptManager:
             self.driftwood.log.msg("ERROR", "Script", "call", "bad argument", e)
             return None
 
+        function = self._function(filename, func)
+        if function is None:
+            return None
+
         try:
-            return getattr(self[filename], func)(*args)
+            return function(*args)
         except Exception:
             self.driftwood.log.msg("ERROR", "Script", "call", "error from function", filename, func + "()",
                                    '\n' + traceback.format_exc().rstrip())
             return None
 
+    def _function(self, filename: str, func: str) -> Optional[Callable]:
+        """Look up a function in a script, loading the script if not already loaded.
+
+        This method is marked private because it is only used by call() and by triggers, which keep what it returns.
+
+        Args:
+            filename: Filename of the python script containing the function.
+            func: Name of the function.
+
+        Returns: The function if succeeded, None if failed.
+        """
+        module = self[filename]
+        if module is None:
+            return None
+
+        function = getattr(module, func, None)
+        if not callable(function):
+            self.driftwood.log.msg("ERROR", "Script", "call", "no such function", filename, func + "()")
+            return None
+        return function
+
+    def _trigger(self, trigger: str) -> Optional['_Trigger']:
+        """Read a trigger of the form "filename,function,arg,..." from a map or entity property.
+
+        Each distinct string is only read once, so calling the same trigger again is a direct call of its function
+        with the arguments already split. This method is marked private because the engine calls it on each event.
+
+        Args:
+            trigger: The trigger string.
+
+        Returns: _Trigger instance, or None if the string does not name a function.
+        """
+        if type(trigger) is not str:
+            return None
+        if trigger in self.__triggers:
+            return self.__triggers[trigger]
+
+        args = trigger.split(',')
+        if len(args) < 2:
+            return None
+
+        self.__triggers[trigger] = _Trigger(self, args[0], args[1], tuple(args[2:]))
+        return self.__triggers[trigger]
+
     def define(self, name: str, event: str, filename: str, func: str, nargs: int, minargs: int = None) -> bool:
         """Define a custom trigger that can be called directly from a map property.
 
@@ -359,6 +410,11 @@ class ScriptManager:
                         mpath = mpath.replace('/', '\\')
                     self.__modules[filename] = importer.load_module(mpath)
 
+                # Triggers must not keep calling functions from an older copy of the script.
+                for trigger in self.__triggers.values():
+                    if trigger.filename == filename:
+                        trigger._unbind()
+
                 self.driftwood.log.info("Script", "loaded", filename)
                 return True
 
@@ -370,3 +426,42 @@ class ScriptManager:
         else:
             self.driftwood.log.msg("ERROR", "Script", "__load", "no such script", filename)
             return False
+
+
+class _Trigger:
+    """A trigger read from a map or entity property, which calls its function like ScriptManager.call().
+
+    The function is looked up the first time the trigger is called and kept until its script is loaded again. A failed
+    lookup is not kept, so it is tried again on the next call.
+
+    Attributes:
+        filename: Filename of the python script containing the function.
+        func: Name of the function to call.
+        args: Tuple of the arguments from the trigger string, passed before any others.
+    """
+
+    def __init__(self, manager: ScriptManager, filename: str, func: str, args: Tuple[str, ...]):
+        self.filename = filename
+        self.func = func
+        self.args = args
+
+        self.__manager = manager
+        self.__function = None
+
+    def __call__(self, *args: Any) -> Any:
+        if self.__function is None:
+            self.__function = self.__manager._function(self.filename, self.func)
+            if self.__function is None:
+                return None
+
+        try:
+            return self.__function(*(self.args + args))
+        except Exception:
+            self.__manager.driftwood.log.msg("ERROR", "Script", "call", "error from function", self.filename,
+                                             self.func + "()", '\n' + traceback.format_exc().rstrip())
+            return None
+
+    def _unbind(self) -> None:
+        """Forget the function, so it is looked up again on the next call.
+        """
+        self.__function = None
@@ -0,0 +1,145 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# spatialhash.py                   #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+from typing import Hashable, List, Set, Tuple
+
+
+class SpatialHash:
+    """Spatial Hash
+
+    Buckets objects into the cells of a uniform grid by the rectangles they cover, so that finding the objects touching
+    a rectangle only has to look at the cells under it instead of at every object.
+
+    Attributes:
+        cellsize: Width and height of a grid cell in pixels.
+    """
+
+    def __init__(self, cellsize: int):
+        """SpatialHash class initializer.
+
+        Args:
+            cellsize: Width and height of a grid cell in pixels.
+        """
+        self.cellsize = cellsize
+
+        self.__cells = {}  # {(cell x, cell y): {object, ...}}
+        self.__rects = {}  # {object: [x, y, w, h]}
+        self.__keys = {}  # {object: [(cell x, cell y), ...]}
+
+    def __contains__(self, obj: Hashable) -> bool:
+        return obj in self.__rects
+
+    def __len__(self) -> int:
+        return len(self.__rects)
+
+    def __iter__(self):
+        return iter(self.__rects)
+
+    def insert(self, obj: Hashable, rect: List[int]) -> None:
+        """Insert an object covering a rectangle, or move it if it is already present.
+
+        Args:
+            obj: The object.
+            rect: Rectangle [x, y, w, h] the object covers.
+        """
+        keys = self.__cells_under(rect)
+        old_keys = self.__keys.get(obj)
+
+        if keys != old_keys:
+            if old_keys:
+                self.__unlink(obj, old_keys)
+            for key in keys:
+                if key in self.__cells:
+                    self.__cells[key].add(obj)
+                else:
+                    self.__cells[key] = {obj}
+            self.__keys[obj] = keys
+
+        self.__rects[obj] = list(rect)
+
+    def remove(self, obj: Hashable) -> None:
+        """Remove an object if it is present.
+
+        Args:
+            obj: The object.
+        """
+        if obj in self.__rects:
+            self.__unlink(obj, self.__keys[obj])
+            del self.__keys[obj]
+            del self.__rects[obj]
+
+    def rect(self, obj: Hashable) -> List[int]:
+        """Return the rectangle an object was inserted with.
+        """
+        return self.__rects[obj]
+
+    def query(self, rect: List[int]) -> Set[Hashable]:
+        """Find the objects whose rectangles overlap a rectangle.
+
+        Args:
+            rect: Rectangle [x, y, w, h] to look in.
+
+        Returns:
+            Set of objects.
+        """
+        candidates = set()
+        for key in self.__cells_under(rect):
+            if key in self.__cells:
+                candidates |= self.__cells[key]
+
+        x, y, w, h = rect
+        found = set()
+        for obj in candidates:
+            ox, oy, ow, oh = self.__rects[obj]
+            if ox < x + w and x < ox + ow and oy < y + h and y < oy + oh:
+                found.add(obj)
+        return found
+
+    def clear(self) -> None:
+        """Remove all objects.
+        """
+        self.__cells = {}
+        self.__rects = {}
+        self.__keys = {}
+
+    def __cells_under(self, rect: List[int]) -> List[Tuple[int, int]]:
+        """Return the keys of the cells a rectangle touches.
+        """
+        x, y, w, h = rect
+        cs = self.cellsize
+        return [(cx, cy)
+                for cy in range(y // cs, (y + max(h, 1) - 1) // cs + 1)
+                for cx in range(x // cs, (x + max(w, 1) - 1) // cs + 1)]
+
+    def __unlink(self, obj: Hashable, keys: List[Tuple[int, int]]) -> None:
+        """Take an object out of the cells it was in, dropping cells that become empty.
+        """
+        for key in keys:
+            cell = self.__cells[key]
+            cell.discard(obj)
+            if not cell:
+                del self.__cells[key]
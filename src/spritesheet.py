@@ -27,6 +27,7 @@
 
 from ctypes import byref
 from sdl2 import *
+from typing import Tuple
 
 import entitymanager
 
@@ -38,8 +39,8 @@ class Spritesheet:
         entitymanager: Parent EntityManager instance.
 
         filename: Filename of the sprite sheet image.
-        image: The filetype.ImageFile instance for the sprite sheet image.
-        texture: The SDL_Texture for the sprite sheet image.
+        image: The filetype.ImageFile instance for the sprite sheet image, or for the texture atlas it was packed into.
+        texture: The SDL_Texture for the sprite sheet image or its atlas.
         imagewidth: Width of the sprite sheet in pixels.
         imageheight: Height of the sprite sheet in pixels.
     """
@@ -58,14 +59,46 @@ class Spritesheet:
         self.texture = None
         self.imagewidth = 0
         self.imageheight = 0
+        self.__srcrects = {}  # {(width, height): table of srcrects}
+        self.__origin = (0, 0)  # Position of the sprite sheet image in the texture.
         self.__resource = self.entitymanager.driftwood.resource
 
         self.__prepare_spritesheet()
 
     def __prepare_spritesheet(self) -> None:
+        # The image may have been packed into a texture atlas, in which case its frames are drawn from there.
+        region = self.__resource.request_atlas_region(self.filename)
+        if region:
+            self.image, x, y, self.imagewidth, self.imageheight = region
+            self.texture = self.image.texture
+            self.__origin = (x, y)
+            return
+
         self.image = self.__resource.request_image(self.filename)
         self.texture = self.image.texture
 
         tw, th = c_int(), c_int()
         SDL_QueryTexture(self.texture, None, None, byref(tw), byref(th))
         self.imagewidth, self.imageheight = tw.value, th.value
+
+    def srcrects(self, width: int, height: int) -> Tuple[Tuple[int, int, int, int], ...]:
+        """Return the (x, y, w, h) texture source rectangle of every frame of the given size, indexed by member.
+
+        The table is worked out once per frame size and kept.
+
+        Args:
+            width: Width of a frame in pixels.
+            height: Height of a frame in pixels.
+
+        Returns:
+            Tuple of source rectangles.
+        """
+        table = self.__srcrects.get((width, height))
+        if table is None:
+            columns = self.imagewidth // width if width else 0
+            rows = self.imageheight // height if height else 0
+            x, y = self.__origin
+            table = tuple((x + member % columns * width, y + member // columns * height, width, height)
+                          for member in range(columns * rows))
+            self.__srcrects[(width, height)] = table
+        return table
@@ -25,6 +25,7 @@
 # IN THE SOFTWARE.
 # **********
 
+import time
 import types
 from inspect import signature
 from typing import Any, Callable
@@ -67,8 +68,16 @@ class TickManager:
         self._most_recent_time = self._get_time()
         self.__last_time = self._most_recent_time
 
+        # Seconds between the starts of the last two ticks, and seconds spent calling back during the last tick.
+        self._last_interval = 0.0
+        self._last_duration = 0.0
+        self.__started = None
+
         self.paused = False
 
+    def __len__(self) -> int:
+        return len(self.__registry)
+
     def register(self,
                  func: Callable,
                  delay: float = 0.0,
@@ -192,9 +201,16 @@ class TickManager:
         self.__last_time = self._most_recent_time
         self._most_recent_time = current_second
 
+        started = time.perf_counter()
+        if self.__started is not None:
+            self._last_interval = started - self.__started
+        self.__started = started
+
         for callback in self.__registry:
             self.__call_callback(callback, current_second)
 
+        self._last_duration = time.perf_counter() - started
+
         # Regulate ticks per second. Course-grained sleep by OS.
         delay = self._get_delay()
         if delay - WAKE_UP_LATENCY > 0.0:
@@ -25,15 +25,19 @@
 # IN THE SOFTWARE.
 # **********
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import layer
+import tilemap
 import tileset
 
 
 class Tile:
     """This class represents a tile.
 
+    Tiles are views onto the compact storage of their layer, made when asked for. Two Tile instances for the same
+    position in the same layer are equal, but may not be the same instance, so compare them with == instead of is.
+
     Attributes:
         layer: Parent Layer instance.
 
@@ -41,91 +45,102 @@ class Tile:
         tileset: Tileset instance of the tileset which owns this tile's graphic.
         gid: Global Graphic-ID of the tile.
         localgid: Graphic-ID of the tile in relation to its own tileset.
-        members: A list of sequence positions of member graphics in the tile's tileset.
+        members: A tuple of sequence positions of member graphics in the tile's tileset. To change them, use
+            setgid(members=...).
         afps: Animation frames-per-second.
         pos: A two-member list containing the x and y coordinates of the tile's position in the map.
-        properties: A dictionary containing tile properties.
+        properties: A dictionary containing tile properties. Shared by every tile with the same graphic, unless the
+            tile is under objects, when it gets a mapping of its own layered over its graphic's.
 
-        nowalk: If true, the tile is not walkable.
+        nowalk: If true, the tile is not walkable. "player" or "npc" only stop those. Changing the "nowalk" property
+            does not change this.
         exits: A dictionary of exit types ("exit", "exit:up", "exit:down", "exit:left", "exit:right"], with those
             present mapped to a list containing the destination [area, layer, x, y].
     """
 
-    __slots__ = ["layer", "seq", "tileset", "gid", "localgid", "members", "afps", "pos", "properties", "nowalk",
-                 "exits", "__dstrect", "__cur_member"]
+    __slots__ = ["layer", "seq"]
 
-    def __init__(self, layer: layer.Layer, seq: int, tileset: Optional[tileset.Tileset], gid: Optional[int]):
+    def __init__(self, layer: layer.Layer, seq: int):
         """Tile class initializer.
 
         Args:
             layer: Link back to the parent Layer instance.
             seq: Tile's sequence in the map.
-            tileset: Tileset instance of the tileset which owns this tile's graphic.
-            gid: Global Graphic-ID of the tile.
         """
         self.layer = layer
-
         self.seq = seq
-        self.tileset = tileset
-        self.gid = gid
-        self.localgid = None
-        self.members = []
-        self.afps = 0.0
-        self.pos = [
-            self.seq % self.layer.tilemap.width,
-            self.seq // self.layer.tilemap.width
-        ]
-        self.properties = {}
-
-        self.nowalk = None
-        self.exits = {}
-
-        self.__dstrect = None
-
-        # Real tile.
-        if tileset and gid:
-            self.localgid = self.gid - self.tileset.range[0]
-            self.members = [self.localgid]
-            self.__dstrect = [
-                self.pos[0] * self.tileset.tilewidth,
-                self.pos[1] * self.tileset.tileheight,
-                self.tileset.tilewidth,
-                self.tileset.tileheight
-            ]
-
-            if self.tileset.tileproperties and self.localgid in self.tileset.tileproperties:
-                self.properties = self.tileset.tileproperties[self.localgid]
-
-            if "members" in self.properties:
-                temp_members = list(map(int, self.properties["members"].split(',')))
-                self.members = []
-                for m in temp_members:
-                    # Make things prettier for the end user by lining up member IDs with GIDs.
-                    self.members.append(m - 1)
-            if "afps" in self.properties:
-                self.afps = float(self.properties["afps"])
-
-            self.__cur_member = 0
-
-            # Schedule animation.
-            if self.afps:
-                self.layer.tilemap.area.driftwood.tick.register(self.__next_member, delay=(1 / self.afps))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Tile) and self.layer is other.layer and self.seq == other.seq
+
+    def __hash__(self) -> int:
+        return hash((id(self.layer), self.seq))
+
+    @property
+    def tileset(self) -> Optional[tileset.Tileset]:
+        return self.layer._tiletype(self.seq)[0]
+
+    @property
+    def gid(self) -> Optional[int]:
+        if self.tileset:
+            return self.layer._gids[self.seq]
+        return None
+
+    @property
+    def localgid(self) -> Optional[int]:
+        ts = self.tileset
+        if ts:
+            return self.layer._gids[self.seq] - ts.range[0]
+        return None
+
+    @property
+    def members(self) -> Tuple[int, ...]:
+        tiletype = self.layer._tiletype(self.seq)[1]
+        return tiletype.members if tiletype else ()
+
+    @property
+    def afps(self) -> float:
+        tiletype = self.layer._tiletype(self.seq)[1]
+        return tiletype.afps if tiletype else 0.0
+
+    @property
+    def pos(self) -> List[int]:
+        return [self.seq % self.layer.tilemap.width, self.seq // self.layer.tilemap.width]
+
+    @property
+    def properties(self) -> dict:
+        return self.layer._tile_properties(self.seq)
+
+    @property
+    def nowalk(self):
+        return self.layer._tile_nowalk(self.seq)
+
+    @nowalk.setter
+    def nowalk(self, value) -> None:
+        self.layer._set_nowalk(self.seq, value)
+
+    @property
+    def exits(self) -> dict:
+        return self.layer._tile_exits(self.seq)
 
     def srcrect(self) -> List[int]:
         """Return an (x, y, w, h) srcrect for the current graphic frame of the tile.
         """
-        if self.members:
-            current_member = self.members[self.__cur_member]
-            if current_member is not -1:
-                return [(current_member * self.tileset.tilewidth) % self.tileset.imagewidth,
-                        current_member * self.tileset.tilewidth // self.tileset.imagewidth * self.tileset.tileheight,
-                        self.tileset.tilewidth, self.tileset.tileheight]
+        ts, member = self.layer._graphic(self.seq)
+        if ts and member != -1:
+            return list(ts.srcrects[member])
         return [0, 0, 0, 0]
 
     def dstrect(self) -> List[int]:
-        """Return a copy of our (x, y, w, h) dstrect so that external operations don't change our local variable.
+        """Return an (x, y, w, h) dstrect for the tile's position in the map.
         """
-        return list(self.__dstrect)
+        tilemap = self.layer.tilemap
+        return [
+            self.seq % tilemap.width * tilemap.tilewidth,
+            self.seq // tilemap.width * tilemap.tileheight,
+            tilemap.tilewidth,
+            tilemap.tileheight
+        ]
 
     def offset(self, x, y) -> Optional['Tile']:
         """Return the tile at this offset.
@@ -135,10 +150,11 @@ class Tile:
             CHECK(x, int)
             CHECK(y, int)
         except CheckFailure as e:
-            self.tileset.driftwood.log.msg("ERROR", "Tile", [self.layer, self.pos], "offset", "bad argument", e)
+            self.layer.driftwood.log.msg("ERROR", "Tile", [self.layer, self.pos], "offset", "bad argument", e)
             return None
 
-        return self.layer.tile(self.pos[0] + x, self.pos[1] + y)
+        pos = self.pos
+        return self.layer.tile(pos[0] + x, pos[1] + y)
 
     def setgid(self, gid: int, members: List[int] = None, afps: int = None) -> Optional[bool]:
         """Helper function to change the tile graphic or animation.
@@ -148,10 +164,8 @@ class Tile:
         afps: Animation frames per second if set. Will not animate otherwise.
         
         Returns:
-            True
+            True if succeeded, None if failed.
         """
-        # TODO: Make sure the GID exists.
-
         # Input Check
         try:
             CHECK(gid, int, _min=0)
@@ -160,35 +174,41 @@ class Tile:
             if afps is not None:
                 CHECK(afps, int, _min=0)
         except CheckFailure as e:
-            self.tileset.driftwood.log.msg("ERROR", "Tile", [self.layer, self.pos], "setgid", "bad argument", e)
+            self.layer.driftwood.log.msg("ERROR", "Tile", [self.layer, self.pos], "setgid", "bad argument", e)
             return None
 
-        self.gid = gid
-        self.localgid = self.gid - self.tileset.range[0]
+        gid &= tilemap.GID_MASK
+        ts, tiletype = self.layer.tilemap._tiletype(gid)
+        if gid and not ts:
+            self.layer.driftwood.log.msg("ERROR", "Tile", [self.layer, self.pos], "setgid", "no such gid", gid)
+            return None
+
+        old_afps = self.afps
+        self.layer._gids[self.seq] = gid
+        self.layer._unanimate(self.seq)
+        self.layer._types.pop(self.seq, None)
 
-        if members:
-            for m in range(len(members)):
+        if ts and (members or afps):
+            # This tile gets an animation of its own. It keeps its old speed if not given a new one.
+            if members:
                 # Make things prettier for the end user by lining up member IDs with GIDs.
-                members[m] -= 1
-            self.members = members
-        else:
-            self.members = [self.localgid]
+                members = ts._check_members(tuple(m - 1 for m in members))
+            else:
+                members = (gid - ts.range[0],)
+            self.layer._types[self.seq] = tileset._TileType(members, float(afps or old_afps), tiletype.properties)
 
-        if afps:
-            self.afps = afps
-            self.layer.tilemap.area.driftwood.tick.register(self.__next_member, delay=(1 / self.afps))
+        # The new graphic may have a nowalk of its own.
+        self.layer._update_collision(self.seq)
 
-        return True
+        # The tile may no longer match the baked layers.
+        self.layer.tilemap.area._invalidate_bakes(self)
 
-    def __next_member(self, seconds_past: float) -> None:
-        if self.members:
-            self.__cur_member = (self.__cur_member + 1) % len(self.members)
-            self.layer.tilemap.area.changed = True
+        return True
 
     def unregister(self) -> None:
-        driftwood = self.layer.tilemap.area.driftwood
-        if driftwood.tick.registered(self.__next_member):
-            driftwood.tick.unregister(self.__next_member)
+        """Stop animating the tile until it is next drawn.
+        """
+        self.layer._unanimate(self.seq)
 
     def _terminate(self) -> None:
         """Cleanup before deletion.
@@ -25,10 +25,29 @@
 # IN THE SOFTWARE.
 # **********
 
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
 import areamanager
 import layer
 import tileset
 
+try:
+    import numpy
+except ImportError:
+    numpy = None  # Optional. Tiles are looked up one by one without it.
+
+# Tiled keeps whether a tile is flipped or rotated in the high bits of its gid. Masking them off leaves the gid.
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+ROTATED_HEXAGONAL_120 = 0x10000000
+GID_MASK = 0x0FFFFFFF
+
+
+# Chunks of an infinite map within this many chunks of the player's are loaded, unless the map says otherwise.
+STREAM_RADIUS = 2
+
 
 class Tilemap:
     """This class reads the Tiled map file for the currently focused area, and presents an abstraction.
@@ -40,7 +59,16 @@ class Tilemap:
         height: Height of the map in tiles.
         tilewidth: Width of tiles in the map.
         tileheight: Height of tiles in the map.
-        properties: A dictionary containing map properties.
+        properties: A dictionary containing map properties. If the "preload" property is true, the graphics of every
+            tile are looked up with the map instead of when first drawn.
+
+        infinite: Whether this is an infinite map, whose tiles are loaded a chunk at a time around the player. The
+            "stream_radius" map property sets how many chunks around the player's are loaded. The "on_chunk_load" and
+            "on_chunk_evict" map properties name functions called with the [x, y, w, h] of each chunk, in tiles.
+        chunkwidth: Width of the chunks of an infinite map in tiles.
+        chunkheight: Height of the chunks of an infinite map in tiles.
+        origin: Position in Tiled of the top left tile of the map. Infinite maps are counted from the top left of
+            their chunks, so tile positions in the engine don't go below zero.
 
         layers: The list of Layer class instances for each layer.
         tilesets: The list of Tileset class instances for each tileset.
@@ -62,10 +90,25 @@ class Tilemap:
         self.tilewidth = 0
         self.tileheight = 0
         self.properties = {}
+        self.infinite = False
+        self.chunkwidth = 0
+        self.chunkheight = 0
+        self.origin = [0, 0]
 
         self.layers = []
         self.tilesets = []
 
+        # Chunks of an infinite map that are loaded, and the entities they spawn.
+        self.__resident = set()  # {(cx, cy), ...}
+        self.__spawns = {}  # {(cx, cy): [[autospawn, eid or None], ...]}
+        self.__streamed_at = None  # The chunk we last loaded around.
+
+        # The tilesets sorted by first gid, and their first gids, for finding which tileset a gid belongs to.
+        self.__sorted_tilesets = []
+        self.__firstgids = []
+        self.__tiletypes = {0: (None, None)}  # {gid: (tileset, tile type)} for each gid looked up.
+        self.__gid_table = None
+
         # This contains the JSON of the Tiled map.
         self.__tilemap = {}
 
@@ -84,10 +127,86 @@ class Tilemap:
         Returns:
             Layer z position.
         """
-        fakedata = {"data": [0] * (self.width * self.height)}
+        fakedata = {"chunks": []} if self.infinite else {"data": [0] * (self.width * self.height)}
         self.layers.append(layer.Layer(self.driftwood, self, fakedata, len(self.layers)))
+        self.area._invalidate_bakes()
         return self.layers[-1].zpos
 
+    def _tileset(self, gid: int) -> Optional['tileset.Tileset']:
+        """Find the tileset a gid belongs to, ignoring any flip bits.
+
+        Args:
+            gid: Global Graphic-ID of a tile, as found in the layer data.
+
+        Returns:
+            Tileset instance, or None if no tileset has the gid.
+        """
+        gid &= GID_MASK
+        i = bisect_right(self.__firstgids, gid) - 1
+        if i < 0:
+            return None
+        ts = self.__sorted_tilesets[i]
+        if gid > ts.range[1]:
+            return None
+        return ts
+
+    def _tiletype(self, gid: int) -> Tuple[Optional['tileset.Tileset'], Optional['tileset._TileType']]:
+        """Find the tileset of a gid and what every tile with that graphic has in common, looking them up only once.
+
+        Args:
+            gid: Global Graphic-ID of a tile, without flip bits.
+
+        Returns:
+            (Tileset instance, _TileType instance), or (None, None) if there is no such graphic.
+        """
+        if gid in self.__tiletypes:
+            return self.__tiletypes[gid]
+
+        ts = self._tileset(gid)
+        if ts:
+            self.__tiletypes[gid] = (ts, ts._tiletype(gid - ts.range[0]))
+        else:
+            # We found nothing. Set nothing.
+            self.driftwood.log.msg("WARNING", "Tilemap", "_tiletype", "Orphan gid", gid)
+            self.__tiletypes[gid] = (None, None)
+
+        return self.__tiletypes[gid]
+
+    def _gid_table(self) -> Optional[list]:
+        """Return NumPy tables indexed by gid, for looking up many tiles at once, building them if needed.
+
+        Returns:
+            [kind, tileset, member, tilesets] if NumPy is available, otherwise None. Kind is 0 for no graphic, 1 for a
+            static graphic and 2 for an animated one. Tileset is the index in tilesets of the gid's tileset, or -1.
+            Member is the first member the graphic shows. Gids past the end of the tables have no graphic.
+        """
+        if numpy is None or not self.__sorted_tilesets:
+            return None
+
+        if self.__gid_table is None:
+            size = max(ts.range[1] for ts in self.__sorted_tilesets) + 1
+            kind = numpy.zeros(size, numpy.uint8)
+            tileset_index = numpy.full(size, -1, numpy.int32)
+            member = numpy.full(size, -1, numpy.int32)
+
+            # Later tilesets win where ranges overlap, like in _tileset().
+            for n, ts in enumerate(self.__sorted_tilesets):
+                first, last = ts.range
+                kind[first:last + 1] = 1
+                tileset_index[first:last + 1] = n
+                member[first:last + 1] = numpy.arange(ts.size)
+
+                # Only tiles with properties can have members of their own.
+                for localgid in ts.tileproperties:
+                    if 0 <= localgid < ts.size:
+                        tiletype = ts._tiletype(localgid)
+                        kind[first + localgid] = 2 if tiletype.afps and len(tiletype.members) > 1 else 1
+                        member[first + localgid] = tiletype.members[0]
+
+            self.__gid_table = [kind, tileset_index, member, list(self.__sorted_tilesets)]
+
+        return self.__gid_table
+
     def _read(self, filename: str, data: dict) -> bool:
         """Read and abstract a Tiled map.
 
@@ -108,6 +227,13 @@ class Tilemap:
             self.layers = []
         if self.tilesets:
             self.tilesets = []
+        self.__sorted_tilesets = []
+        self.__firstgids = []
+        self.__tiletypes = {0: (None, None)}
+        self.__gid_table = None
+        self.__resident = set()
+        self.__spawns = {}
+        self.__streamed_at = None
         self.driftwood.light.reset()
 
         # Load the JSON data.
@@ -118,6 +244,9 @@ class Tilemap:
         self.height = self.__tilemap["height"]
         self.tilewidth = self.__tilemap["tilewidth"]
         self.tileheight = self.__tilemap["tileheight"]
+        self.infinite = bool(self.__tilemap.get("infinite"))
+        if self.infinite:
+            self.__measure_chunks()
         if "properties" in self.__tilemap:
             self.properties = self.__tilemap["properties"]
         else:
@@ -130,7 +259,12 @@ class Tilemap:
 
         # Call the on_enter event if set.
         if "on_enter" in self.properties:
-            self.driftwood.script.call(*self.properties["on_enter"].split(','))
+            trigger = self.driftwood.script._trigger(self.properties["on_enter"])
+            if not trigger:
+                self.driftwood.log.msg("ERROR", "Tilemap", "_read", "invalid on_enter event",
+                                       self.properties["on_enter"])
+            else:
+                trigger()
 
         # Set the window title.
         if "title" in self.properties:
@@ -148,6 +282,9 @@ class Tilemap:
                 return False  # There is no way we can continue without our tilesets.
             self.tilesets.append(ts)
 
+        self.__sorted_tilesets = sorted(self.tilesets, key=lambda ts: ts.range[0])
+        self.__firstgids = [ts.range[0] for ts in self.__sorted_tilesets]
+
         # Global object layer.
         gobjlayer = {}
 
@@ -171,11 +308,127 @@ class Tilemap:
 
         # Merge the global object layer into all tile layers.
         if gobjlayer:
+            index = layer._ObjectIndex(self.driftwood, self, gobjlayer)
+            for l in self.layers:
+                l._process_objects(gobjlayer, index)
+
+        # An infinite map's entities are spawned with the chunks they are in.
+        if self.infinite:
+            for spawn in self.area._autospawns:
+                self.__spawns.setdefault((spawn[2] // self.chunkwidth, spawn[3] // self.chunkheight), []).append(
+                    [spawn, None])
+            self.area._autospawns = []
+
+        # Look up every tile's graphic now instead of as they are first drawn, if the map asks for it. An infinite map's
+        # are looked up as each chunk loads.
+        elif self.properties.get("preload") in [True, "true"]:
             for l in self.layers:
-                l._process_objects(gobjlayer)
+                l.preload()
 
         return True
 
+    def _stream(self, x: int, y: int) -> None:
+        """Load the chunks of an infinite map around a tile, and evict those too far from it.
+
+        Chunks are evicted a chunk further out than they are loaded, so walking back and forth over the edge of a chunk
+        does not load and evict the same chunks over and over. This method is marked private even though it's called
+        from AreaManager, because it is called every tick.
+
+        Args:
+            x: x-coordinate of the tile, usually the player's.
+            y: y-coordinate of the tile.
+        """
+        center = (x // self.chunkwidth, y // self.chunkheight)
+        if center == self.__streamed_at:
+            return
+        self.__streamed_at = center
+
+        try:
+            radius = int(self.properties.get("stream_radius", STREAM_RADIUS))
+        except ValueError:
+            radius = STREAM_RADIUS
+
+        for key in sorted(self.__resident):
+            if max(abs(key[0] - center[0]), abs(key[1] - center[1])) > radius + 1:
+                self.__evict(key)
+
+        columns = -(-self.width // self.chunkwidth)
+        rows = -(-self.height // self.chunkheight)
+        for cy in range(max(center[1] - radius, 0), min(center[1] + radius + 1, rows)):
+            for cx in range(max(center[0] - radius, 0), min(center[0] + radius + 1, columns)):
+                if (cx, cy) not in self.__resident:
+                    self.__load((cx, cy))
+
+    def __chunk_rect(self, key: Tuple[int, int]) -> List[int]:
+        """Return the rectangle [x, y, w, h] of a chunk in tiles.
+        """
+        return [key[0] * self.chunkwidth, key[1] * self.chunkheight, self.chunkwidth, self.chunkheight]
+
+    def __load(self, key: Tuple[int, int]) -> None:
+        """Load a chunk of an infinite map into every layer and spawn its entities.
+        """
+        preload = self.properties.get("preload") in [True, "true"]
+        for l in self.layers:
+            if l._load_chunk(key) and preload:
+                l.preload(self.__chunk_rect(key))
+        self.__resident.add(key)
+        self.area._invalidate_bakes(rect=self.__chunk_rect(key))
+
+        for spawn in self.__spawns.get(key, []):
+            if spawn[1] is None or spawn[1] not in self.driftwood.entity.entities:
+                spawn[1] = self.driftwood.entity.insert(*spawn[0])
+
+        if "on_chunk_load" in self.properties:
+            trigger = self.driftwood.script._trigger(self.properties["on_chunk_load"])
+            if trigger:
+                trigger(self.__chunk_rect(key))
+
+    def __evict(self, key: Tuple[int, int]) -> None:
+        """Evict a chunk of an infinite map from every layer, killing the autospawned entities in it.
+
+        Loading the chunk again spawns those anew. Entities and lights from scripts are left alone, since nothing would
+        bring them back. Scripts can handle them with on_chunk_evict.
+        """
+        if "on_chunk_evict" in self.properties:
+            trigger = self.driftwood.script._trigger(self.properties["on_chunk_evict"])
+            if trigger:
+                trigger(self.__chunk_rect(key))
+
+        entities = self.driftwood.entity
+        spawned = {spawn[1] for spawns in self.__spawns.values() for spawn in spawns if spawn[1] is not None}
+        for eid, ent in list(entities.entities.items()):
+            if eid in spawned and ent is not entities.player and (ent.x // self.tilewidth // self.chunkwidth,
+                                                                  ent.y // self.tileheight // self.chunkheight) == key:
+                entities.kill(eid)
+
+        # Lights that followed the entities just killed go with them.
+        lights = self.driftwood.light
+        for lid, lt in list(lights.lights.items()):
+            if lt.entity is not None and lt.entity not in entities.entities:
+                lights.kill(lid)
+
+        for l in self.layers:
+            l._evict_chunk(key)
+        self.__resident.discard(key)
+        self.area._invalidate_bakes(rect=self.__chunk_rect(key))
+
+    def __measure_chunks(self) -> None:
+        """Find the size of an infinite map's chunks and the rectangle they cover, and count tiles from its top left.
+        """
+        chunks = [chunk for l in self.__tilemap["layers"] for chunk in l.get("chunks", [])]
+        if not chunks:
+            self.chunkwidth, self.chunkheight = 16, 16  # Tiled's default.
+            self.origin = [0, 0]
+            self.width, self.height = 0, 0
+            return
+
+        self.chunkwidth, self.chunkheight = chunks[0]["width"], chunks[0]["height"]
+        left = min(chunk["x"] for chunk in chunks)
+        top = min(chunk["y"] for chunk in chunks)
+        self.origin = [left, top]
+        self.width = max(chunk["x"] + chunk["width"] for chunk in chunks) - left
+        self.height = max(chunk["y"] + chunk["height"] for chunk in chunks) - top
+
     def __expand_properties(self) -> None:
         new_props = {}
         old_props = []
@@ -25,8 +25,11 @@
 # IN THE SOFTWARE.
 # **********
 
+from ctypes import string_at
 import os
-from typing import Optional
+from sdl2 import *
+import sys
+from typing import Optional, Tuple
 
 import tilemap
 
@@ -39,8 +42,8 @@ class Tileset:
 
         filename: Filename of the tileset image.
         name: Name of the tileset, if any.
-        image: The filetype.ImageFile instance for the tileset image.
-        texture: The SDL_Texture for the tileset image.
+        image: The filetype.ImageFile instance for the tileset image, or for the texture atlas it was packed into.
+        texture: The SDL_Texture for the tileset image or its atlas.
         width: Width of the tileset in tiles.
         height: Height of the tileset in tiles.
         imagewidth: Width of the tileset in pixels.
@@ -49,6 +52,10 @@ class Tileset:
         tileheight: Height in pixels of tiles in the tileset.
         size: Number of tiles in the tileset.
         spacing: Spacing in pixels between tiles in the tileset.
+        margin: Margin in pixels around the tiles in the tileset image.
+        srcrects: Tuple of the (x, y, w, h) source rectangle of each tile in the texture, indexed by local GID.
+        rects: Tuple of the same source rectangles as SDL_Rects.
+        opaque: Tuple of whether each tile graphic is fully opaque, indexed by local GID.
         range: A two-member list containing the first and last tile GIDs coverered by this tileset.
         properties: A dictionary containing the tileset properties.
         tileproperties: A dictionary containing mappings of tile GIDs to properties that apply to that GID.
@@ -76,10 +83,58 @@ class Tileset:
         self.tileheight = 0
         self.size = 0
         self.spacing = 0
+        self.margin = 0
+        self.srcrects = ()
+        self.rects = ()
+        self.opaque = ()
         self.range = [0, 0]
         self.properties = {}
         self.tileproperties = {}
 
+        self.__tiletypes = {}  # {local GID: _TileType}
+
+    def _tiletype(self, localgid: int) -> '_TileType':
+        """Return what every tile with the given graphic has in common, reading it from the tile properties once.
+
+        Args:
+            localgid: Graphic-ID of the tile in relation to this tileset.
+
+        Returns:
+            _TileType instance.
+        """
+        if localgid in self.__tiletypes:
+            return self.__tiletypes[localgid]
+
+        properties = self.tileproperties.get(localgid, {})
+        members = (localgid,)
+        afps = 0.0
+
+        if "members" in properties:
+            # Make things prettier for the end user by lining up member IDs with GIDs.
+            members = self._check_members(tuple(int(m) - 1 for m in properties["members"].split(',')))
+        if "afps" in properties:
+            afps = float(properties["afps"])
+
+        self.__tiletypes[localgid] = _TileType(members, afps, properties)
+        return self.__tiletypes[localgid]
+
+    def _check_members(self, members: Tuple[int, ...]) -> Tuple[int, ...]:
+        """Replace the animation members past the end of the tileset with -1, so they show nothing.
+
+        Args:
+            members: Sequence positions of the member graphics in the tileset.
+
+        Returns:
+            The members, with those not in the tileset replaced.
+        """
+        checked = []
+        for member in members:
+            if not -1 <= member < self.size:
+                self.driftwood.log.msg("ERROR", "Tileset", self.name, "members", "no such member", member + 1)
+                member = -1
+            checked.append(member)
+        return tuple(checked)
+
     def load(self, tilemap_filename: str, tileset_json: dict) -> Optional[bool]:
         """Populate a Tileset with data from a Tiled map's tileset object.
 
@@ -121,10 +176,12 @@ class Tileset:
         self.imageheight = tileset_json["imageheight"]
         self.tilewidth = tileset_json["tilewidth"]
         self.tileheight = tileset_json["tileheight"]
-        self.width = self.imagewidth // self.tilewidth
-        self.height = self.imageheight // self.tileheight
-        self.size = int(self.width * self.height)
         self.spacing = tileset_json["spacing"]
+        if "margin" in tileset_json:
+            self.margin = tileset_json["margin"]
+        self.width = (self.imagewidth - 2 * self.margin + self.spacing) // (self.tilewidth + self.spacing)
+        self.height = (self.imageheight - 2 * self.margin + self.spacing) // (self.tileheight + self.spacing)
+        self.size = int(self.width * self.height)
         self.range = [firstgid, firstgid - 1 + self.size]
         if "properties" in tileset_json:
             self.properties = tileset_json["properties"]
@@ -136,14 +193,82 @@ class Tileset:
         # tileset.
         image_filename = self.__resolve_path(image_base_path, tileset_json["image"])
 
-        self.image = self.driftwood.resource.request_image(image_filename)  # Ouch
+        # The image may have been packed into a texture atlas, in which case its tiles are drawn from there.
+        region = self.driftwood.resource.request_atlas_region(image_filename)
+        if region:
+            self.image, x, y = region[:3]
+            self.__calc_rects(x, y)
+        else:
+            self.image = self.driftwood.resource.request_image(image_filename)  # Ouch
+            self.__calc_rects(0, 0)
 
         if self.image:
             self.texture = self.image.texture
+            self.__calc_opacity(image_filename)
             return True
         else:
             return False
 
+    def __calc_rects(self, x: int, y: int) -> None:
+        """Work out the source rectangle of every tile once, so drawing only has to look them up.
+
+        Args:
+            x: x position of the tileset image in the texture.
+            y: y position of the tileset image in the texture.
+        """
+        srcrects = []
+        for localgid in range(self.size):
+            srcrects.append((x + self.margin + localgid % self.width * (self.tilewidth + self.spacing),
+                             y + self.margin + localgid // self.width * (self.tileheight + self.spacing),
+                             self.tilewidth, self.tileheight))
+        self.srcrects = tuple(srcrects)
+        self.rects = tuple(SDL_Rect(*srcrect) for srcrect in srcrects)
+
+    def __calc_opacity(self, image_filename: str) -> None:
+        """Find out which tile graphics are fully opaque by scanning the alpha of the image.
+
+        The result goes into CacheManager, which only keeps it in memory until its TTL runs out. Until then, other
+        tilesets cut the same way from the same image reuse it instead of scanning again. Nothing is kept on disk.
+        """
+        cache_key = "{0}#opacity:{1}x{2}+{3}+{4}".format(image_filename, self.tilewidth, self.tileheight,
+                                                          self.spacing, self.margin)
+        cached = self.driftwood.cache.download(cache_key)
+        if cached is not None:
+            self.opaque = cached
+            return
+
+        self.opaque = (False,) * self.size
+
+        # Read the pixels in a known format.
+        surface = SDL_ConvertSurfaceFormat(self.image.surface, SDL_PIXELFORMAT_ARGB8888, 0)
+        if not surface:
+            self.driftwood.log.msg("ERROR", "Tileset", "__calc_opacity", "SDL", SDL_GetError())
+            return
+        SDL_LockSurface(surface)
+        pitch, height = surface.contents.pitch, surface.contents.h
+        pixels = string_at(surface.contents.pixels, pitch * height)
+        SDL_UnlockSurface(surface)
+        SDL_FreeSurface(surface)
+
+        # Where the alpha byte sits in each pixel.
+        alpha = 3 if sys.byteorder == "little" else 0
+
+        opaque = []
+        for x, y, w, h in self.srcrects:
+            if y + h > height:
+                opaque.append(False)
+                continue
+            for row in range(y, y + h):
+                start = row * pitch + x * 4 + alpha
+                if pixels[start:start + w * 4:4].count(255) != w:
+                    opaque.append(False)
+                    break
+            else:
+                opaque.append(True)
+
+        self.opaque = tuple(opaque)
+        self.driftwood.cache.upload(cache_key, self.opaque)
+
     @staticmethod
     def __resolve_path(base_filename: str, filename: str) -> str:
         """Determine the location of a file that was defined relative to another"""
@@ -151,3 +276,22 @@ class Tileset:
             return os.path.normpath(os.path.dirname(base_filename) + os.path.sep + filename)
         else:
             return filename
+
+
+class _TileType:
+    """Tile Type
+
+    The parts of a tile shared by every tile with the same graphic, kept once per tileset instead of once per tile.
+
+    Attributes:
+        members: A tuple of sequence positions of member graphics in the tileset.
+        afps: Animation frames-per-second.
+        properties: A dictionary containing the tile properties from the tileset.
+    """
+
+    __slots__ = ["members", "afps", "properties"]
+
+    def __init__(self, members: Tuple[int, ...], afps: float, properties: dict):
+        self.members = members
+        self.afps = afps
+        self.properties = properties
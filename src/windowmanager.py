@@ -25,8 +25,10 @@
 # IN THE SOFTWARE.
 # **********
 
-from ctypes import byref
+from ctypes import byref, c_int, c_ubyte
+import os
 from typing import List, Optional
+import zlib
 
 from sdl2 import *
 from sdl2.sdlimage import *
@@ -40,7 +42,9 @@ class WindowManager:
     Attributes:
         driftwood: Base class instance.
         window: The SDL Window.
-        renderer: The SDL Renderer attached to the window.
+        renderer: The SDL Renderer attached to the window, or to an offscreen surface when headless.
+        headless: Whether we are rendering offscreen without a display.
+        checksum: CRC-32 of the pixels of the last frame presented, if checksums are enabled. Otherwise None.
     """
 
     def __init__(self, driftwood):
@@ -62,6 +66,11 @@ class WindowManager:
         self.window = None
         self.renderer = None
 
+        self.headless = self.driftwood.config["window"]["headless"]
+        self.checksum = None
+        self.__surface = None  # The offscreen surface we render to when headless.
+        self.__readback = None  # Buffer reused for reading back the pixels of each frame.
+
         self.__prepare()
 
         self.driftwood.tick.register(self._tick, delay=1.0 / self.driftwood.config["window"]["maxfps"],
@@ -168,27 +177,61 @@ class WindowManager:
             SDL_RenderClear(self.renderer)
 
             if self.driftwood.frame._frame:  # This might not exist if we didn't find init.py.
-                r = SDL_RenderCopy(self.renderer, *self.driftwood.frame._frame)
+                # The frame may wrap around the back buffer, so it comes in pieces.
+                for piece in self.driftwood.frame._frame:
+                    r = SDL_RenderCopy(self.renderer, *piece)
+                    if type(r) is int and r < 0:
+                        self.driftwood.log.msg("ERROR", "Window", "_tick", "SDL", SDL_GetError())
+
+            # Copy the overlays over the frame.
+            for overlay in self.driftwood.frame._overlays:
+                r = SDL_RenderCopy(self.renderer, *overlay)
                 if type(r) is int and r < 0:
                     self.driftwood.log.msg("ERROR", "Window", "_tick", "SDL", SDL_GetError())
 
             SDL_RenderSetLogicalSize(self.renderer, 0, 0)  # reset
             self.driftwood.frame.changed -= 1
 
+            if self.driftwood.config["window"]["checksum"]:
+                self.__read_back()
+
             SDL_RenderPresent(self.renderer)
 
+    def __read_back(self) -> None:
+        """Read back the pixels of the frame being presented and checksum them.
+        """
+        w, h = c_int(), c_int()
+        SDL_GetRendererOutputSize(self.renderer, byref(w), byref(h))
+        size = w.value * h.value * 4
+        if not self.__readback or len(self.__readback) != size:
+            self.__readback = (c_ubyte * size)()
+
+        if SDL_RenderReadPixels(self.renderer, None, SDL_PIXELFORMAT_ARGB8888, self.__readback, w.value * 4) < 0:
+            self.driftwood.log.msg("ERROR", "Window", "__read_back", "SDL", SDL_GetError())
+            self.checksum = None
+            return
+
+        self.checksum = zlib.crc32(self.__readback)
+        self.driftwood.log.info("Window", "checksum", "{0:08x}".format(self.checksum))
+
     def __prepare(self) -> None:
         """Prepare the window for use.
 
-        Create a new window and renderer with the configured settings.
+        Create a new window and renderer with the configured settings. When headless, the window is never shown and
+        rendering goes to an offscreen surface through the software renderer.
         """
+        if self.headless:
+            # Don't look for a display or a sound card.
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+
         if SDL_Init(SDL_INIT_EVERYTHING) < 0:  # Couldn't init SDL.
             self.driftwood.log.msg("ERROR", "Window", "__prepare", "SDL", SDL_GetError())
         init_flags = IMG_INIT_JPG | IMG_INIT_PNG
         if IMG_Init(init_flags) & init_flags != init_flags:  # Couldn't init SDL_Image.
             self.driftwood.log.msg("ERROR", "Window", "__prepare", "SDL", SDL_GetError())
 
-        if self.driftwood.config["window"]["fullscreen"]:
+        if self.driftwood.config["window"]["fullscreen"] and not self.headless:
             # Desktop's current width and height
             physical_width = 0
             physical_height = 0
@@ -202,15 +245,29 @@ class WindowManager:
             flags = 0
 
         flags |= SDL_WINDOW_ALLOW_HIGHDPI
+        if self.headless:
+            flags |= SDL_WINDOW_HIDDEN
         self.window = SDL_CreateWindow(self.driftwood.config["window"]["title"].encode(), SDL_WINDOWPOS_CENTERED,
                                        SDL_WINDOWPOS_CENTERED, physical_width, physical_height, flags)
 
-        self.renderer = SDL_CreateRenderer(self.window, -1, SDL_RENDERER_ACCELERATED | SDL_RENDERER_PRESENTVSYNC)
-        if not self.renderer:  # We don't have hardware rendering on this machine.
-            self.driftwood.log.info("Window", "SDL", "falling back to software renderer")
-            self.renderer = SDL_CreateRenderer(self.window, -1, SDL_RENDERER_SOFTWARE)
-            if not self.renderer:  # Still no.
+        if self.headless:
+            # Render to a surface in memory, with nothing to wait on between frames.
+            self.__surface = SDL_CreateRGBSurfaceWithFormat(0, physical_width, physical_height, 32,
+                                                            SDL_PIXELFORMAT_ARGB8888)
+            if not self.__surface:
                 self.driftwood.log.msg("ERROR", "Window", "__prepare", "SDL", SDL_GetError())
+            else:
+                self.renderer = SDL_CreateSoftwareRenderer(self.__surface)
+                if not self.renderer:
+                    self.driftwood.log.msg("ERROR", "Window", "__prepare", "SDL", SDL_GetError())
+
+        else:
+            self.renderer = SDL_CreateRenderer(self.window, -1, SDL_RENDERER_ACCELERATED | SDL_RENDERER_PRESENTVSYNC)
+            if not self.renderer:  # We don't have hardware rendering on this machine.
+                self.driftwood.log.info("Window", "SDL", "falling back to software renderer")
+                self.renderer = SDL_CreateRenderer(self.window, -1, SDL_RENDERER_SOFTWARE)
+                if not self.renderer:  # Still no.
+                    self.driftwood.log.msg("ERROR", "Window", "__prepare", "SDL", SDL_GetError())
 
         # Pixelated goodness, like a rebel.
         SDL_SetHint(SDL_HINT_RENDER_SCALE_QUALITY, b"nearest")
@@ -239,6 +296,9 @@ class WindowManager:
         """
         SDL_DestroyRenderer(self.renderer)
         self.renderer = None
+        if self.__surface:
+            SDL_FreeSurface(self.__surface)
+            self.__surface = None
         SDL_DestroyWindow(self.window)
         self.window = None
 
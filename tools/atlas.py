@@ -0,0 +1,286 @@
+#!/bin/env python3
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# atlas.py                         #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+import argparse
+import json
+import os
+import sys
+
+from sdl2 import *
+from sdl2.sdlimage import *
+
+
+VERSION = "Texture Atlas Builder for Driftwood v0.1.0"
+COPYRIGHT = "Copyright 2017 Michael D. Reiley & Paul Merrill"
+
+# The table of atlas regions is always written under this name, which is where the engine looks for it.
+TABLE_FILENAME = "atlas.json"
+
+
+class AtlasBuilder:
+    """Texture Atlas Builder
+
+    Packs the tileset and sprite sheet images used by maps and entities into a few large atlas images, so the engine
+    can draw a scene from fewer textures. Images are packed whole, so the members of a tileset or sprite sheet keep
+    their layout and the engine finds each member at its usual place offset by the image's position in the atlas.
+
+    The table written next to the atlases looks like this:
+        {"atlases": ["atlas0.png", ...], "images": {"image filename": [atlas number, x, y, width, height], ...}}
+
+    Attributes:
+        root: The data directory the filenames are relative to.
+        size: The width and height limit of each atlas in pixels.
+        padding: Empty pixels left around each image.
+        images: The set of image filenames to pack.
+        failed: The list of image filenames that could not be packed.
+    """
+    def __init__(self, root, size=2048, padding=1):
+        """AtlasBuilder class constructor.
+
+        Args:
+            root: The data directory to read from.
+            size: The width and height limit of each atlas in pixels.
+            padding: Empty pixels left around each image.
+        """
+        self.root = root
+        self.size = size
+        self.padding = padding
+        self.images = set()
+        self.failed = []
+
+        self.__surfaces = {}  # {image filename: SDL_Surface}
+
+    def scan(self, filename):
+        """Collect the images used by a map or entity file.
+
+        Args:
+            filename: The filename of the map or entity JSON, relative to the root.
+
+        Returns: True if any images were found, False otherwise.
+        """
+        data = self.__read_json(filename)
+        if not isinstance(data, dict):
+            return False
+
+        found = False
+
+        if "tilesets" in data and "layers" in data:  # This is a map.
+            for tileset_json in data["tilesets"]:
+                tileset_filename = filename
+                if "image" not in tileset_json:  # External tileset.
+                    tileset_filename = self.__resolve_path(filename, tileset_json["source"])
+                    tileset_json = self.__read_json(tileset_filename)
+                    if not isinstance(tileset_json, dict) or "image" not in tileset_json:
+                        continue
+                self.images.add(self.__resolve_path(tileset_filename, tileset_json["image"]))
+                found = True
+
+        elif "init" in data and isinstance(data["init"], dict) and "image" in data["init"]:  # This is an entity.
+            self.images.add(data["init"]["image"])
+            found = True
+
+        return found
+
+    def scan_all(self):
+        """Collect the images used by every map and entity file under the root.
+        """
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in sorted(filenames):
+                if name.endswith(".json") and name != TABLE_FILENAME:
+                    self.scan(os.path.relpath(os.path.join(dirpath, name), self.root))
+
+    def build(self, output):
+        """Pack the collected images into atlases and write them and their table into the output directory.
+
+        Args:
+            output: Directory to write the atlases and the table into.
+
+        Returns: Number of atlases written, or None if failed.
+        """
+        # Load the images, tallest first for tighter shelves.
+        for filename in sorted(self.images):
+            surface = IMG_Load(os.path.join(self.root, filename).encode())
+            if not surface:
+                self.failed.append(filename)
+                continue
+            if surface.contents.w + 2 * self.padding > self.size or surface.contents.h + 2 * self.padding > self.size:
+                SDL_FreeSurface(surface)
+                self.failed.append(filename)
+                continue
+            self.__surfaces[filename] = surface
+        order = sorted(self.__surfaces, key=lambda f: (-self.__surfaces[f].contents.h, f))
+
+        # Place each image on the current shelf of the current atlas, starting a new shelf or atlas when it is full.
+        placements = {}  # {image filename: [atlas number, x, y, width, height]}
+        heights = []  # Height used in each atlas.
+        x, y, shelf = 0, 0, 0
+        for filename in order:
+            w = self.__surfaces[filename].contents.w + 2 * self.padding
+            h = self.__surfaces[filename].contents.h + 2 * self.padding
+            if not heights or x + w > self.size:
+                if heights:
+                    x, y = 0, y + shelf
+                if not heights or y + h > self.size:
+                    heights.append(0)
+                    x, y = 0, 0
+                shelf = h
+            placements[filename] = [len(heights) - 1, x + self.padding, y + self.padding, w - 2 * self.padding,
+                                    h - 2 * self.padding]
+            heights[-1] = max(heights[-1], y + h)
+            x += w
+
+        # Draw the atlases.
+        atlases = []
+        for n, height in enumerate(heights):
+            atlas = SDL_CreateRGBSurfaceWithFormat(0, self.size, height, 32, SDL_PIXELFORMAT_ARGB8888)
+            if not atlas:
+                self.__free()
+                return None
+            SDL_FillRect(atlas, None, 0)
+            for filename, (number, px, py, pw, ph) in placements.items():
+                if number == n:
+                    surface = self.__surfaces[filename]
+                    SDL_SetSurfaceBlendMode(surface, SDL_BLENDMODE_NONE)  # Copy the alpha as it is.
+                    SDL_BlitSurface(surface, None, atlas, SDL_Rect(px, py, pw, ph))
+
+            atlas_filename = "atlas{0}.png".format(n)
+            ok = IMG_SavePNG(atlas, os.path.join(output, atlas_filename).encode()) == 0
+            SDL_FreeSurface(atlas)
+            if not ok:
+                self.__free()
+                return None
+            atlases.append(atlas_filename)
+
+        self.__free()
+
+        try:
+            with open(os.path.join(output, TABLE_FILENAME), 'w') as table:
+                json.dump({"atlases": atlases, "images": placements}, table, sort_keys=True)
+        except:
+            return None
+
+        return len(atlases)
+
+    def __free(self):
+        """Free the loaded images.
+        """
+        for surface in self.__surfaces.values():
+            SDL_FreeSurface(surface)
+        self.__surfaces = {}
+
+    def __read_json(self, filename):
+        """Read a JSON file under the root, or return None.
+        """
+        try:
+            with open(os.path.join(self.root, filename)) as f:
+                return json.load(f)
+        except:
+            return None
+
+    @staticmethod
+    def __resolve_path(base_filename, filename):
+        """Determine the location of a file that was defined relative to another, the same way the engine does.
+        """
+        if os.path.dirname(base_filename):
+            return os.path.normpath(os.path.dirname(base_filename) + os.path.sep + filename)
+        else:
+            return filename
+
+
+# Running as a standalone program.
+if __name__ == "__main__":
+    # Initialize the command line parser.
+    parser = argparse.ArgumentParser(description=VERSION,
+                                     formatter_class=lambda prog: argparse.HelpFormatter(prog,
+                                                                                         max_help_position=40))
+
+    # Setup command line options.
+    parser.add_argument("root", nargs='?', type=str, help="data directory to read from")
+    parser.add_argument("files", nargs='*', type=str,
+                        help="map and entity files to take images from, relative to the root (default: all)")
+
+    parser.add_argument("--output", nargs=1, dest="output", type=str, metavar="<dir>",
+                        help="directory to write the atlases into (default: the root)")
+    parser.add_argument("--size", nargs=1, dest="size", type=int, metavar="<pixels>",
+                        help="width and height limit of each atlas (default: 2048)")
+    parser.add_argument("--padding", nargs=1, dest="padding", type=int, metavar="<pixels>",
+                        help="empty pixels around each image (default: 1)")
+    parser.add_argument("--quiet", action="store_true", dest="quiet", help="do not print messages")
+    parser.add_argument("--version", action="store_true", dest="version", help="print the version string")
+
+    # Retrieve arguments.
+    args = parser.parse_args()
+
+    # --version
+    if args.version:
+        print(VERSION)
+        print(COPYRIGHT)
+        sys.exit(0)  # Exit here, this is all we're doing today.
+
+    # Nothing was passed.
+    if not args.root:
+        parser.print_usage()
+        print("{0}: error: root required".format(os.path.basename(__file__)))
+        sys.exit(0)
+
+    builder = AtlasBuilder(args.root, args.size[0] if args.size else 2048, args.padding[0] if args.padding else 1)
+
+    # Collect the images.
+    if args.files:
+        for filename in args.files:
+            if not builder.scan(filename) and not args.quiet:
+                print("FAILURE :: SCAN :: {0}".format(filename))
+    else:
+        builder.scan_all()
+
+    if not builder.images:
+        if not args.quiet:
+            print("FAILURE :: SCAN :: no images found")
+        sys.exit(1)
+
+    # Build the atlases.
+    if IMG_Init(IMG_INIT_PNG) & IMG_INIT_PNG != IMG_INIT_PNG:
+        if not args.quiet:
+            print("FAILURE :: INIT :: {0}".format(IMG_GetError()))
+        sys.exit(2)
+
+    count = builder.build(args.output[0] if args.output else args.root)
+    IMG_Quit()
+
+    if count is None:
+        if not args.quiet:
+            print("FAILURE :: BUILD :: {0}".format(SDL_GetError()))
+        sys.exit(3)
+
+    if not args.quiet:
+        for filename in builder.failed:
+            print("FAILURE :: PACK :: {0}".format(filename))
+        print("{0} images packed into {1} atlases".format(len(builder.images) - len(builder.failed), count))
+
+    # Finished successfully.
+    sys.exit(0)
@@ -0,0 +1,207 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# __main__.py                      #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import compare
+import loadpath
+import runner
+import worldgen
+
+VERSION = "Benchmarks for Driftwood v0.2.0"
+COPYRIGHT = "Copyright 2014-2017 Michael D. Reiley & Paul Merrill"
+
+# Map sizes of the standard suite, in tiles.
+SUITE_SIZES = [32, 64, 128, 256, 512, 1024]
+
+
+def world_name(params: dict) -> str:
+    """Name a world after its parameters, so results from different runs line up.
+    """
+    return "{size}x{size}-l{layers}-a{animated}-e{tile_entities}+{pixel_entities}-li{lights}-w{widgets}".format(
+        **params)
+
+
+def merge_results(filename: str, name: str, result: dict) -> None:
+    """Add the result of one world to a results file, replacing an earlier result for the same world.
+    """
+    results = {"version": 1, "runs": {}}
+    if os.path.exists(filename):
+        with open(filename) as f:
+            results = json.load(f)
+    results["runs"][name] = result
+    with open(filename, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def add_world_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--layers", type=int, default=3, metavar="<n>", help="tile layers (default: 3)")
+    parser.add_argument("--animated", type=int, default=10, metavar="<percent>",
+                        help="percentage of upper layer tiles that animate (default: 10)")
+    parser.add_argument("--tile-entities", type=int, default=8, metavar="<n>", help="tile mode entities (default: 8)")
+    parser.add_argument("--pixel-entities", type=int, default=8, metavar="<n>",
+                        help="pixel mode entities (default: 8)")
+    parser.add_argument("--lights", type=int, default=8, metavar="<n>", help="lights (default: 8)")
+    parser.add_argument("--widgets", type=int, default=8, metavar="<n>", help="container widgets (default: 8)")
+    parser.add_argument("--view", type=int, default=240, metavar="<pixels>",
+                        help="logical window width and height (default: 240)")
+    parser.add_argument("--seed", type=int, default=0, metavar="<n>", help="random seed (default: 0)")
+
+
+def add_run_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--frames", type=int, default=300, metavar="<n>", help="frames to measure (default: 300)")
+    parser.add_argument("--warmup", type=int, default=30, metavar="<n>",
+                        help="frames to run before measuring (default: 30)")
+    parser.add_argument("--output", type=str, default="results.json", metavar="<file>",
+                        help="results file to add to (default: results.json)")
+
+
+def world_kwargs(args: argparse.Namespace) -> dict:
+    return {"layers": args.layers, "animated": args.animated, "tile_entities": args.tile_entities,
+            "pixel_entities": args.pixel_entities, "lights": args.lights, "widgets": args.widgets,
+            "view": args.view, "seed": args.seed}
+
+
+# Running as a standalone program.
+if __name__ == "__main__":
+    # Initialize the command line parser.
+    parser = argparse.ArgumentParser(description=VERSION,
+                                     formatter_class=lambda prog: argparse.HelpFormatter(prog,
+                                                                                         max_help_position=40))
+    parser.add_argument("--version", action="store_true", dest="version", help="print the version string")
+    commands = parser.add_subparsers(dest="command", metavar="<command>")
+
+    # Setup command line options.
+    generate_parser = commands.add_parser("generate", help="generate a synthetic world")
+    generate_parser.add_argument("directory", type=str, help="directory to write the world into")
+    generate_parser.add_argument("--size", type=int, default=64, metavar="<tiles>",
+                                 help="map width and height (default: 64)")
+    add_world_options(generate_parser)
+
+    run_parser = commands.add_parser("run", help="run a world headless and record its frame timings")
+    run_parser.add_argument("directory", type=str, help="directory of the world to run")
+    add_run_options(run_parser)
+
+    suite_parser = commands.add_parser("suite", help="generate and run worlds of every size from {0} to {1}".format(
+        SUITE_SIZES[0], SUITE_SIZES[-1]))
+    suite_parser.add_argument("directory", type=str, help="directory to write the worlds into")
+    add_world_options(suite_parser)
+    add_run_options(suite_parser)
+
+    load_parser = commands.add_parser("load", help="run a world headless and record its load path timings")
+    load_parser.add_argument("directory", type=str, help="directory of the world to load from")
+    load_parser.add_argument("--files", type=int, default=5000, metavar="<n>",
+                             help="files in the scanned tree and archive (default: 5000)")
+    load_parser.add_argument("--sizes", type=str, default="32,128,512", metavar="<tiles,...>",
+                             help="sizes of the maps to focus (default: 32,128,512)")
+    load_parser.add_argument("--entities", type=int, default=500, metavar="<n>",
+                             help="entities to insert (default: 500)")
+    load_parser.add_argument("--saves", type=str, default="10,100,1000,10000", metavar="<keys,...>",
+                             help="keys in each database save to flush (default: 10,100,1000,10000)")
+    load_parser.add_argument("--repeat", type=int, default=5, metavar="<n>", help="timed calls per phase (default: 5)")
+    load_parser.add_argument("--compression", type=str, choices=["base64", "zlib", "gzip", "zstd"],
+                             metavar="<encoding>",
+                             help="also focus each map with its tiles in base64, or compressed with zlib, gzip or zstd")
+    load_parser.add_argument("--output", type=str, default="results.json", metavar="<file>",
+                             help="results file to add to (default: results.json)")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files and flag regressions")
+    compare_parser.add_argument("baseline", type=str, help="results file to compare against")
+    compare_parser.add_argument("current", type=str, help="new results file")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, metavar="<percent>",
+                                help="growth allowed before flagging a regression (default: 10)")
+
+    # Retrieve arguments.
+    args = parser.parse_args()
+
+    # --version
+    if args.version:
+        print(VERSION)
+        print(COPYRIGHT)
+        sys.exit(0)  # Exit here, this is all we're doing today.
+
+    # Nothing was passed.
+    if not args.command:
+        parser.print_usage()
+        print("{0}: error: command required".format(os.path.basename(os.path.dirname(__file__))))
+        sys.exit(0)
+
+    if args.command == "generate":
+        params = worldgen.generate(args.directory, size=args.size, **world_kwargs(args))
+        print("generated {0} in {1}".format(world_name(params), args.directory))
+
+    elif args.command == "run":
+        output = os.path.abspath(args.output)  # The engine changes the working directory.
+        result = runner.run(args.directory, frames=args.frames, warmup=args.warmup)
+        merge_results(output, world_name(result["world"]), result)
+        print("{0}: {1:.3f} ms per frame".format(world_name(result["world"]),
+                                                 result["phases"]["tick"]["per_frame"]))
+
+    elif args.command == "load":
+        output = os.path.abspath(args.output)  # The engine changes the working directory.
+        result = loadpath.run_load(args.directory, files=args.files, sizes=list(map(int, args.sizes.split(','))),
+                                   entities=args.entities, saves=list(map(int, args.saves.split(','))),
+                                   repeat=args.repeat,
+                                   compression=None if args.compression is None else
+                                   args.compression.replace("base64", ""))
+        merge_results(output, "load-" + world_name(result["world"]), result)
+        for name, phase in sorted(result["phases"].items()):
+            print("{0}: {1:.3f} ms".format(name, phase["mean"]))
+
+    elif args.command == "suite":
+        # The engine can only start once per process, so each world runs in its own.
+        failed = False
+        for size in SUITE_SIZES:
+            directory = os.path.join(args.directory, str(size))
+            worldgen.generate(directory, size=size, **world_kwargs(args))
+            r = subprocess.call([sys.executable, os.path.dirname(os.path.abspath(__file__)), "run", directory,
+                                 "--frames", str(args.frames), "--warmup", str(args.warmup),
+                                 "--output", os.path.abspath(args.output)])
+            if r:
+                print("FAILURE :: RUN :: {0}".format(directory))
+                failed = True
+        if failed:
+            sys.exit(1)
+
+    elif args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows, regressions = compare.compare(baseline, current, args.threshold)
+        print(compare.format_rows(rows, regressions))
+        if regressions:
+            print("{0} regressions over {1}%".format(len(regressions), args.threshold))
+            sys.exit(1)
+
+    # Finished successfully.
+    sys.exit(0)
@@ -0,0 +1,82 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# compare.py                       #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+
+from typing import List, Tuple
+
+# Phases faster than this many milliseconds per frame are too small to judge, whatever their change.
+NOISE_FLOOR = 0.05
+
+
+def compare(baseline: dict, current: dict, threshold: float = 10.0) -> Tuple[List[list], List[list]]:
+    """Compare two sets of benchmark results.
+
+    For each world found in both sets, every phase and every counter is compared. Frame phases are compared by time
+    per frame, load phases by mean time per call.
+
+    Args:
+        baseline: Results to compare against.
+        current: New results.
+        threshold: Percentage a measurement may grow by before it counts as a regression.
+
+    Returns:
+        Tuple of all the comparisons and the regressions among them, each as a list of
+        [world, measurement, baseline value, current value, percentage change].
+    """
+    rows = []
+    regressions = []
+
+    for world in sorted(set(baseline["runs"]) & set(current["runs"])):
+        old = baseline["runs"][world]
+        new = current["runs"][world]
+
+        measurements = []
+        for phase in sorted(set(old["phases"]) & set(new["phases"])):
+            key = "per_frame" if "per_frame" in old["phases"][phase] else "mean"
+            measurements.append([phase, old["phases"][phase][key], new["phases"][phase][key], True])
+        for counter in sorted(set(old["counters"]) & set(new["counters"])):
+            measurements.append([counter, old["counters"][counter], new["counters"][counter], False])
+
+        for name, before, after, timed in measurements:
+            change = (after - before) * 100.0 / before if before else 0.0
+            row = [world, name, before, after, change]
+            rows.append(row)
+            if change > threshold and (not timed or after - before > NOISE_FLOOR):
+                regressions.append(row)
+
+    return rows, regressions
+
+
+def format_rows(rows: List[list], regressions: List[list]) -> str:
+    """Lay out comparisons as a table, marking the regressions.
+    """
+    lines = ["{0:<28} {1:<40} {2:>12} {3:>12} {4:>9}".format("world", "measurement", "baseline", "current",
+                                                            "change")]
+    for row in rows:
+        mark = "  REGRESSION" if row in regressions else ""
+        lines.append("{0:<28} {1:<40} {2:>12.3f} {3:>12.3f} {4:>+8.1f}%{5}".format(*row, mark))
+    return "\n".join(lines)
@@ -0,0 +1,215 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# loadpath.py                      #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+import zipfile
+from typing import Callable, List
+
+import runner
+import worldgen
+
+
+class LoadBench:
+    """Timings and memory high-water marks of load path operations.
+
+    Each phase is timed over several repeats without tracing. It then runs once more under tracemalloc for its memory
+    high-water mark, so the tracing does not skew the timings.
+
+    Attributes:
+        phases: Dictionary of phase names to their timings in milliseconds.
+        counters: Dictionary of "<phase>:peak_kib" to the memory high-water mark of the phase in KiB.
+    """
+
+    def __init__(self):
+        """LoadBench class initializer.
+        """
+        self.phases = {}
+        self.counters = {}
+
+    def measure(self, name: str, func: Callable, repeat: int = 5, setup: Callable = None, items: int = 1) -> None:
+        """Time a phase and find its memory high-water mark.
+
+        Args:
+            name: Name of the phase.
+            func: Function doing the work of the phase.
+            repeat: Number of timed calls.
+            setup: If set, function called before each call, outside the timing. Used to empty caches.
+            items: Number of items func works through, to report the time per item.
+        """
+        samples = []
+        for n in range(repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) / items)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        samples.sort()
+        self.phases[name] = {
+            "calls": repeat,
+            "items": items,
+            "mean": sum(samples) * 1000.0 / repeat,
+            "p95": samples[min(int(repeat * 0.95), repeat - 1)] * 1000.0
+        }
+        self.counters[name + ":peak_kib"] = peak / 1024.0
+
+
+def write_vfs(data: str, files: int) -> List[str]:
+    """Write a directory tree and a zip archive holding the same small JSON files, for the path to scan.
+
+    Args:
+        data: The world's data/ directory.
+        files: Number of files.
+
+    Returns: The filenames inside the tree and the archive.
+    """
+    names = ["dir{0:03d}/file{1:05d}.json".format(n % 100, n) for n in range(files)]
+    with zipfile.ZipFile(os.path.join(data, "vfs.zip"), "w") as zf:
+        for n, name in enumerate(names):
+            os.makedirs(os.path.join(data, "vfs", os.path.dirname(name)), exist_ok=True)
+            contents = json.dumps({"n": n, "name": name, "values": list(range(16))})
+            with open(os.path.join(data, "vfs", name), "w") as f:
+                f.write(contents)
+            zf.writestr(name, contents)
+    return names
+
+
+def run_load(world: str, files: int = 5000, sizes: List[int] = (32, 128, 512), entities: int = 500,
+             saves: List[int] = (10, 100, 1000, 10000), repeat: int = 5, compression: str = None) -> dict:
+    """Benchmark startup and area transition work on a synthetic world, headless.
+
+    Covers PathManager.rebuild over a directory tree and a zip archive, ResourceManager requests with cold and warm
+    caches, AreaManager.focus with autospawns for maps of increasing size, EntityManager.insert, and DatabaseManager
+    flushes of growing saves. The engine can only be started once per process.
+
+    Args:
+        world: Directory of a world made by worldgen.generate().
+        files: Number of files in the scanned tree and archive.
+        sizes: Width and height in tiles of each map to focus.
+        entities: Number of entities to insert.
+        saves: Number of keys in each database save to flush.
+        repeat: Number of timed calls of each phase.
+        compression: If set, also focus each map with its tiles in base64 compressed this way ("" for none).
+
+    Returns: Dictionary of the world's parameters, the environment and the measurements.
+    """
+    world = os.path.abspath(world)
+    data = os.path.join(world, "data")
+    bench_data = os.path.join(data, "bench")
+    with open(os.path.join(bench_data, "bench.json")) as f:
+        params = json.load(f)
+
+    # Write everything to load before the engine starts.
+    names = write_vfs(data, files)
+    for size in sizes:
+        worldgen.write_area(bench_data, "load{0}.json".format(size), size, params["layers"], params["animated"],
+                            spawns=size // 4, seed=params["seed"])
+        if compression is not None:
+            worldgen.write_area(bench_data, "load{0}-{1}.json".format(size, compression or "base64"), size,
+                                params["layers"], params["animated"], spawns=size // 4, seed=params["seed"],
+                                compression=compression)
+
+    entry = runner.start_engine(world)
+    bench = LoadBench()
+    rand = random.Random(params["seed"])
+    sample = rand.sample(names, min(len(names), 200))
+
+    def purge(filenames):
+        for filename in filenames:
+            entry.cache.purge(filename)
+
+    # The virtual filesystem.
+    entry.path.append(["vfs/"])
+    bench.measure("path.rebuild:dir", entry.path.rebuild, repeat)
+    entry.path.remove(["vfs/"])
+    entry.path.append(["vfs.zip"])
+    bench.measure("path.rebuild:zip", entry.path.rebuild, repeat)
+
+    # Resources, read from the archive.
+    request_sample = lambda: [entry.resource.request_json(name) for name in sample]
+    bench.measure("request_json:cold", request_sample, repeat, lambda: purge(sample), len(sample))
+    bench.measure("request_json:warm", request_sample, repeat, None, len(sample))
+    request_image = lambda: entry.resource.request_image("tiles.png")
+    bench.measure("request_image:cold", request_image, repeat, lambda: purge(["tiles.png"]))
+    bench.measure("request_image:warm", request_image, repeat)
+    request_template = lambda: entry.resource.request_template("tile.json")
+    bench.measure("request_template:cold", request_template, repeat, lambda: purge(["tile.json"]))
+    bench.measure("request_template:warm", request_template, repeat)
+
+    # Area transitions, reading each map fresh. Entities spawned by the last focus are killed first.
+    variants = [("load{0}.json", "area.focus:{0}x{0}")]
+    if compression is not None:
+        encoded = compression or "base64"
+        variants.append(("load{0}-" + encoded + ".json", "area.focus:{0}x{0}:" + encoded))
+    for size in sizes:
+        for filename, phase in variants:
+            filename = filename.format(size)
+
+            def blank():
+                entry.entity.killall("tile.json")
+                purge([filename])
+
+            bench.measure(phase.format(size), lambda: entry.area.focus(filename), repeat, blank)
+
+    # Entity insertion on a mid-sized map.
+    entry.entity.killall("tile.json")
+    entry.area.focus("load{0}.json".format(sizes[len(sizes) // 2]))
+    entry.entity.killall("tile.json")
+    size = entry.area.tilemap.width
+    top = len(entry.area.tilemap.layers) - 1
+    positions = [[rand.randrange(size), rand.randrange(size)] for n in range(entities)]
+    insert = lambda: [entry.entity.insert("tile.json", top, x, y) for x, y in positions]
+    bench.measure("entity.insert", insert, repeat, lambda: entry.entity.killall("tile.json"), entities)
+
+    # Saves of growing size.
+    for keys in saves:
+        for n in range(keys):
+            entry.database.put("bench{0}".format(n), {"n": n, "name": "entity{0}".format(n), "position": [n, n, 0],
+                                                      "flags": [True, False] * 4})
+        bench.measure("database.flush:{0}".format(keys), entry.database.flush, repeat)
+
+    entry._terminate()
+
+    return {
+        "world": params,
+        "phases": bench.phases,
+        "counters": bench.counters,
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()}
+    }
@@ -0,0 +1,231 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# runner.py                        #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+
+import builtins
+import functools
+import json
+import os
+import platform
+import sys
+import time
+
+# Where the engine's modules live, relative to this file.
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "src")
+
+
+class Probes:
+    """Timers and counters wrapped around the engine's frame building.
+
+    Phases are timed per call:
+        build_frame: AreaManager.__build_frame, drawing one region of the area.
+        area: AreaManager._tick, everything the area does for a frame.
+        widgets: WidgetManager._draw_widgets.
+        present: WindowManager._tick, copying the frame to the window.
+        tick: TickManager._tick, dispatching every tick callback once.
+        callback:<name>: Each kind of tick callback, summed over all of its registrations.
+
+    Counters are summed per frame:
+        copies: FrameManager._copy calls, which are single SDL_RenderCopy calls.
+        quads: FrameManager._draw_quads calls, which are batched draws of many tiles.
+
+    Attributes:
+        phases: Dictionary of phase names to [number of calls, total seconds, list of seconds per call].
+        counters: Dictionary of counter names to counts.
+        frames: Number of frames measured.
+    """
+
+    def __init__(self, driftwood):
+        """Probes class initializer. Wraps the engine's methods.
+
+        Args:
+            driftwood: Base class instance.
+        """
+        self.driftwood = driftwood
+        self.phases = {}
+        self.counters = {}
+        self.frames = 0
+
+        self.__time(driftwood.area, "_AreaManager__build_frame", "build_frame")
+        self.__time(driftwood.widget, "_draw_widgets", "widgets")
+        self.__count(driftwood.frame, "_copy", "copies")
+        self.__count(driftwood.frame, "_draw_quads", "quads")
+
+    def reset(self) -> None:
+        """Forget everything measured so far, and start timing the tick callbacks registered since the last reset.
+        """
+        self.phases = {}
+        self.counters = {"copies": 0, "quads": 0}
+        self.frames = 0
+
+        # Tick callbacks are called from the registry, not through the instance, so the registry itself is wrapped.
+        for callback in self.driftwood.tick._TickManager__registry:
+            func = callback["function"]
+            if isinstance(func, _Timer):
+                continue
+            name = func.__qualname__
+            if name == "AreaManager._tick":
+                wrapper = self.__timer(func, "area")
+            elif name == "WindowManager._tick":
+                wrapper = self.__timer(func, "present")
+            else:
+                wrapper = self.__timer(func, "callback:" + name)
+            callback["function"] = wrapper
+
+    def tick(self) -> None:
+        """Run one tick of the engine, which builds and presents one frame.
+        """
+        start = time.perf_counter()
+        self.driftwood.tick._tick()
+        self.__record("tick", time.perf_counter() - start)
+        self.frames += 1
+
+    def results(self) -> dict:
+        """Return the measurements as a dictionary ready to be written as JSON.
+
+        Phase times are in milliseconds. "per_frame" is the total time of the phase divided by the number of frames,
+        "mean" and "p95" are over the calls of the phase.
+        """
+        phases = {}
+        for name, (calls, total, samples) in sorted(self.phases.items()):
+            samples = sorted(samples)
+            phases[name] = {
+                "calls": calls,
+                "per_frame": total * 1000.0 / max(self.frames, 1),
+                "mean": total * 1000.0 / calls,
+                "p95": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000.0
+            }
+        counters = {name: count / max(self.frames, 1) for name, count in sorted(self.counters.items())}
+        return {"frames": self.frames, "phases": phases, "counters": counters}
+
+    def __record(self, name: str, seconds: float) -> None:
+        phase = self.phases.setdefault(name, [0, 0.0, []])
+        phase[0] += 1
+        phase[1] += seconds
+        phase[2].append(seconds)
+
+    def __timer(self, func, name: str) -> '_Timer':
+        return _Timer(func, lambda seconds: self.__record(name, seconds))
+
+    def __time(self, obj, attr: str, name: str) -> None:
+        setattr(obj, attr, self.__timer(getattr(obj, attr), name))
+
+    def __count(self, obj, attr: str, name: str) -> None:
+        func = getattr(obj, attr)
+
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return func(*args, **kwargs)
+        setattr(obj, attr, counted)
+
+
+class _Timer:
+    """A wrapper that times calls to a function.
+
+    It compares equal to the function it wraps, so the engine can still unregister a wrapped tick callback by the
+    original function.
+    """
+
+    def __init__(self, func, record):
+        functools.update_wrapper(self, func)
+        self.__func = func
+        self.__record = record
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        ret = self.__func(*args, **kwargs)
+        self.__record(time.perf_counter() - start)
+        return ret
+
+    def __eq__(self, other):
+        return other is self or self.__func == other
+
+    def __hash__(self):
+        return hash(self.__func)
+
+
+def start_engine(world: str):
+    """Start the engine on a world the way __main__ does, but headless and with no frame rate cap.
+
+    The engine can only be started once per process. Its working directory becomes the world's directory.
+
+    Args:
+        world: Directory of a world made by worldgen.generate().
+
+    Returns: Base class instance.
+    """
+    sys.path.insert(0, os.path.abspath(SRC))
+    sys.argv = [sys.argv[0], os.path.join(os.path.abspath(world), "config.json"), "--headless", "--maxfps", "1000000",
+                "--quiet", "--continue"]
+    import driftwood
+
+    builtins.CHECK = driftwood.CHECK
+    builtins.CheckFailure = driftwood.CheckFailure
+    builtins.fncopy = driftwood.fncopy
+
+    entry = driftwood.Driftwood()
+    builtins.Driftwood = entry
+    builtins._ = entry.vars
+    return entry
+
+
+def run(world: str, frames: int = 300, warmup: int = 30) -> dict:
+    """Run a synthetic world headless and measure how long its frames take.
+
+    The engine can only be started once per process.
+
+    Args:
+        world: Directory of a world made by worldgen.generate().
+        frames: Number of frames to measure.
+        warmup: Number of frames to run first without measuring, while caches fill.
+
+    Returns: Dictionary of the world's parameters, the environment and the measurements.
+    """
+    world = os.path.abspath(world)
+    with open(os.path.join(world, "data", "bench", "bench.json")) as f:
+        params = json.load(f)
+
+    entry = start_engine(world)
+    probes = Probes(entry)
+    entry.running = True
+    entry.script.call("init.py", "init")
+
+    for n in range(warmup):
+        entry.tick._tick()
+
+    probes.reset()
+    for n in range(frames):
+        probes.tick()
+
+    results = probes.results()
+    entry._terminate()
+
+    results["world"] = params
+    results["platform"] = {"python": platform.python_version(), "machine": platform.machine(),
+                           "system": platform.system()}
+    return results
@@ -0,0 +1,342 @@
+####################################
+# Driftwood 2D Game Dev. Suite     #
+# worldgen.py                      #
+# Copyright 2014-2017              #
+# Michael D. Reiley & Paul Merrill #
+####################################
+
+# **********
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to
+# deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+# sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+# IN THE SOFTWARE.
+# **********
+
+
+import base64
+import gzip
+import json
+import os
+import random
+import struct
+import zlib
+
+# Size of a tile and of the tileset in tiles. The first half of the tileset is opaque, the rest is see-through, and
+# the last row of it animates.
+TILE_SIZE = 16
+TILESET_COLUMNS = 8
+TILESET_ROWS = 8
+OPAQUE_TILES = TILESET_COLUMNS * TILESET_ROWS // 2
+ANIMATED_TILES = TILESET_COLUMNS
+
+# The init script of every synthetic world. It reads the world's parameters from bench.json and fills the area.
+INIT_SCRIPT = '''\
+import random
+
+
+def init():
+    """Called on engine start. Fill the area with the entities, lights and widgets asked for.
+    """
+    params = Driftwood.resource.request_json("bench.json")
+    random.seed(params["seed"])
+    Driftwood.window.resize(params["view"], params["view"])
+    Driftwood.area.focus("area.json")
+
+    size = params["size"]
+    top = params["layers"] - 1
+    eids = []
+    for n in range(params["tile_entities"] + params["pixel_entities"]):
+        filename = "tile.json" if n < params["tile_entities"] else "pixel.json"
+        eid = Driftwood.entity.insert(filename, layer=top, x=random.randrange(size), y=random.randrange(size))
+        if eid:
+            eids.append(eid)
+
+    # Follow the first entity so the view scrolls around the area.
+    if eids:
+        Driftwood.entity.player = Driftwood.entity.entity(eids[0])
+
+    # Half the lights stand still, the other half follow entities.
+    for n in range(params["lights"]):
+        if n % 2 and eids:
+            Driftwood.light.insert("light.png", top, 0, 0, 64, 64, "FFCC88C0", entity=eids[n % len(eids)])
+        else:
+            Driftwood.light.insert("light.png", top, random.randrange(size * 16), random.randrange(size * 16), 64, 64,
+                                   "88CCFFC0")
+
+    # Build the widgets as a tree, four children to a container.
+    parents = [None]
+    for n in range(params["widgets"]):
+        wid = Driftwood.widget.insert_container(imagefile="panel.png", parent=parents[n // 4], x=2, y=2,
+                                                width=32, height=32)
+        parents.append(wid)
+
+    _["bench_directions"] = {}
+    Driftwood.tick.register(wander)
+
+
+def wander(seconds_past):
+    """Keep every entity walking in a random direction, turning now and then.
+    """
+    directions = _["bench_directions"]
+    for ent in list(Driftwood.entity.entities.values()):
+        if ent.eid not in directions or random.random() < 0.02:
+            directions[ent.eid] = random.choice([[1, 0], [-1, 0], [0, 1], [0, -1]])
+        if ent.mode == "pixel" or not ent.walking:
+            if not ent.walk(*directions[ent.eid]):
+                del directions[ent.eid]
+'''
+
+
+def write_png(filename, width, height, pixel):
+    """Write an RGBA PNG image.
+
+    Args:
+        filename: Filename of the image to write.
+        width: Width of the image in pixels.
+        height: Height of the image in pixels.
+        pixel: Function of (x, y) returning the (r, g, b, a) color of a pixel.
+    """
+    rows = b"".join(b"\x00" + bytes(c for x in range(width) for c in pixel(x, y)) for y in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    with open(filename, "wb") as png:
+        png.write(b"\x89PNG\r\n\x1a\n")
+        png.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        png.write(chunk(b"IDAT", zlib.compress(rows)))
+        png.write(chunk(b"IEND", b""))
+
+
+def generate(directory, size=64, layers=3, animated=10, tile_entities=8, pixel_entities=8, lights=8, widgets=8,
+             view=240, seed=0):
+    """Generate a synthetic world that the engine can run.
+
+    The directory gets a config.json for the engine, and a data/bench/ directory holding the world: a Tiled map, a
+    tileset, entities, a lightmap, a widget image, an init script, and the parameters in bench.json.
+
+    Args:
+        directory: Directory to write the world into. It is created if needed.
+        size: Width and height of the map in tiles.
+        layers: Number of tile layers. The bottom one is solid, the rest are sparse.
+        animated: Percentage of the tiles in the upper layers that animate.
+        tile_entities: Number of tile mode entities.
+        pixel_entities: Number of pixel mode entities.
+        lights: Number of lights.
+        widgets: Number of container widgets.
+        view: Width and height of the logical window in pixels.
+        seed: Random seed, so the same parameters always make the same world.
+
+    Returns: The parameters of the world.
+    """
+    data = os.path.join(directory, "data", "bench")
+    os.makedirs(data, exist_ok=True)
+    os.makedirs(os.path.join(directory, "db"), exist_ok=True)
+
+    params = {
+        "size": size,
+        "layers": layers,
+        "animated": animated,
+        "tile_entities": tile_entities,
+        "pixel_entities": pixel_entities,
+        "lights": lights,
+        "widgets": widgets,
+        "view": view,
+        "seed": seed
+    }
+    with open(os.path.join(data, "bench.json"), "w") as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+
+    with open(os.path.join(directory, "config.json"), "w") as f:
+        json.dump(_config(view), f, indent=2)
+
+    with open(os.path.join(data, "init.py"), "w") as f:
+        f.write(INIT_SCRIPT)
+
+    _write_images(data)
+    _write_entities(data)
+    write_area(data, "area.json", size, layers, animated, seed=seed)
+
+    return params
+
+
+def write_area(data, filename, size, layers, animated, spawns=0, seed=0, compression=None):
+    """Write a Tiled map with a solid bottom layer and sparse upper layers into a world.
+
+    Args:
+        data: The world's data/bench/ directory.
+        filename: Filename of the map.
+        size: Width and height of the map in tiles.
+        layers: Number of tile layers.
+        animated: Percentage of the tiles in the upper layers that animate.
+        spawns: Number of tile mode entities the map spawns on the top layer when focused.
+        seed: Random seed.
+        compression: None to write the tiles as lists, "" to write them in base64, or "zlib", "gzip" or "zstd" to
+            also compress them. zstd needs the zstandard module.
+    """
+    rand = random.Random(seed)
+    tilemap = _tilemap(rand, size, layers, animated)
+    if compression is not None:
+        for layer in tilemap["layers"]:
+            _encode(layer, compression)
+
+    if spawns:
+        objects = []
+        for n in range(spawns):
+            objects.append({"x": rand.randrange(size) * TILE_SIZE, "y": rand.randrange(size) * TILE_SIZE,
+                            "width": TILE_SIZE, "height": TILE_SIZE, "properties": {"entity": "tile.json"}})
+        tilemap["layers"].append({"name": "Spawns", "objects": objects, "opacity": 1, "type": "objectgroup",
+                                  "visible": True, "x": 0, "y": 0})
+
+    with open(os.path.join(data, filename), "w") as f:
+        json.dump(tilemap, f)
+
+
+def _config(view):
+    """Return the engine configuration for a synthetic world.
+    """
+    return {
+        "database": {"root": "db/", "name": "bench.ubj"},
+        "cache": {"ttl": 300},
+        "input": {
+            "keybinds": {"up": "UP", "down": "DOWN", "left": "LEFT", "right": "RIGHT", "interact": "SPACE",
+                         "face": "LSHIFT", "console": "BACKQUOTE", "stats": "F3"},
+            "debug": False
+        },
+        "audio": {"support": ["ogg"], "frequency": 22050, "chunksize": 4096, "music_volume": 128, "sfx_volume": 128},
+        "log": {"verbose": False, "halt": False, "file": "", "suppress": [["Tick"]], "suppress_halt": [["WARNING"]]},
+        "path": {"root": "data/", "path": ["bench/"]},
+        "window": {"title": "Driftwood 2D Benchmark", "width": view, "height": view, "fullscreen": False, "zoom": 1,
+                   "maxfps": 0, "headless": True}
+    }
+
+
+def _write_images(data):
+    """Write the tileset, sprite sheet, lightmap and widget images.
+    """
+    def tile_pixel(x, y):
+        n = y // TILE_SIZE * TILESET_COLUMNS + x // TILE_SIZE
+        r, g, b = (n * 37) % 256, (n * 91) % 256, (n * 53) % 256
+        if n < OPAQUE_TILES:
+            return r, g, b, 255
+        # See-through tiles have a solid border and a faint middle.
+        edge = x % TILE_SIZE in (0, TILE_SIZE - 1) or y % TILE_SIZE in (0, TILE_SIZE - 1)
+        return r, g, b, 255 if edge else 64
+
+    write_png(os.path.join(data, "tiles.png"), TILE_SIZE * TILESET_COLUMNS, TILE_SIZE * TILESET_ROWS, tile_pixel)
+    write_png(os.path.join(data, "sprite.png"), TILE_SIZE * 4, TILE_SIZE,
+              lambda x, y: (255, 64 * (x // TILE_SIZE), 0, 255 if 2 <= x % TILE_SIZE <= 13 else 0))
+
+    def light_pixel(x, y):
+        d = ((x - 31.5) ** 2 + (y - 31.5) ** 2) ** 0.5
+        return 255, 255, 255, max(0, 255 - int(d * 8))
+
+    write_png(os.path.join(data, "light.png"), 64, 64, light_pixel)
+    write_png(os.path.join(data, "panel.png"), 32, 32, lambda x, y: (32, 32, 96, 192))
+
+
+def _write_entities(data):
+    """Write the tile mode and pixel mode entity descriptors.
+    """
+    for mode, speed in [["tile", 64], ["pixel", 1]]:
+        entity = {
+            "init": {
+                "mode": mode,
+                "collision": ["tile"],
+                "travel": False,
+                "speed": speed,
+                "image": "sprite.png",
+                "width": TILE_SIZE,
+                "height": TILE_SIZE,
+                "members": [0, 1, 2, 3],
+                "afps": 4,
+                "properties": {},
+                "on_insert": "",
+                "on_kill": "",
+                "resting_stance": "init"
+            }
+        }
+        with open(os.path.join(data, mode + ".json"), "w") as f:
+            json.dump(entity, f, indent=2)
+
+
+def _encode(layer, compression):
+    """Encode the tiles of a tile layer in base64 the way Tiled does, compressing them first if asked.
+    """
+    raw = struct.pack("<{0}I".format(len(layer["data"])), *layer["data"])
+    if compression == "zlib":
+        raw = zlib.compress(raw)
+    elif compression == "gzip":
+        raw = gzip.compress(raw)
+    elif compression == "zstd":
+        import zstandard
+        raw = zstandard.ZstdCompressor().compress(raw)
+    layer["data"] = base64.b64encode(raw).decode("ascii")
+    layer["encoding"] = "base64"
+    if compression:
+        layer["compression"] = compression
+
+
+def _tilemap(rand, size, layers, animated):
+    """Return a Tiled map with a solid bottom layer and sparse upper layers.
+    """
+    animated_first = TILESET_COLUMNS * TILESET_ROWS - ANIMATED_TILES
+    tileproperties = {}
+    for localgid in range(animated_first, animated_first + ANIMATED_TILES):
+        # Each animated tile cycles through the last row, starting from itself. Members count from 1.
+        members = [animated_first + (localgid - animated_first + n) % ANIMATED_TILES + 1 for n in range(4)]
+        tileproperties[str(localgid)] = {"members": ",".join(map(str, members)), "afps": "4"}
+
+    layer_jsons = []
+    for l in range(layers):
+        if l == 0:
+            tiles = [rand.randrange(OPAQUE_TILES) + 1 for seq in range(size * size)]
+        else:
+            tiles = []
+            for seq in range(size * size):
+                if rand.random() >= 0.3:
+                    tiles.append(0)
+                elif rand.random() * 100 < animated:
+                    tiles.append(animated_first + rand.randrange(ANIMATED_TILES) + 1)
+                else:
+                    tiles.append(rand.randrange(OPAQUE_TILES, animated_first) + 1)
+        layer_jsons.append({"data": tiles, "height": size, "width": size, "name": "Layer {0}".format(l),
+                            "opacity": 1, "type": "tilelayer", "visible": True, "x": 0, "y": 0})
+
+    return {
+        "height": size,
+        "width": size,
+        "tilewidth": TILE_SIZE,
+        "tileheight": TILE_SIZE,
+        "orientation": "orthogonal",
+        "renderorder": "right-down",
+        "version": 1,
+        "layers": layer_jsons,
+        "tilesets": [{
+            "firstgid": 1,
+            "image": "tiles.png",
+            "imagewidth": TILE_SIZE * TILESET_COLUMNS,
+            "imageheight": TILE_SIZE * TILESET_ROWS,
+            "margin": 0,
+            "spacing": 0,
+            "name": "bench",
+            "tilewidth": TILE_SIZE,
+            "tileheight": TILE_SIZE,
+            "tilecount": TILESET_COLUMNS * TILESET_ROWS,
+            "columns": TILESET_COLUMNS,
+            "tileproperties": tileproperties
+        }]
+    }